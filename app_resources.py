@@ -0,0 +1,79 @@
+"""
+Process-wide resources shared by the Streamlit pages (dashboard.py and pages/).
+"""
+
+import streamlit as st
+
+from storage import create_repository
+from storage.write_queue import WriteQueue
+
+# --- Data Access ---
+def get_database_config():
+    """
+    Reads the [database] section of the Streamlit secrets configuration file
+    (.streamlit/secrets.toml).
+
+    The expected structure in secrets.toml is:
+    [database]
+    host = "your-host"
+    name = "your-database-name"
+    port = your-port (e.g., 3306)
+    user = "your-username"
+    password = "your-password"
+
+    Or, to run fully offline against SQLite seeded from database/*.sql:
+    [database]
+    backend = "sqlite"
+    path = "library.db"
+
+    Returns:
+        dict: The database settings; a seeded in-memory SQLite setup when no
+              secrets file or [database] section exists.
+    """
+    try:
+        return dict(st.secrets["database"])
+    except (FileNotFoundError, KeyError):
+        return {"backend": "sqlite"}
+
+@st.cache_resource
+def get_repository():
+    """
+    Creates the process-wide repository (connection pool, read cache, migrations)
+    once and shares it across every Streamlit rerun and session.
+
+    Unless `warm_up = false`, the pool, mirrors and first-page caches are loaded
+    here in parallel, before the first script run reads them one by one.
+
+    Returns:
+        LibraryRepository: The repository every UI section calls.
+    """
+    config = get_database_config()
+    repo = create_repository(config)
+    if config.get("warm_up", True):
+        repo.warm_up()
+    return repo
+
+@st.cache_resource
+def get_analytics():
+    """
+    Creates the loan analytics reports once per process, on top of the shared
+    repository, so cached reports are reused by every session.
+
+    Returns:
+        LoanAnalytics: Reports cached per time window for `analytics_ttl` seconds.
+    """
+    ## Imported here: only the analytics page needs it, not the dashboard's first render
+    from storage.analytics import LoanAnalytics
+    return LoanAnalytics(get_repository(), ttl=float(get_database_config().get("analytics_ttl", 300)))
+
+@st.cache_resource
+def get_write_queue():
+    """
+    Creates the process-wide background write queue once, so writes from every
+    session share the same per-book and per-user ordering.
+
+    Returns:
+        WriteQueue: Runs repository writes with retries (write_workers, write_retries).
+    """
+    config = get_database_config()
+    return WriteQueue(workers=int(config.get("write_workers", 4)), retries=int(config.get("write_retries", 3)))
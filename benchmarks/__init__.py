@@ -0,0 +1,4 @@
+"""
+Benchmarks for the Library Borrow System, run from the repository root with
+`python -m benchmarks.<name>`.
+"""
@@ -0,0 +1,73 @@
+"""
+Synthetic dataset generation shared by the benchmarks.
+"""
+
+import os
+import random
+import tempfile
+
+from storage import create_repository
+
+
+def seed_synthetic(repo, books=10000, users=1000, closed_loans=20000, batch_size=5000, seed=42):
+    """
+    Fills an empty repository with a synthetic catalogue.
+
+    Workflow:
+    1. Inserts `books` available books and `users` users with sequential IDs
+       starting at 1, every 50th book soft-deleted.
+    2. Inserts `closed_loans` returned transactions spread over the last year,
+       so the transaction log has a realistic size for the hot-path queries.
+    3. Writes in batches of `batch_size` rows, one transaction per batch.
+
+    Args:
+        repo (SQLRepository): Repository to fill (MySQL or SQLite).
+        books (int): Number of books.
+        users (int): Number of users.
+        closed_loans (int): Number of historical, already returned loans.
+        batch_size (int): Rows per executemany batch.
+        seed (int): Random seed, so runs are comparable between commits.
+    """
+    rng = random.Random(seed)
+
+    def insert(sql, rows):
+        with repo.connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(rows), batch_size):
+                repo.begin(conn)
+                cursor.executemany(repo._sql(sql), rows[start:start + batch_size])
+                conn.commit()
+            cursor.close()
+
+    insert("INSERT INTO books (id, judul, penulis, status, is_delete) VALUES (%s, %s, %s, %s, %s)",
+           [(i, f"Book {i}", f"Author {i % 997}", 1, int(i % 50 == 0)) for i in range(1, books + 1)])
+    insert("INSERT INTO users (id, nama) VALUES (%s, %s)",
+           [(i, f"User {i}") for i in range(1, users + 1)])
+    insert("INSERT INTO transactions (buku_id, user_id, tanggal_pinjam, tanggal_kembali) VALUES (%s, %s, %s, %s)",
+           [(rng.randint(1, books), rng.randint(1, users),
+             f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00",
+             "2025-12-31 10:00:00") for _ in range(closed_loans)])
+    repo.rebuild_loan_summary()
+    repo.cache.invalidate("books", "users", "transactions")
+
+
+def create_benchmark_repository(backend="sqlite", config=None, path=None, **dataset):
+    """
+    Creates a repository with a freshly seeded synthetic dataset.
+
+    SQLite runs use a temporary database file (unless `path` is given), so the
+    per-operation connections behave like separate app sessions. MySQL runs use
+    `config` (a [database] mapping) and must point at a scratch database.
+
+    Returns:
+        SQLRepository: The seeded repository.
+    """
+    if backend == "sqlite":
+        if path is None:
+            path = os.path.join(tempfile.mkdtemp(prefix="library-bench-"), "library.db")
+        repo = create_repository({"backend": "sqlite", "path": path, "seed_dumps": False})
+    else:
+        repo = create_repository(dict(config or {}, backend="mysql"))
+
+    seed_synthetic(repo, **dataset)
+    return repo
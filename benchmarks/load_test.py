@@ -0,0 +1,260 @@
+"""
+Load generator for the borrow/return workflow.
+
+Drives the same repository operations the Streamlit UI performs from N
+concurrent simulated librarian sessions against a seeded dataset, then reports
+latency percentiles, throughput and conflict/error counts per operation.
+
+Usage (from the repository root):
+    python -m benchmarks.load_test --sessions 8 --duration 30 --books 10000 --output results.json
+    python -m benchmarks.load_test ... --compare baseline.json
+
+MySQL runs read the [database] section of a secrets file and need a scratch database:
+    python -m benchmarks.load_test --backend mysql --secrets .streamlit/secrets.toml
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.dataset import create_benchmark_repository
+from storage import load_secrets
+
+
+OPERATIONS = [
+    ## (operation, weight) -- browsing dominates, like in the UI
+    ("list_books", 30),
+    ("list_users", 15),
+    ("add_to_cart", 20),
+    ("confirm_borrow", 12),
+    ("confirm_return", 12),
+    ("soft_delete", 3),
+    ("restore", 3),
+]
+
+
+class Session:
+    """
+    One simulated librarian session serving a single borrower.
+
+    Each step performs the repository calls a Streamlit rerun would make for the
+    chosen action and returns "ok", "conflict" or "skipped".
+    """
+
+    def __init__(self, repo, user_id, books, rng):
+        self.repo = repo
+        self.user_id = user_id
+        self.books = books
+        self.rng = rng
+        self.cart = []
+        self.deleted = []
+
+    def _random_page(self, status=None):
+        start = self.rng.randint(1, self.books)
+        df, _, _ = self.repo.list_books_page(page_size=20, cursor=("from", start), status=status)
+        return df
+
+    def list_books(self):
+        df = self._random_page()
+        self.repo.active_loans(df["id"].tolist())
+        return "ok"
+
+    def list_users(self):
+        ## The member directory: one page of an ID or name prefix search, then the chosen borrower
+        query = self.rng.choice(["", str(self.user_id)[:2], "User 1"])
+        df, _ = self.repo.search_users(query, page_size=12)
+        if df.empty:
+            return "skipped"
+        self.repo.get_user(int(df["id"].iloc[self.rng.randrange(len(df))]))
+        return "ok"
+
+    def add_to_cart(self):
+        df = self._random_page(status=1)
+        if df.empty:
+            return "skipped"
+        row = df.iloc[self.rng.randrange(len(df))]
+        self.cart.append((int(row["id"]), row["judul"]))
+        valid_cart, removed = self.repo.validate_cart(self.cart)
+        self.cart = valid_cart
+        return "conflict" if removed else "ok"
+
+    def confirm_borrow(self):
+        if not self.cart:
+            return "skipped"
+        unavailable = self.repo.borrow_books(self.user_id, [book[0] for book in self.cart])
+        self.cart = [] if not unavailable else [b for b in self.cart if b[0] not in unavailable]
+        return "conflict" if unavailable else "ok"
+
+    def confirm_return(self):
+        borrowed = self.repo.borrowed_books(self.user_id)
+        if not borrowed:
+            return "skipped"
+        selected = self.rng.sample(borrowed, min(len(borrowed), self.rng.randint(1, 3)))
+        returned = self.repo.return_books(self.user_id, [book[0] for book in selected])
+        return "ok" if returned == len(selected) else "conflict"
+
+    def soft_delete(self):
+        df = self._random_page()
+        if df.empty:
+            return "skipped"
+        book_id = int(df["id"].iloc[self.rng.randrange(len(df))])
+        if not self.repo.soft_delete_book(book_id):
+            return "conflict"
+        self.deleted.append(book_id)
+        return "ok"
+
+    def restore(self):
+        ## Same repository call handle_restore_choice() makes for "Use old data"
+        if not self.deleted:
+            return "skipped"
+        self.repo.restore_book(self.deleted.pop())
+        return "ok"
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(repo, sessions=8, duration=10.0, books=10000, users=1000, seed=42):
+    """
+    Runs `sessions` concurrent sessions for `duration` seconds.
+
+    Returns:
+        dict: Per-operation latency samples (ms) and outcome counters.
+    """
+    samples = defaultdict(list)
+    outcomes = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    names = [name for name, _ in OPERATIONS]
+    weights = [weight for _, weight in OPERATIONS]
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        session = Session(repo, user_id=1 + index % users, books=books, rng=rng)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                outcome = getattr(session, name)()
+            except Exception:
+                outcome = "error"
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                outcomes[name][outcome] += 1
+                if outcome != "skipped":
+                    samples[name].append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, outcomes
+
+
+def summarize(samples, outcomes, duration):
+    report = {}
+    total = 0
+    for name, _ in OPERATIONS:
+        values = sorted(samples.get(name, []))
+        total += len(values)
+        report[name] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+            "conflicts": outcomes[name]["conflict"],
+            "errors": outcomes[name]["error"],
+            "skipped": outcomes[name]["skipped"],
+        }
+    return {"operations": report, "total_ops": total, "throughput_ops_s": total / duration}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, tolerance):
+    """
+    Prints p95 latency and throughput changes against a baseline result file.
+
+    Returns:
+        bool: True when no operation's p95 regressed by more than `tolerance` percent.
+    """
+    ok = True
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for name, stats in current["operations"].items():
+        before = baseline["operations"].get(name, {}).get("p95_ms")
+        after = stats["p95_ms"]
+        if not before or after is None:
+            continue
+        change = (after - before) / before * 100
+        flag = "❌" if change > tolerance else "✅"
+        ok = ok and change <= tolerance
+        print(f"{flag} {name:<15} p95 {before:8.2f} -> {after:8.2f} ms ({change:+.1f}%)")
+    before_tps, after_tps = baseline["throughput_ops_s"], current["throughput_ops_s"]
+    print(f"   throughput      {before_tps:8.1f} -> {after_tps:8.1f} ops/s")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for the borrow/return workflow.")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml", help="MySQL settings ([database] section)")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--loans", type=int, default=20000, help="historical closed loans")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="allowed p95 regression in percent")
+    args = parser.parse_args(argv)
+
+    config = load_secrets(args.secrets) if args.backend == "mysql" else None
+    repo = create_benchmark_repository(args.backend, config=config, books=args.books,
+                                       users=args.users, closed_loans=args.loans, seed=args.seed)
+
+    samples, outcomes = run_load(repo, sessions=args.sessions, duration=args.duration,
+                                 books=args.books, users=args.users, seed=args.seed)
+    result = summarize(samples, outcomes, args.duration)
+    result.update({
+        "commit": git_commit(),
+        "backend": args.backend,
+        "params": {"sessions": args.sessions, "duration": args.duration, "books": args.books,
+                   "users": args.users, "loans": args.loans, "seed": args.seed},
+    })
+
+    print(f"{'operation':<15} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'conflicts':>9} {'errors':>6}")
+    for name, stats in result["operations"].items():
+        p50, p95, p99 = (f"{stats[k]:.2f}" if stats[k] is not None else "-" for k in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"{name:<15} {stats['count']:>7} {p50:>8} {p95:>8} {p99:>8} {stats['conflicts']:>9} {stats['errors']:>6}")
+    print(f"throughput: {result['throughput_ops_s']:.1f} ops/s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            if not compare(result, json.load(fh), args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
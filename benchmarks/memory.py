@@ -0,0 +1,145 @@
+"""
+Memory and cold-load benchmark for the in-memory catalogue.
+
+Seeds a SQLite database and reports, for the `books` table:
+
+- the DataFrame memory as read from the database (and, for comparison, with
+  every text column as Python objects, the pre-pandas-3 layout) against the
+  compacted layout the mirrors keep (see storage.snapshot),
+- how long a fresh mirror takes to load from the database versus from its
+  Parquet snapshot, and the snapshot's size on disk.
+
+Usage (from the repository root):
+    python -m benchmarks.memory --books 100000 --output memory.json
+    python -m benchmarks.memory ... --compare memory.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.dataset import create_benchmark_repository
+from benchmarks.load_test import git_commit
+from storage import SQLiteRepository
+from storage.snapshot import compact_frame
+
+
+MB = 1024 * 1024
+
+
+def frame_mb(df):
+    return df.memory_usage(deep=True).sum() / MB
+
+
+def measure_memory(repo):
+    """
+    Returns the books table's memory in MB: as read, with object text columns, and compacted.
+    """
+    raw = repo.fetch_rows("books")
+    text_columns = [col for col in raw.columns if raw[col].dtype.kind not in "iufbM"]
+    return {
+        "rows": len(raw),
+        "raw_mb": frame_mb(raw),
+        "object_mb": frame_mb(raw.astype({col: object for col in text_columns})),
+        "compact_mb": frame_mb(compact_frame(raw, "books")),
+    }
+
+
+def time_load(db_path, snapshot_dir=None):
+    """
+    Loads the books mirror of a fresh repository and returns the time it took in ms.
+
+    With `snapshot_dir`, the mirror loads from the snapshot there when one exists
+    and writes it otherwise.
+    """
+    repo = SQLiteRepository(db_path, snapshot_dir=snapshot_dir)
+    started = time.perf_counter()
+    repo.mirrors["books"].sync(True)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    ## The search index builds in the background; let it finish before the next sample
+    repo.search_index.wait_ready()
+    return elapsed_ms
+
+
+def measure_loads(db_path, samples=5):
+    """
+    Returns the median cold load time from the database and from a snapshot, and the snapshot size.
+    """
+    snapshot_dir = tempfile.mkdtemp(prefix="library-snapshot-")
+    ## The first load reads the database and writes the snapshot
+    time_load(db_path, snapshot_dir)
+    if not os.path.exists(os.path.join(snapshot_dir, "books.parquet")):
+        raise RuntimeError("No snapshot was written")
+    return {
+        "db_load_ms": statistics.median(time_load(db_path) for _ in range(samples)),
+        "snapshot_load_ms": statistics.median(time_load(db_path, snapshot_dir) for _ in range(samples)),
+        "snapshot_mb": os.path.getsize(os.path.join(snapshot_dir, "books.parquet")) / MB,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """
+    Prints memory and load time changes against a baseline result file.
+
+    Returns:
+        bool: True when neither compacted memory nor snapshot load time regressed by more than `tolerance` percent.
+    """
+    ok = True
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for name, unit in (("compact_mb", "MB"), ("snapshot_load_ms", "ms"), ("db_load_ms", "ms"), ("raw_mb", "MB")):
+        before, after = baseline.get(name), current[name]
+        if not before:
+            continue
+        change = (after - before) / before * 100
+        gated = name in ("compact_mb", "snapshot_load_ms")
+        flag = "❌" if gated and change > tolerance else "✅"
+        ok = ok and not (gated and change > tolerance)
+        print(f"{flag} {name:<17} {before:8.2f} -> {after:8.2f} {unit} ({change:+.1f}%)")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory and cold-load benchmark for the book catalogue.")
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=5, help="cold loads per variant")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="allowed regression in percent")
+    args = parser.parse_args(argv)
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="library-memory-"), "library.db")
+    repo = create_benchmark_repository("sqlite", path=db_path, books=args.books, users=args.users, closed_loans=0)
+
+    result = measure_memory(repo)
+    result.update(measure_loads(db_path, args.samples))
+    result.update({
+        "commit": git_commit(),
+        "params": {"books": args.books, "users": args.users, "samples": args.samples},
+    })
+
+    per_100k = 100000 / max(result["rows"], 1)
+    print(f"books:              {result['rows']}")
+    print(f"memory as read:     {result['raw_mb']:8.2f} MB ({result['raw_mb'] * per_100k:.2f} MB per 100k books)")
+    print(f"  with object text: {result['object_mb']:8.2f} MB ({result['object_mb'] * per_100k:.2f} MB per 100k books)")
+    print(f"memory compacted:   {result['compact_mb']:8.2f} MB ({result['compact_mb'] * per_100k:.2f} MB per 100k books)")
+    print(f"load from database: {result['db_load_ms']:8.1f} ms")
+    print(f"load from snapshot: {result['snapshot_load_ms']:8.1f} ms ({result['snapshot_mb']:.2f} MB on disk)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            if not compare(result, json.load(fh), args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
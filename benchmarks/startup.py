@@ -0,0 +1,215 @@
+"""
+Startup benchmark for the Streamlit dashboard.
+
+Starts the dashboard in fresh processes with Streamlit's AppTest runner against
+a seeded SQLite database and reports, per cold start, how long the dashboard's
+own imports took on top of Streamlit (per top-level module, in a fresh
+interpreter), how long the first script run took until everything was rendered
+(time-to-first-render, including repository creation and warm-up), and the
+script execution time of the following idle reruns.
+
+Usage (from the repository root):
+    python -m benchmarks.startup --samples 5 --reruns 20 --books 10000 --output startup.json
+    python -m benchmarks.startup ... --compare startup.json
+    python -m benchmarks.startup ... --no-warm-up   # measure without the warm-up step
+"""
+
+import argparse
+import ast
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DASHBOARD = os.path.join(ROOT, "dashboard.py")
+
+
+def dashboard_imports():
+    """
+    Lists the modules dashboard.py imports at the top level, in order, so the
+    benchmark keeps timing what the first render actually loads.
+
+    Returns:
+        list: Module names, e.g. ["streamlit", "pandas", ..., "app_resources", "storage"].
+    """
+    with open(DASHBOARD, encoding="utf-8") as fh:
+        tree = ast.parse(fh.read(), DASHBOARD)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def measure_cold_start(db_path, reruns=20, warm_up=True):
+    """
+    Measures one cold start of the dashboard; must run in a fresh process, since
+    the repository is cached for the lifetime of the process.
+
+    Workflow:
+    1. Imports the AppTest runner, which loads Streamlit itself (runner_import_ms).
+    2. Imports dashboard.py's top-level modules one by one (import_ms in total,
+       import_breakdown_ms per module); modules Streamlit already loaded cost nothing.
+    3. Times the first script run and the following idle reruns.
+
+    Returns:
+        dict: runner_import_ms, import_ms, import_breakdown_ms, first_render_ms,
+              rerun_ms (list), the repository's warm-up timings and whether the
+              MySQL driver was loaded.
+    """
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    runner_import_ms = (time.perf_counter() - started) * 1000
+
+    import_breakdown_ms = {}
+    for module in dashboard_imports():
+        started = time.perf_counter()
+        importlib.import_module(module)
+        import_breakdown_ms[module] = (time.perf_counter() - started) * 1000
+
+    at = AppTest.from_file(DASHBOARD, default_timeout=120)
+    at.secrets["database"] = {"backend": "sqlite", "path": db_path, "seed_dumps": False, "warm_up": warm_up}
+    started = time.perf_counter()
+    at.run()
+    first_render_ms = (time.perf_counter() - started) * 1000
+    if at.exception:
+        raise RuntimeError(f"Dashboard failed on first run: {at.exception[0].value}")
+
+    rerun_ms = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        rerun_ms.append((time.perf_counter() - started) * 1000)
+
+    from app_resources import get_repository
+    return {
+        "runner_import_ms": runner_import_ms,
+        "import_ms": sum(import_breakdown_ms.values()),
+        "import_breakdown_ms": import_breakdown_ms,
+        "first_render_ms": first_render_ms,
+        "rerun_ms": rerun_ms,
+        "warm_up_ms": get_repository().stats()["warm_up"],
+        ## The SQLite backend should never load the MySQL driver
+        "mysql_driver_loaded": "mysql.connector" in sys.modules,
+    }
+
+
+def run_samples(db_path, samples=5, reruns=20, warm_up=True):
+    """
+    Runs `samples` cold starts, each in its own Python process.
+
+    Returns:
+        list: One measure_cold_start() result per sample.
+    """
+    command = [sys.executable, "-m", "benchmarks.startup", "--child", "--db", db_path, "--reruns", str(reruns)]
+    if not warm_up:
+        command.append("--no-warm-up")
+    results = []
+    for _ in range(samples):
+        ## Streamlit warns about the missing server context on stderr; only stdout carries the result
+        child = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+        results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def summarize(results):
+    ## Imported here: benchmarks.load_test loads storage, which the cold-start child must import itself
+    from benchmarks.load_test import percentile
+    reruns = sorted(ms for result in results for ms in result["rerun_ms"])
+    return {
+        "runner_import_ms": statistics.median(result["runner_import_ms"] for result in results),
+        "import_ms": statistics.median(result["import_ms"] for result in results),
+        "import_breakdown_ms": {
+            module: statistics.median(result["import_breakdown_ms"][module] for result in results)
+            for module in results[0]["import_breakdown_ms"]
+        },
+        "first_render_ms": statistics.median(result["first_render_ms"] for result in results),
+        "rerun_p50_ms": percentile(reruns, 50),
+        "rerun_p95_ms": percentile(reruns, 95),
+        "warm_up_ms": results[-1]["warm_up_ms"],
+        "mysql_driver_loaded": any(result["mysql_driver_loaded"] for result in results),
+    }
+
+
+def compare(current, baseline, tolerance):
+    """
+    Prints startup and rerun changes against a baseline result file.
+
+    Returns:
+        bool: True when neither time-to-first-render nor rerun p95 regressed by more than `tolerance` percent.
+    """
+    ok = True
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for name in ("first_render_ms", "rerun_p95_ms", "rerun_p50_ms", "import_ms"):
+        before, after = baseline.get(name), current[name]
+        if not before:
+            continue
+        change = (after - before) / before * 100
+        gated = name in ("first_render_ms", "rerun_p95_ms")
+        flag = "❌" if gated and change > tolerance else "✅"
+        ok = ok and not (gated and change > tolerance)
+        print(f"{flag} {name:<16} {before:8.1f} -> {after:8.1f} ms ({change:+.1f}%)")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start and rerun benchmark for the dashboard.")
+    parser.add_argument("--samples", type=int, default=5, help="cold starts, each in a fresh process")
+    parser.add_argument("--reruns", type=int, default=20, help="idle reruns measured after each first render")
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--loans", type=int, default=20000, help="historical closed loans")
+    parser.add_argument("--no-warm-up", dest="warm_up", action="store_false", help="skip the repository warm-up")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="allowed regression in percent")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure_cold_start(args.db, args.reruns, args.warm_up)))
+        return 0
+
+    from benchmarks.dataset import create_benchmark_repository
+    from benchmarks.load_test import git_commit
+    db_path = os.path.join(tempfile.mkdtemp(prefix="library-startup-"), "library.db")
+    create_benchmark_repository("sqlite", path=db_path, books=args.books, users=args.users, closed_loans=args.loans)
+
+    result = summarize(run_samples(db_path, args.samples, args.reruns, args.warm_up))
+    result.update({
+        "commit": git_commit(),
+        "params": {"samples": args.samples, "reruns": args.reruns, "books": args.books,
+                   "users": args.users, "loans": args.loans, "warm_up": args.warm_up},
+    })
+
+    print(f"streamlit import: {result['runner_import_ms']:8.1f} ms")
+    print(f"app imports:      {result['import_ms']:8.1f} ms")
+    for module, ms in sorted(result["import_breakdown_ms"].items(), key=lambda item: -item[1])[:5]:
+        print(f"  {module:<16}{ms:8.1f} ms")
+    print(f"mysql driver:     {'loaded' if result['mysql_driver_loaded'] else 'not loaded'}")
+    print(f"first render:     {result['first_render_ms']:8.1f} ms")
+    print(f"rerun p50 / p95:  {result['rerun_p50_ms']:8.1f} / {result['rerun_p95_ms']:.1f} ms")
+    print(f"warm-up steps:    {result['warm_up_ms'] or 'disabled'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            if not compare(result, json.load(fh), args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,95 +1,12 @@
-
 import streamlit as st
-import mysql.connector
 import pandas as pd
-import mysql.connector
-from urllib.parse import quote
-import random
 import math
+import io
+import tempfile
+from datetime import datetime
 
-# --- DB Connection ---
-def get_connection():
-    """
-    Establishes and returns a connection to a MySQL database using credentials
-    stored in the Streamlit secrets configuration file (.streamlit/secrets.toml).
-
-    The expected structure in secrets.toml is:
-    [database]
-    host = "your-host"
-    name = "your-database-name"
-    port = your-port (e.g., 3306)
-    user = "your-username"
-    password = "your-password"
-
-    Returns:
-        A MySQL connection object from mysql.connector.connect()
-
-    Raises:
-        mysql.connector.Error: If the connection fails due to invalid credentials or unreachable host.
-
-    Note:
-        Make sure `mysql-connector-python` is installed (`pip install mysql-connector-python`),
-        and Streamlit is running with access to the secrets.toml file.
-    """
-    return mysql.connector.connect(
-        host = st.secrets["database"]["host"],
-        database = st.secrets["database"]["name"],
-        port = st.secrets["database"]["port"],
-        user = st.secrets["database"]["user"],
-        password = st.secrets["database"]["password"]
-    )
-
-def fetch_books():
-    """
-    Connects to the database and retrieves all records from the 'books' table.
-
-    Workflow:
-    1. Establishes a MySQL database connection using get_connection().
-    2. Executes a SQL query to fetch all rows from the 'books' table.
-    3. Extracts column names from the cursor metadata.
-    4. Returns the result as a pandas DataFrame for easy manipulation or display.
-
-    Returns:
-        pd.DataFrame: A DataFrame containing all records from the 'books' table,
-                      with column names inferred from the database schema.
-
-    Note:
-        Make sure the 'books' table exists in the connected database and
-        the `get_connection()` function is working properly.
-    """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM books")
-    rows = cursor.fetchall()
-    cols = [desc[0] for desc in cursor.description]
-    conn.close()
-    return pd.DataFrame(rows, columns=cols)
-
-def get_users():
-    """
-    Connects to the database and retrieves all records from the 'users' table.
-
-    Workflow:
-    1. Establishes a database connection using get_connection().
-    2. Executes a SQL query to select all rows from the 'users' table.
-    3. Fetches the results and extracts column names from the cursor metadata.
-    4. Closes the connection.
-    5. Returns the data as a pandas DataFrame.
-
-    Returns:
-        pd.DataFrame: A DataFrame containing all user records with column headers.
-
-    Note:
-        Ensure that the 'users' table exists in the database schema.
-        This function depends on the get_connection() function and a valid database connection.
-    """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users")
-    rows = cursor.fetchall()
-    cols = [desc[0] for desc in cursor.description]
-    conn.close()
-    return pd.DataFrame(rows, columns=cols)
+from app_resources import get_database_config, get_repository, get_write_queue
+from storage import ConcurrentModificationError, DatabaseUnavailable, WriteJournaled, bulk
 
 @st.dialog("🏹 Add New Users")
 def add_users():
@@ -105,10 +22,8 @@ def add_users():
     1. Displays a dialog box with input fields for user details.
     2. On clicking 'Submit':
        - Checks if both fields are filled.
-       - Establishes a database connection via get_connection().
-       - Executes an INSERT SQL query to add the new user.
-       - Commits the changes and closes the connection.
-       - Displays a success toast and triggers a rerun.
+       - Queues the new user on the background write queue.
+       - Triggers a rerun; a success toast follows once the write completed.
     3. If fields are incomplete, shows a warning message.
 
     Requirements:
@@ -123,13 +38,8 @@ def add_users():
     user_id = st.text_input("User ID: ")
     if st.button("Submit"):
         if name and user_id:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO users (id, nama) VALUES (%s, %s)", (user_id, name))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            st.toast(f"User {name} with ID {user_id} success added!", icon='🎉')
+            submit_write(f"User {name} with ID {user_id} success added!", [f"user:{user_id}"],
+                         get_repository().add_user, user_id, name)
             st.rerun()
         else:
             st.warning("Please fill out all fields.")
@@ -143,15 +53,17 @@ def handle_restore_choice():
     1. Retrieves temporary book data and user choice from Streamlit session state:
        - `temp_book_data`: Contains the book's ID, title, author, status, etc.
        - `restore_or_update_choice`: The user's choice ("Use old data" or "Use new data").
-    2. Connects to the database using `get_connection()`.
-    3. Based on the user's choice:
+    2. Based on the user's choice, calls `restore_book()` on the repository:
        - "Use old data": Sets `is_delete = 0` to un-delete the original record.
        - "Use new data": Updates the book's title, author, and status, and also restores it.
-    4. Commits the changes and resets relevant Streamlit session state flags.
-    5. Displays success toasts and triggers a rerun of the app.
+    3. Resets relevant Streamlit session state flags.
+    4. Displays success toasts and triggers a rerun of the app.
 
     Exception Handling:
-        Catches and displays MySQL connection or query errors.
+        Catches and displays database connection or query errors.
+        The restore only applies while the book is still at the `version` read
+        when it was looked up; if someone else restored or changed it first,
+        shows what it looks like now and cancels the restore.
 
     Requirements:
     - `books` table must include columns: `id`, `judul`, `penulis`, `status`, and `is_delete`.
@@ -161,24 +73,17 @@ def handle_restore_choice():
     Raises:
         Displays an error message in the app UI if a database exception occurs.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    repo = get_repository()
     try:
         data = st.session_state.temp_book_data
         choice = st.session_state.restore_or_update_choice
 
         if choice == "Use old data":
-            cursor.execute("UPDATE books SET is_delete = 0 WHERE id = %s", (data["id"],))
-            conn.commit()
-            st.toast(f"✅ Book '{data['title']}' restored successfully!")
+            repo.restore_book(data["id"], version=data["version"])
+            st.toast(f"✅ Book '{data['old_title']}' restored successfully!")
 
         elif choice == "Use new data":
-            cursor.execute("""
-                UPDATE books
-                SET judul = %s, penulis = %s, status = %s, is_delete = 0
-                WHERE id = %s
-            """, (data["title"], data["author"], data["status"], data["id"]))
-            conn.commit()
+            repo.restore_book(data["id"], data["title"], data["author"], data["status"], version=data["version"])
             st.toast(f"✅ Book '{data['title']}' updated and restored successfully!")
 
         # Reset states
@@ -187,11 +92,99 @@ def handle_restore_choice():
         st.session_state.form_submitted = True
         st.rerun()
 
-    except mysql.connector.Error as e:
+    except ConcurrentModificationError as e:
+        st.session_state.awaiting_restore_choice = False
+        st.session_state.restore_choice_submitted = False
+        st.warning(describe_conflict(e))
+
+    except DB_ERRORS as e:
         st.error(f"❌ Error restoring book: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+
+def describe_conflict(error):
+    """
+    Turns a ConcurrentModificationError into a message telling the librarian
+    what the books look like now, since their change was not saved.
+    """
+    changes = []
+    for book_id, book in error.current.items():
+        if book is None:
+            changes.append(f"book {book_id} no longer exists")
+        elif book["is_delete"]:
+            changes.append(f"book {book_id} was deleted")
+        else:
+            changes.append(f"book {book_id} is now '{book['judul']}' by {book['penulis']}")
+    return f"⚠️ Someone else changed this first, your change was not saved: {'; '.join(changes)}."
+
+def load_cart(user_id):
+    """
+    Returns the borrow cart of a user as (book_id, title) tuples.
+
+    Carts live in the repository's shared state store rather than in the
+    session, so every app process behind a load balancer sees the same cart.
+    """
+    return [tuple(book) for book in get_repository().shared_state.get("cart", user_id, [])]
+
+def save_cart(user_id, cart):
+    """Stores the borrow cart of a user; an empty cart is removed from the store."""
+    if cart:
+        get_repository().shared_state.set("cart", user_id, [list(book) for book in cart])
+    else:
+        get_repository().shared_state.delete("cart", user_id)
+
+def submit_write(label, keys, fn, *args, on_done=None):
+    """
+    Queues a repository write on the background write queue and remembers it
+    in the session, so the script can rerun right away instead of waiting for
+    the database.
+
+    Args:
+        label (str): Toast shown when the write succeeded.
+        keys (list): Rows the write touches, e.g. ["book:12345", "user:7"]; writes
+            sharing a key run one after another in submission order.
+        fn (callable): Repository method to call with *args.
+        on_done (callable | None): Called with the result instead of showing `label`.
+    """
+    job = get_write_queue().submit(label, keys, fn, *args)
+    st.session_state.write_jobs.append({"job": job, "on_done": on_done})
+
+def report_finished_writes():
+    """
+    Shows the outcome of every write of this session that finished since the
+    last rerun and forgets those jobs.
+
+    Workflow:
+    1. Writes rejected because the rows changed meanwhile show what they look like now.
+    2. Writes kept in the offline journal (database unreachable) say so.
+    3. Other failed writes (after retries) are shown as an error with the driver message.
+    4. Successful writes call their `on_done` callback or show their label as a toast.
+    """
+    pending = []
+    for write in st.session_state.write_jobs:
+        job = write["job"]
+        if not job.done():
+            pending.append(write)
+        elif isinstance(job.error, ConcurrentModificationError):
+            st.warning(describe_conflict(job.error))
+        elif isinstance(job.error, WriteJournaled):
+            st.info(f"📴 Saved offline as journal entry {job.error.entry_id}; it is applied once the database is back.")
+        elif job.status == "failed":
+            st.error(f"❌ Could not save change: {job.error}")
+        elif write["on_done"]:
+            write["on_done"](job.result)
+        else:
+            st.toast(f"✅ {job.label}")
+    st.session_state.write_jobs = pending
+
+def write_status():
+    """
+    Polls the session's queued writes every second while any are pending and
+    reruns the app once one finished, so its result and fresh data show up.
+    """
+    pending = [write for write in st.session_state.write_jobs if not write["job"].done()]
+    if len(pending) < len(st.session_state.write_jobs):
+        st.rerun()
+    if pending:
+        st.caption(f"⏳ Saving {len(pending)} change(s) in the background...")
 
 
 # STREAMLIT APP - Simple Management Book App Kominfo
@@ -206,6 +199,33 @@ def handle_restore_choice():
 
 
 st.title("📚 Library Borrow System")
+repo = get_repository()
+## The configured backend's errors; storage.DB_ERRORS would load the MySQL driver on SQLite too
+DB_ERRORS = (*repo.errors, DatabaseUnavailable)
+metrics = repo.instrumentation
+metrics.start_run()
+
+## Pull rows changed by other sessions since the last rerun (idle reruns read almost nothing)
+repo.sync()
+
+## Degraded mode: the database is unreachable, the page shows the last loaded data
+if repo.offline_since is not None:
+    pending = repo.journal.stats()["pending"]
+    st.warning(
+        f"📴 The database is unreachable since {datetime.fromtimestamp(repo.offline_since):%H:%M:%S}. "
+        f"Showing the last loaded data; borrows, returns and new books/users are saved locally "
+        f"({pending} waiting) and applied once it is back."
+    )
+
+## Writes run on the background queue; report the ones that finished since the last rerun
+if "write_jobs" not in st.session_state:
+    st.session_state.write_jobs = []
+report_finished_writes()
+st.fragment(write_status, run_every=1.0 if st.session_state.write_jobs else None)()
+
+## Grid view renders lists as one selectable data grid with batch actions instead of a widget per row
+grid_mode = st.sidebar.toggle("🧮 Grid view", key="grid_mode",
+                              help="Show books and users in one selectable grid, for large catalogues.")
 
 # ---------------------------------- #
 #  1. ADD BOOK SECTION               #
@@ -214,6 +234,8 @@ st.title("📚 Library Borrow System")
 #  --> Restore/Update Old Book       #
 # ---------------------------------- #
 
+metrics.enter_section("Add Book")
+
 # -- Step 1: Initialize the default state of add book function --
 default_states = {
     "show_add_form": False,
@@ -273,21 +295,21 @@ with st.expander("➕ Add New Book", expanded=st.session_state.show_add_form):
 
             ## Change input status and define connection database
             status_value = 1 if new_book_status == "Available" else 0
-            conn = get_connection()
-            cursor = conn.cursor()
 
             try:
                 ## Check for existing ID is soft-delete or not
-                cursor.execute("SELECT is_delete FROM books WHERE id = %s", (new_book_id,))
-                existing = cursor.fetchone()
+                existing = repo.get_book(new_book_id)
 
                 if existing: # --> Soft Delete
-                    if existing[0] == 1:
+                    if existing["is_delete"] == 1:
                         st.session_state.temp_book_data = {
                             "id": new_book_id,
                             "title": new_book_title,
                             "author": new_book_author,
                             "status": status_value,
+                            "old_title": existing["judul"],
+                            "old_author": existing["penulis"],
+                            "version": existing["version"],
                         }
                         st.session_state.awaiting_restore_choice = True
                         st.rerun()
@@ -295,27 +317,21 @@ with st.expander("➕ Add New Book", expanded=st.session_state.show_add_form):
                         st.warning("⚠️ A book with this ID already exists and is active. Please use a different ID.")
 
                 else: # --> Fresh Book
-                    cursor.execute("""
-                        INSERT INTO books (id, judul, penulis, status)
-                        VALUES (%s, %s, %s, %s)
-                    """, (new_book_id, new_book_title, new_book_author, status_value))
-                    conn.commit()
-                    st.success(f"✅ Book {new_book_title} added successfully!")
+                    submit_write(f"Book {new_book_title} added successfully!", [f"book:{new_book_id}"],
+                                 repo.add_book, new_book_id, new_book_title, new_book_author, status_value)
                     st.session_state.form_submitted = True
                     st.rerun()
 
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 st.error(f"❌ Error adding book: {e}")
-
-            finally:
-                cursor.close()
-                conn.close()
         else:
             st.warning("❌ Please fill in all fields.")
 
     # -- Step 3-1: If soft delete, do restore options --
     if st.session_state.awaiting_restore_choice:
-        st.warning("⚠️ This book ID exists but was deleted. Choose an action below:")
+        old_data = st.session_state.temp_book_data
+        st.warning(f"⚠️ This book ID exists but was deleted ('{old_data['old_title']}' by {old_data['old_author']}). "
+                   "Choose an action below:")
         st.radio("What do you want to do with this book ID?",
                  ["Use old data", "Use new data"],
                  key="restore_or_update_choice")
@@ -336,6 +352,55 @@ with st.expander("➕ Add New Book", expanded=st.session_state.show_add_form):
 if st.session_state.restore_choice_submitted:
     handle_restore_choice()
 
+# -- Step 5: Bulk import and export of books or users --
+with st.expander("📦 Bulk Import / Export"):
+    bulk_table = st.radio("Table", ["books", "users"], horizontal=True, key="bulk_table")
+    import_col, export_col = st.columns(2)
+
+    with import_col:
+        upload = st.file_uploader("Import file", type=["csv", "jsonl", "ndjson", "sql"], key="bulk_upload")
+        deleted_options = {"Skip": "skip", "Use old data": "restore", "Use new data": "overwrite"}
+        deleted_choice = st.radio("Soft-deleted book IDs", list(deleted_options), key="bulk_deleted",
+                                  disabled=bulk_table != "books")
+
+        if st.button("📥 Import", key="bulk_import", disabled=upload is None):
+            progress_bar = st.progress(0.0, text="Importing...")
+
+            def show_progress(report):
+                fraction = min(report["bytes_read"] / max(report["total_bytes"], 1), 1.0)
+                progress_bar.progress(fraction, text=f"Importing... {report['read']} records read")
+
+            try:
+                report = bulk.import_file(repo, bulk_table, upload, bulk.detect_format(upload.name),
+                                          deleted=deleted_options[deleted_choice],
+                                          progress=show_progress, total_bytes=upload.size)
+                progress_bar.progress(1.0, text="Done")
+                st.success(f"✅ {report['inserted']} added, {report['updated']} updated, "
+                           f"{report['restored']} restored, {report['skipped_deleted'] + report['skipped']} skipped.")
+                if report["invalid"]:
+                    st.warning(f"⚠️ {report['invalid']} invalid records were not imported.")
+                    st.dataframe(pd.DataFrame(report["errors"], columns=["line", "error"]), hide_index=True)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+            except DB_ERRORS as e:
+                st.error(f"❌ Import stopped, earlier batches were saved: {e}")
+
+    with export_col:
+        export_format = st.selectbox("Export format", ["csv", "jsonl", "sql"], key="bulk_export_format")
+
+        def export_file():
+            ## Written page by page to a temp file that spills to disk, not built as a DataFrame
+            spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode="w+b")
+            text = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+            bulk.export_table(repo, bulk_table, text, export_format)
+            text.flush()
+            text.detach()
+            spool.seek(0)
+            return spool
+
+        st.download_button("📤 Export", data=export_file, file_name=f"{bulk_table}.{export_format}",
+                           mime="text/plain", key="bulk_export")
+
 # ---------------------------------- #
 #  2. VIEW BOOK SECTION              #
 #                                    #
@@ -345,81 +410,154 @@ if st.session_state.restore_choice_submitted:
 #  --> View Book Status              #
 # ---------------------------------- #
 
+metrics.enter_section("Book List")
 st.header("📋 Book List")
 
-# -- Step 1: Load the book database and defined as dataframe --
-books_df = fetch_books()
-books_df = books_df[books_df["is_delete"] == 0]
-books_df["status"] = books_df["status"].map({1: "Available", 0: "Borrowed"})
-
-# -- Step 1-1: Initialize also session state for form edit --
+# -- Step 1: Initialize session state for form edit and paging --
 if "edit_id" not in st.session_state:
     st.session_state.edit_id = None
+if "book_page_cursor" not in st.session_state:
+    st.session_state.book_page_cursor = None
+if "edit_version" not in st.session_state:
+    st.session_state.edit_version = None
+if "grid_edit_versions" not in st.session_state:
+    st.session_state.grid_edit_versions = {}
+
+def reset_book_page():
+    st.session_state.book_page_cursor = None
+
+# -- Step 1-1: Paging and filter controls, filtering happens in SQL --
+status_filter_options = {"All": None, "Available": 1, "Borrowed": 0}
+filter_cols = st.columns([2, 2, 3, 1])
+status_filter = filter_cols[0].selectbox("Status", list(status_filter_options), key="book_status_filter", on_change=reset_book_page)
+if grid_mode:
+    page_size = filter_cols[1].selectbox("Page size", [20, 100, 500, 1000], index=1, key="book_grid_page_size", on_change=reset_book_page)
+else:
+    page_size = filter_cols[1].selectbox("Page size", [10, 20, 50, 100], index=1, key="book_page_size", on_change=reset_book_page)
+jump_id = filter_cols[2].number_input("Jump to Book ID", min_value=0, step=1, value=None, key="book_jump_id")
+if filter_cols[3].button("🔎 Go", key="book_jump_go") and jump_id is not None:
+    st.session_state.book_page_cursor = ("from", int(jump_id))
+    st.rerun()
+book_query = st.text_input("🔍 Search title or author", key="book_search", on_change=reset_book_page)
+
+# -- Step 1-2: Load only the visible page (or the best search matches) of books and defined as dataframe --
+if book_query.strip():
+    books_df = repo.search_books(book_query, status=status_filter_options[status_filter], limit=page_size)
+    has_prev = has_next = False
+else:
+    books_df, has_prev, has_next = repo.list_books_page(
+        page_size=page_size,
+        cursor=st.session_state.book_page_cursor,
+        status=status_filter_options[status_filter],
+    )
+books_df["status"] = books_df["status"].map({1: "Available", 0: "Borrowed"})
 
-# -- Step 2: Make a column/table to display the main body app --
-for index, row in books_df.iterrows():
-    cols = st.columns([1.5, 3, 3, 2, 3, 3])
-
-    cols[0].write(row["id"])
-    cols[1].write(row["judul"])
-    cols[2].write(row["penulis"])
-    cols[3].write(row["status"])
-
-    # Make column for delete section
-    if cols[4].button("🧺 Hapus", key=f"delete_{row['id']}"):
-        conn = get_connection()
-        cursor = conn.cursor()
+if books_df.empty:
+    st.info("📭 No books found.")
+
+# -- Step 1-3: Look up which visible books are borrowed in one query --
+borrowed_ids = repo.active_loans(books_df["id"].tolist())
+
+# -- Step 2: Display the page as one selectable grid, or as a row of widgets per book --
+if grid_mode:
+    ## One grid widget for the whole page, so rendering cost does not grow with the page size
+    books_df["borrowed"] = books_df["id"].isin(borrowed_ids)
+    book_grid = st.dataframe(
+        books_df, key=f"book_grid_{hash(tuple(books_df['id']))}", on_select="rerun", selection_mode="multi-row",
+        hide_index=True, width="stretch",
+        column_config={"id": "ID", "judul": "Title", "penulis": "Author", "status": "Status",
+                       "version": None, "borrowed": st.column_config.CheckboxColumn("Borrowed")},
+    )
 
-        ## Check if the book is currently borrowed
-        cursor.execute("SELECT COUNT(*) FROM transactions WHERE buku_id = %s AND tanggal_kembali IS NULL", (row['id'],))
-        active_borrow_count = cursor.fetchone()[0]
+    ### Borrowed books cannot be deleted or edited, the same as in the row view
+    selected_books = books_df.iloc[book_grid.selection.rows]
+    editable_books = selected_books[~selected_books["borrowed"]]
+    if len(editable_books) < len(selected_books):
+        st.caption(f"{len(selected_books) - len(editable_books)} selected book(s) are borrowed and will be skipped.")
+
+    grid_cols = st.columns([2, 2, 4])
+    if grid_cols[0].button(f"🧺 Hapus selected ({len(editable_books)})", key="grid_delete", disabled=editable_books.empty):
+        def report_bulk_delete(deleted, requested=len(editable_books)):
+            if deleted:
+                st.toast(f"✅ {len(deleted)} book(s) marked as deleted successfully!")
+            if len(deleted) < requested:
+                st.warning(f"⚠️ {requested - len(deleted)} book(s) were borrowed meanwhile and not deleted.")
+
+        delete_ids = editable_books["id"].astype(int).tolist()
+        submit_write("", [f"book:{book_id}" for book_id in delete_ids], repo.soft_delete_books, delete_ids,
+                     on_done=report_bulk_delete)
+        st.rerun()
 
-        if active_borrow_count > 0:
-            st.warning(f"⚠️ Cannot delete '{row['judul']}' because it is currently borrowed!")
-        else:
-            cursor.execute("UPDATE books SET is_delete = 1 WHERE id = %s", (row['id'],))
-            conn.commit()
-            st.success(f"✅ Book {row['judul']} marked as deleted successfully!")
+    if grid_cols[1].button(f"✏️ Edit selected ({len(editable_books)})", key="grid_edit", disabled=editable_books.empty):
+        ## Remember the versions the edit started from, later reruns already show the newer data
+        st.session_state.grid_edit_versions = dict(zip(editable_books["id"].tolist(), editable_books["version"].tolist()))
+
+    ### Edit section for every selected book at once, only the title and author can be changed
+    edit_books = books_df[books_df["id"].isin(st.session_state.grid_edit_versions)][["id", "judul", "penulis"]]
+    if not edit_books.empty:
+        st.subheader(f"✏️ Editing {len(edit_books)} book(s)")
+        edited_books = st.data_editor(edit_books, key="grid_editor", disabled=["id"], hide_index=True, width="stretch")
+
+        if st.button("💾 Save Changes", key="grid_save"):
+            ## Each row carries the version the edit started from, so books changed meanwhile are reported, not overwritten
+            changed = edited_books[(edited_books["judul"] != edit_books["judul"]) | (edited_books["penulis"] != edit_books["penulis"])]
+            if not changed.empty:
+                submit_write(f"{len(changed)} book(s) updated successfully!", [f"book:{book_id}" for book_id in changed["id"]],
+                             repo.update_books, list(changed.assign(version=changed["id"].map(st.session_state.grid_edit_versions))
+                                                     .itertuples(index=False, name=None)))
+            st.session_state.grid_edit_versions = {}
+            st.rerun()
+else:
+    for index, row in books_df.iterrows():
+        cols = st.columns([1.5, 3, 3, 2, 3, 3])
+
+        cols[0].write(row["id"])
+        cols[1].write(row["judul"])
+        cols[2].write(row["penulis"])
+        cols[3].write(row["status"])
+
+        is_borrowed = row["id"] in borrowed_ids
+        borrowed_help = "Currently borrowed" if is_borrowed else None
+
+        # Make column for delete section
+        if cols[4].button("🧺 Hapus", key=f"delete_{row['id']}", disabled=is_borrowed, help=borrowed_help):
+            ## Soft delete only if the book was not borrowed since the page was loaded
+            def report_delete(deleted, title=row['judul']):
+                if deleted:
+                    st.toast(f"✅ Book {title} marked as deleted successfully!")
+                else:
+                    st.warning(f"⚠️ Cannot delete '{title}' because it is currently borrowed!")
+
+            submit_write("", [f"book:{row['id']}"], repo.soft_delete_book, int(row['id']), on_done=report_delete)
             st.rerun()
 
-        cursor.close()
-        conn.close()
-
-    # Make column for edit section
-    if cols[5].button("✏️ Edit", key=f"edit_{row['id']}"):
-        
-        ## Check if book is currently borrowed
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM transactions WHERE buku_id = %s AND tanggal_kembali IS NULL", (row['id'],))
-        active_borrow_count = cursor.fetchone()[0]
-        cursor.close()
-        conn.close()
-
-        if active_borrow_count > 0:
-            st.warning(f"⚠️ Cannot edit {row['judul']} because it is currently borrowed!")
-        else:
+        # Make column for edit section
+        if cols[5].button("✏️ Edit", key=f"edit_{row['id']}", disabled=is_borrowed, help=borrowed_help):
             st.session_state.edit_id = row["id"]
+            st.session_state.edit_version = int(row["version"])
+
+        ## Edit section active if the session state edit True
+        if st.session_state.edit_id == row["id"]:
+            st.subheader(f"✏️ Editing Book ID: {row['id']}")
+            new_title = st.text_input("New Title", value=row["judul"], key=f"title_{row['id']}")
+            new_author = st.text_input("New Author", value=row["penulis"], key=f"author_{row['id']}")
+
+            if st.button("💾 Save Changes", key=f"save_{row['id']}"):
+                ## Saved only if nobody changed the book since Edit was clicked
+                submit_write(f"Book '{new_title}' updated successfully!", [f"book:{row['id']}"],
+                             repo.update_book, int(row["id"]), new_title, new_author, st.session_state.edit_version)
+                st.session_state.edit_id = None
+                st.rerun()
 
-        cursor.close()
-        conn.close()
-
-    ## Edit section active if the session state edit True
-    if st.session_state.edit_id == row["id"]:
-        st.subheader(f"✏️ Editing Book ID: {row['id']}")
-        new_title = st.text_input("New Title", value=row["judul"], key=f"title_{row['id']}")
-        new_author = st.text_input("New Author", value=row["penulis"], key=f"author_{row['id']}")
-
-        if st.button("💾 Save Changes", key=f"save_{row['id']}"):
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE books SET judul = %s, penulis = %s WHERE id = %s", (new_title, new_author, row["id"]))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            st.success(f"✅ Book '{new_title}' updated successfully!")
-            st.session_state.edit_id = None
-            st.rerun()
+
+# -- Step 3: Page navigation --
+nav_cols = st.columns([1, 1, 4])
+if nav_cols[0].button("⬅️ Prev", key="book_page_prev", disabled=not has_prev):
+    st.session_state.book_page_cursor = ("before", int(books_df["id"].iloc[0])) if not books_df.empty else None
+    st.rerun()
+if nav_cols[1].button("Next ➡️", key="book_page_next", disabled=not has_next):
+    st.session_state.book_page_cursor = ("after", int(books_df["id"].iloc[-1]))
+    st.rerun()
 
 
 # ---------------------------------- #
@@ -432,70 +570,133 @@ for index, row in books_df.iterrows():
 #  --> Multiple select books         #
 # ---------------------------------- #
 
+metrics.enter_section("Users")
 st.header("🤼 Users Example")
 
-# -- Step 1: Get and defined users variabel with icon --
-users_df = get_users()
+# -- Step 1: Initialize session state --
 default_icon = "💂🏻‍♀️"
-users_df["icon"] = default_icon
-users_df["display"] = users_df["icon"] + " " + users_df["nama"]
+recent_limit = 6
 
-# -- Step 1-1: Initialize session state --
 if "selected_user_id" not in st.session_state:
     st.session_state.selected_user_id = None
 if "selected_user_display" not in st.session_state:
     st.session_state.selected_user_display = ""
 if "show_add_form_2" not in st.session_state:
     st.session_state.show_add_form_2 = False
+if "user_page_cursors" not in st.session_state:
+    st.session_state.user_page_cursors = []
+if "recent_users" not in st.session_state:
+    st.session_state.recent_users = []
+
+def reset_user_page():
+    st.session_state.user_page_cursors = []
+
+def select_user(user_id, name, display):
+    st.session_state.selected_user_id = int(user_id)
+    st.session_state.selected_user_display = display
+    ## Recently served borrowers stay one click away for this session, without searching again
+    recent = [user for user in st.session_state.recent_users if user[0] != int(user_id)]
+    st.session_state.recent_users = [(int(user_id), name)] + recent[:recent_limit - 1]
+
+# -- Step 1-1: Search the member directory, only the visible page is read --
+search_cols = st.columns([5, 2])
+user_query = search_cols[0].text_input("🔍 Search name or user ID", key="user_search", on_change=reset_user_page)
+user_page_size = search_cols[1].selectbox("Page size", [12, 30, 60], key="user_page_size", on_change=reset_user_page)
+
+user_cursors = st.session_state.user_page_cursors
+users_df, next_user_cursor = repo.search_users(user_query, page_size=user_page_size,
+                                               cursor=user_cursors[-1] if user_cursors else None)
+users_df["display"] = default_icon + " " + users_df["nama"].astype(str)
+
+## Active loan counts come with the page from the precomputed summary table
+has_loans = users_df["active_loans"] > 0
+users_df.loc[has_loans, "display"] += " · 📚 " + users_df.loc[has_loans, "active_loans"].astype(str)
+
+if st.session_state.recent_users:
+    st.caption("🕘 Recent")
+    recent_cols = st.columns(recent_limit)
+    for col, (recent_id, recent_name) in zip(recent_cols, st.session_state.recent_users):
+        if col.button(f"{default_icon} {recent_name}", key=f"recent_user_{recent_id}"):
+            select_user(recent_id, recent_name, f"{default_icon} {recent_name}")
+
+if users_df.empty:
+    st.info("📭 No users found.")
+
+# -- Step 2: Make a new layout users + add user button, or one selectable grid of users --
+if grid_mode:
+    def select_grid_user():
+        ## Only a changed selection picks a user, so a finished borrow/return keeps the user cleared
+        rows = st.session_state[user_grid_key].selection.rows
+        if rows:
+            row = users_df.iloc[rows[0]]
+            select_user(row.id, row.nama, row.display)
+
+    ## The selection resets whenever the listed users change
+    user_grid_key = f"user_grid_{hash(tuple(users_df['id']))}"
+    st.dataframe(
+        users_df[["id", "nama", "active_loans"]],
+        key=user_grid_key, on_select=select_grid_user, selection_mode="single-row", hide_index=True, width="stretch",
+        column_config={"id": "User ID", "nama": "Name", "active_loans": "Active Loans"},
+    )
+    if st.button("➕ Add User", key="show_add_user_btn"):
+        st.session_state.show_add_form_2 = True
+else:
+    num_columns = 3
+    total_buttons = len(users_df) + 1
+    num_rows = math.ceil(total_buttons / num_columns)
+
+    user_index = 0
+    for row_num in range(num_rows):
+        cols = st.columns(num_columns)
+        for col_num in range(num_columns):
+            if user_index < len(users_df):
+                row = users_df.iloc[user_index]
+                with cols[col_num]:
+                    if st.button(row["display"], key=f"user_{row['id']}"):
+                        select_user(row["id"], row["nama"], row["display"])
+                user_index += 1
+            elif user_index == len(users_df):
+                with cols[col_num]:
+                    if st.button("➕ Add User", key="show_add_user_btn"):
+                        st.session_state.show_add_form_2 = True
+                user_index += 1
+
+# -- Step 2-1: Member page navigation, the cursors of the pages before are kept for Prev --
+user_nav_cols = st.columns([1, 1, 4])
+if user_nav_cols[0].button("⬅️ Prev", key="user_page_prev", disabled=not user_cursors):
+    user_cursors.pop()
+    st.rerun()
+if user_nav_cols[1].button("Next ➡️", key="user_page_next", disabled=next_user_cursor is None):
+    user_cursors.append(next_user_cursor)
+    st.rerun()
 
-# -- Step 2: Make a new layout users + add user button --
-num_columns = 3
-total_buttons = len(users_df) + 1
-num_rows = math.ceil(total_buttons / num_columns)
-
-user_index = 0
-for row_num in range(num_rows):
-    cols = st.columns(num_columns)
-    for col_num in range(num_columns):
-        if user_index < len(users_df):
-            row = users_df.iloc[user_index]
-            with cols[col_num]:
-                if st.button(row["display"], key=f"user_{row['id']}"):
-                    st.session_state.selected_user_id = row.id
-                    st.session_state.selected_user_display = row.display
-            user_index += 1
-        elif user_index == len(users_df):
-            with cols[col_num]:
-                if st.button("➕ Add User", key="show_add_user_btn"):
-                    st.session_state.show_add_form_2 = True
-            user_index += 1
-
-# -- Step 2-1: Initialize and active the add user session state --
+# -- Step 2-2: Initialize and active the add user session state --
 if st.session_state.show_add_form_2:
     add_users()
     st.session_state.show_add_form_2 = False
 
 # -- Step 3: Make the users selection and add process --
-if st.session_state.selected_user_id:
+if st.session_state.selected_user_id is not None:
     st.write(f"👤 Selected user: {st.session_state.selected_user_display}")
     user_id = int(st.session_state.selected_user_id)
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Difine the variabel that use for cart method
-    cart_key = f"cart_user_{user_id}"
-    if cart_key not in st.session_state: st.session_state[cart_key] = []
-
     # Make a display for user actions
     tab1, tab2 = st.tabs(["📤 Return Book", "📥 Borrow Book"])
 
     ## Make display for tab1 - Return Book
     with tab1:
+        metrics.enter_section("Return Tab")
+
+        ### Show the user's loan summary and only look up borrowed books when there are any
+        summary = repo.get_user(user_id) or {"active_loans": 0, "total_loans": 0, "overdue_loans": 0, "last_activity": None}
+        summary_cols = st.columns(4)
+        summary_cols[0].metric("Active", summary["active_loans"])
+        summary_cols[1].metric("Overdue", summary["overdue_loans"])
+        summary_cols[2].metric("Total Loans", summary["total_loans"])
+        summary_cols[3].metric("Last Activity", str(summary["last_activity"] or "-"))
 
         ### Get all books taht users borrow
-        cursor.execute("""SELECT b.id, b.judul FROM books b JOIN transactions t ON b.id = t.buku_id WHERE t.user_id = %s AND t.tanggal_kembali IS NULL""", (user_id,))
-        borrowed_books = cursor.fetchall()
+        borrowed_books = repo.borrowed_books(user_id) if summary["active_loans"] else []
 
         ### Do multiselect for the book
         if borrowed_books:
@@ -503,12 +704,10 @@ if st.session_state.selected_user_id:
 
             #### Make a method for confirm book return
             if st.button("🔄 Confirm Return", key="confirm_return", disabled=len(selected_return) == 0):
-                for book in selected_return:
-                    cursor.execute("""UPDATE transactions SET tanggal_kembali = NOW() WHERE buku_id = %s AND user_id = %s AND tanggal_kembali IS NULL""", (book[0], user_id))
-                    cursor.execute("UPDATE books SET status = 1 WHERE id = %s", (book[0],))
-
-                conn.commit()
-                st.toast(f"✅ {len(selected_return)} book(s) returned successfully!")
+                return_ids = [book[0] for book in selected_return]
+                submit_write("", [f"user:{user_id}"] + [f"book:{book_id}" for book_id in return_ids],
+                             repo.return_books, user_id, return_ids,
+                             on_done=lambda returned_count: st.toast(f"✅ {returned_count} book(s) returned successfully!"))
                 st.session_state.selected_user_id = None
                 st.rerun()
         else:
@@ -516,39 +715,45 @@ if st.session_state.selected_user_id:
 
     ## Make display for tab2 - Borrow Book
     with tab2:
+        metrics.enter_section("Borrow Tab")
+
+        ### Make a validation data for cart if the data still valid in cart (one query)
+        valid_cart, removed_books = repo.validate_cart(load_cart(user_id))
 
-        ### Initialize the cart variabel
-        user_cart = st.session_state[cart_key]
-        valid_cart= []
-        removed_books = []
-
-        ### Make a validation data for cart if the data still valid in cart
-        for book in user_cart:
-            book_id, title = book
-            cursor.execute("SELECT status FROM books WHERE id = %s AND is_delete = 0", (book_id,))
-            result = cursor.fetchone()
-            if result and result[0] == 1:
-                valid_cart.append(book)
-            else:
-                removed_books.append(title)
-
-        st.session_state[cart_key] = valid_cart
+        if removed_books:
+            save_cart(user_id, valid_cart)
         user_cart = valid_cart
 
         ### Give a warning or sign that the cart is not valid anymore
         for title in removed_books:
             st.warning(f"❌ Book '{title}' is not longer available and was removed from your cart.")
 
-        ### Get all of the book fetch from database
-        cursor.execute("SELECT id, judul FROM books WHERE status = 1 AND is_delete = 0")
-        available_books = cursor.fetchall()
+        ### Get all of the book fetch from database, or only the best matches when searching
+        borrow_query = st.text_input("🔍 Search available books", key=f"borrow_search_{user_id}")
+        if borrow_query.strip():
+            matches = repo.search_books(borrow_query, status=1)
+            available_books = list(zip(matches["id"].tolist(), matches["judul"].tolist()))
+        else:
+            available_books = repo.available_books()
 
         cart_ids = [b[0] for b in user_cart]
         display_books = [book for book in available_books if book[0] not in cart_ids]
 
         ### Book section for book display
         st.subheader("📚 Available Books")
-        if display_books:
+        if display_books and grid_mode:
+            #### One grid for every available book; the selection resets whenever the listed books change
+            available_df = pd.DataFrame(display_books, columns=["id", "judul"])
+            available_grid = st.dataframe(
+                available_df, key=f"available_grid_{user_id}_{hash(tuple(available_df['id']))}", on_select="rerun",
+                selection_mode="multi-row", hide_index=True, width="stretch",
+                column_config={"id": "ID", "judul": "Title"},
+            )
+            picked = available_grid.selection.rows
+            if st.button(f"🛒 Add selected to cart ({len(picked)})", key=f"add_selected_{user_id}", disabled=not picked):
+                save_cart(user_id, user_cart + [display_books[i] for i in picked])
+                st.rerun()
+        elif display_books:
             for book in display_books:
               book_id, title = book
 
@@ -559,7 +764,7 @@ if st.session_state.selected_user_id:
               with cols[1]:
                   if st.button("🛒", key=f"add_{user_id}_{book_id}"):
                       user_cart.append(book)
-                      st.session_state[cart_key] = user_cart
+                      save_cart(user_id, user_cart)
                       st.rerun()
         else:
             st.warning("❌ No books available for borrowing.")
@@ -576,26 +781,64 @@ if st.session_state.selected_user_id:
                   st.markdown(f"**{title}**")
                 with cols[1]:
                   if st.button("❌", key=f"remove_{user_id}_{book_id}"):
-                      st.session_state[cart_key] = [b for b in user_cart if b[0] != book_id]
+                      save_cart(user_id, [b for b in user_cart if b[0] != book_id])
                       st.rerun()
 
             #### Make a method to confirm borrow after add into chart
             if st.button("✅ Confirm Borrow", key=f"confirm_borrow_all_{user_id}"):
-                with st.spinner("⏳ Processing your borrow..."):
-                    for book in user_cart:
-                        cursor.execute("""INSERT INTO transactions (buku_id, user_id, tanggal_pinjam) VALUES (%s, %s, NOW())""", (book[0], user_id))
-                        cursor.execute("UPDATE books SET status = 0 WHERE id = %s", (book[0],))
-
-                    conn.commit()
+                borrowed_cart = list(user_cart)
+
+                def report_borrow(unavailable, user_id=user_id, borrowed_cart=borrowed_cart):
+                    ##### Someone else borrowed a book first, nothing was borrowed; put the rest back in the cart
+                    if unavailable:
+                        taken_titles = ", ".join([b[1] for b in borrowed_cart if b[0] in unavailable])
+                        save_cart(user_id, [b for b in borrowed_cart if b[0] not in unavailable])
+                        st.error(f"❌ No books were borrowed, these are no longer available: {taken_titles}")
+                    else:
+                        ##### Display a notifications about data that success to borrow
+                        borrow_titles = ", ".join([b[1] for b in borrowed_cart])
+                        st.toast(f"✅ Books borrowed successfully: {borrow_titles}")
 
-                ##### Display a notifications about data that success to borrow
-                borrow_titles = ", ".join([b[1] for b in user_cart])
-                st.toast(f"✅ Books borrowed successfully: {borrow_titles}")
-                st.session_state[cart_key].clear()
+                submit_write("", [f"user:{user_id}"] + [f"book:{b[0]}" for b in borrowed_cart],
+                             repo.borrow_books, user_id, [b[0] for b in borrowed_cart], on_done=report_borrow)
+                save_cart(user_id, [])
                 st.session_state.selected_user_id = None
                 st.rerun()
         else:
           st.info("🛒 Your cart is empty.")
 
-    cursor.close()
-    conn.close()
\ No newline at end of file
+# ---------------------------------- #
+#  4. MONITORING SECTION             #
+#                                    #
+#  --> Connection pool stats         #
+#  --> Read cache stats              #
+#  --> Per-rerun debug panel         #
+# ---------------------------------- #
+
+repo_stats = repo.stats()
+repo_stats["writes"] = get_write_queue().stats()
+stats_titles = {
+    "pool": "🔌 Connection Pool",
+    "replica_pool": "🔌 Replica Connection Pools",
+    "cache": "🗃️ Read Cache",
+    "mirror_books": "🔁 Books Change Feed",
+    "mirror_users": "🔁 Users Change Feed",
+    "search": "🔍 Search Index",
+    "writes": "📝 Write Queue",
+    "shared_state": "🔗 Shared State",
+    "warm_up": "🔥 Warm-up",
+    "replicas": "🪞 Read Replicas",
+    "journal": "📴 Offline Journal",
+}
+for component, component_stats in repo_stats.items():
+    with st.sidebar.expander(stats_titles.get(component, component)):
+        st.json(component_stats)
+
+run = metrics.finish_run(repo_stats)
+
+## Enabled with `debug = true` under [database] or by opening the app with ?debug=1
+if get_database_config().get("debug", False) or st.query_params.get("debug") == "1":
+    with st.sidebar.expander("🐞 Debug: this rerun", expanded=True):
+        st.json(run.summary())
+        st.dataframe(pd.DataFrame(list(run.sections.items()), columns=["section", "ms"]), hide_index=True)
+        st.dataframe(pd.DataFrame(run.queries, columns=["sql", "ms", "rows"]), hide_index=True)
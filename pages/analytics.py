@@ -0,0 +1,79 @@
+import streamlit as st
+
+from app_resources import get_analytics, get_database_config, get_repository
+from storage import DatabaseUnavailable
+from storage.analytics import WINDOWS, window_bounds
+
+# STREAMLIT PAGE - Loan Analytics
+# Every chart is one SQL aggregate, cached per time window for a few minutes
+
+
+st.title("📊 Loan Analytics")
+repo = get_repository()
+analytics = get_analytics()
+metrics = repo.instrumentation
+metrics.start_run()
+
+## In degraded mode, check whether the database is back before querying it
+if repo.offline_since is not None:
+    repo.reconnect()
+
+# ---------------------------------- #
+#  1. WINDOW AND TOTALS              #
+# ---------------------------------- #
+
+metrics.enter_section("Analytics Totals")
+
+window = st.selectbox("Time window", list(WINDOWS), index=1, key="analytics_window")
+start, end = window_bounds(WINDOWS[window])
+st.caption(f"Loans borrowed from {start} to {end}, refreshed every few minutes.")
+
+## Reports are aggregates over the whole loan history and need the database
+try:
+    totals = analytics.totals(start, end)
+except DatabaseUnavailable:
+    st.warning("📴 The database is unreachable; loan analytics are back once it is.")
+    st.stop()
+total_cols = st.columns(3)
+total_cols[0].metric("Loans", totals["loans"])
+total_cols[1].metric("Returned", totals["returned"])
+total_cols[2].metric("Borrowers", totals["borrowers"])
+
+# ---------------------------------- #
+#  2. VOLUME AND DURATION            #
+# ---------------------------------- #
+
+metrics.enter_section("Analytics Volume")
+
+st.subheader("📈 Daily Borrow Volume")
+st.bar_chart(analytics.daily_volume(start, end), x="day", y="loans")
+
+volume_cols = st.columns(2)
+with volume_cols[0]:
+    st.subheader("🕒 Borrows by Hour")
+    st.bar_chart(analytics.hourly_volume(start, end), x="hour", y="loans")
+with volume_cols[1]:
+    st.subheader("⏳ Loan Duration")
+    st.bar_chart(analytics.duration_distribution(start, end), x="duration", y="loans")
+
+# ---------------------------------- #
+#  3. BOOKS AND BORROWERS            #
+# ---------------------------------- #
+
+metrics.enter_section("Analytics Rankings")
+
+st.subheader("🏆 Most Borrowed Books")
+st.dataframe(analytics.most_borrowed(start, end), hide_index=True, width="stretch")
+
+st.subheader("🤼 Active Borrowers")
+st.dataframe(analytics.active_borrowers(), hide_index=True, width="stretch")
+
+loan_days = int(get_database_config().get("loan_days", 14))
+st.subheader(f"⚠️ Overdue Loans (more than {loan_days} days)")
+overdue_df = analytics.overdue_loans(loan_days)
+if overdue_df.empty:
+    st.info("✅ No overdue loans.")
+else:
+    st.dataframe(overdue_df, hide_index=True, width="stretch")
+
+metrics.finish_run(repo.stats())
@@ -0,0 +1,145 @@
+"""
+Data-access layer for the Library Borrow System.
+
+The Streamlit UI only calls LibraryRepository methods; create_repository()
+picks the backend from the [database] section of secrets.toml:
+
+    backend = "mysql"   # default, uses host/name/port/user/password
+    backend = "sqlite"  # local file or in-memory database
+    path = "library.db" # SQLite only, defaults to ":memory:"
+"""
+
+import importlib
+import sqlite3
+
+from storage.base import ConcurrentModificationError, LibraryRepository, SQLRepository
+from storage.cache import ReadCache
+from storage.instrumentation import Instrumentation
+from storage.journal import DatabaseUnavailable, WriteJournal, WriteJournaled, is_unavailable
+from storage.routing import Replica, ReplicaRouter
+from storage.shared_state import MemorySharedState, SQLiteSharedState, create_shared_state
+from storage.sqlite_repository import SQLiteRepository
+
+
+## Loaded on first use, so SQLite deployments never import the MySQL driver
+_MYSQL_EXPORTS = {
+    "MySQLRepository": "storage.mysql_repository",
+    "ConnectionPool": "storage.pool",
+    "PooledConnection": "storage.pool",
+}
+
+
+def __getattr__(name):
+    if name in _MYSQL_EXPORTS:
+        return getattr(importlib.import_module(_MYSQL_EXPORTS[name]), name)
+    if name == "DB_ERRORS":
+        import mysql.connector
+        return (mysql.connector.Error, sqlite3.Error, DatabaseUnavailable)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_repository(config):
+    """
+    Builds the repository described by a [database] config mapping.
+
+    Workflow:
+    1. Creates the shared state store (shared_state, shared_state_path), the read
+       cache on top of it (cache_ttl, cache_max_entries) and the instrumentation
+       (slow_query_ms, metrics_file, metrics_port), and reads the loan summary and
+       archival settings (loan_days, summary_refresh_interval, archive_after_days,
+       archive_batch_size, change_log_retention), where mirror snapshots go (snapshot_dir) and the read
+       replicas (replicas, max_replica_lag, replica_check_interval; see storage.routing)
+       and the offline journal (journal_path, offline_retry_interval; see storage.journal).
+    2. Creates the MySQL or SQLite repository depending on `backend`.
+    3. Applies pending migrations (always on SQLite; on MySQL unless `auto_migrate = false`).
+       With a journal, an unreachable database starts the repository in degraded mode instead.
+    4. Seeds an empty SQLite database from the `database/*.sql` dumps unless `seed_dumps = false`.
+    5. Starts the local /metrics endpoint when `metrics_port` is set.
+
+    Args:
+        config (dict): Database settings, usually dict(st.secrets["database"]).
+
+    Returns:
+        LibraryRepository: Ready-to-use repository.
+    """
+    shared_state = create_shared_state(config)
+    cache = ReadCache(
+        ttl = float(config.get("cache_ttl", 60)),
+        max_entries = int(config.get("cache_max_entries", 64)),
+        shared = shared_state,
+    )
+
+    instrumentation = Instrumentation(
+        slow_query_ms = float(config.get("slow_query_ms", 200)),
+        metrics_file = config.get("metrics_file"),
+    )
+
+    options = {
+        "loan_days": int(config.get("loan_days", 14)),
+        "summary_interval": float(config.get("summary_refresh_interval", 300)),
+        "archive_after_days": int(config["archive_after_days"]) if config.get("archive_after_days") else None,
+        "archive_batch_size": int(config.get("archive_batch_size", 1000)),
+        "shared_state": shared_state,
+        "snapshot_dir": config.get("snapshot_dir"),
+        "replicas": list(config.get("replicas", ())),
+        "max_replica_lag": float(config.get("max_replica_lag", 5)),
+        "replica_check_interval": float(config.get("replica_check_interval", 2)),
+        "journal": WriteJournal(config["journal_path"]) if config.get("journal_path") else None,
+        "offline_retry_interval": float(config.get("offline_retry_interval", 15)),
+        "change_log_retention": float(config.get("change_log_retention", 86400)),
+    }
+
+    if config.get("backend", "mysql") == "sqlite":
+        repo = SQLiteRepository(config.get("path", ":memory:"), cache=cache, instrumentation=instrumentation, **options)
+        repo.migrate()
+        if config.get("seed_dumps", True):
+            repo.seed_from_dumps()
+    else:
+        from storage.mysql_repository import MySQLRepository
+        repo = MySQLRepository(config, cache=cache, instrumentation=instrumentation, **options)
+        if config.get("auto_migrate", True):
+            try:
+                repo.migrate()
+            except repo.errors as e:
+                if repo.journal is None or not is_unavailable(e):
+                    raise
+                repo.go_offline(e)
+
+    if config.get("metrics_port"):
+        instrumentation.serve(int(config["metrics_port"]), extra_gauges=repo.stats)
+    return repo
+
+
+def load_secrets(path):
+    """Reads the [database] section of a secrets.toml file outside Streamlit."""
+    try:
+        import tomllib
+        with open(path, "rb") as fh:
+            return tomllib.load(fh)["database"]
+    except ImportError:
+        import toml
+        return toml.load(path)["database"]
+
+
+__all__ = [
+    "DB_ERRORS",
+    "ConcurrentModificationError",
+    "ConnectionPool",
+    "DatabaseUnavailable",
+    "Instrumentation",
+    "LibraryRepository",
+    "MemorySharedState",
+    "MySQLRepository",
+    "PooledConnection",
+    "ReadCache",
+    "Replica",
+    "ReplicaRouter",
+    "SQLRepository",
+    "SQLiteRepository",
+    "SQLiteSharedState",
+    "WriteJournal",
+    "WriteJournaled",
+    "create_repository",
+    "create_shared_state",
+    "load_secrets",
+]
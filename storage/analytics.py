@@ -0,0 +1,189 @@
+"""
+Loan analytics computed with SQL aggregates over the transaction log.
+
+Every report is a GROUP BY that returns at most a few hundred rows, so the
+database does the heavy lifting through the (tanggal_pinjam, ...) covering
+indexes and pandas only shapes the small results. Loans in the window are read
+from both `transactions` and `transactions_archive`, so archival does not change
+any report. Results are cached per report and time window.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from storage.cache import ReadCache
+
+
+WINDOWS = {
+    "Last 7 days": 7,
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+    "Last 365 days": 365,
+    "All time": None,
+}
+
+DURATION_BINS = [0, 1, 3, 7, 14, 30, 60, 90, np.inf]
+DURATION_LABELS = ["< 1 day", "1-2 days", "3-6 days", "1-2 weeks", "2-4 weeks", "1-2 months", "2-3 months", "3+ months"]
+
+
+def window_bounds(days, now=None):
+    """
+    Returns (start, end) strings for the last `days` days, or since the first
+    possible date when `days` is None.
+
+    The end is rounded up to the next full hour, so every rerun within the same
+    hour asks for the same window and hits the cache.
+    """
+    now = now or datetime.now()
+    end = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    start = end - timedelta(days=days) if days is not None else datetime(1970, 1, 1)
+    return start.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class LoanAnalytics:
+    """
+    Reports over loans borrowed within a [start, end) window.
+
+    Workflow:
+    1. Each report runs one aggregate query over the live and archived loans
+       borrowed in the window.
+    2. The result is cached under (report, start, end) for `ttl` seconds; it is
+       not invalidated by borrow/return, a few minutes of staleness is fine here.
+
+    Args:
+        repo (LibraryRepository): Runs the report queries through read_frame().
+        ttl (float): Seconds a report stays cached.
+    """
+
+    def __init__(self, repo, ttl=300):
+        self.repo = repo
+        self.cache = ReadCache(ttl=ttl, max_entries=256)
+
+    def _cached(self, report, start, end, load):
+        return self.cache.get_or_load("analytics", (report, start, end), load)
+
+    def _frame(self, sql, params):
+        ## Not cached by the repository: reports are cached here for `ttl` instead of until the next loan
+        return self.repo.read_frame(sql, params)
+
+    @staticmethod
+    def _loans(start, end):
+        """
+        Returns a derived table of the live and archived loans borrowed in the
+        window, with the window filter inside each branch so both use their index.
+        """
+        columns = "buku_id, user_id, tanggal_pinjam, tanggal_kembali"
+        window = "WHERE tanggal_pinjam >= %s AND tanggal_pinjam < %s"
+        sql = (f"(SELECT {columns} FROM transactions {window} "
+               f"UNION ALL SELECT {columns} FROM transactions_archive {window}) loans")
+        return sql, (start, end, start, end)
+
+    def _date_part(self, part):
+        if self.repo.dialect == "sqlite":
+            return {"day": "DATE(tanggal_pinjam)", "hour": "CAST(strftime('%H', tanggal_pinjam) AS INTEGER)"}[part]
+        return {"day": "DATE(tanggal_pinjam)", "hour": "HOUR(tanggal_pinjam)"}[part]
+
+    def _days_on_loan(self):
+        if self.repo.dialect == "sqlite":
+            return "CAST(julianday(tanggal_kembali) - julianday(tanggal_pinjam) AS INTEGER)"
+        return "DATEDIFF(tanggal_kembali, tanggal_pinjam)"
+
+    @staticmethod
+    def _totals_sql(start, end):
+        loans, params = LoanAnalytics._loans(start, end)
+        return f"SELECT COUNT(*), COUNT(tanggal_kembali), COUNT(DISTINCT user_id) FROM {loans}", params
+
+    @staticmethod
+    def _most_borrowed_sql(start, end, limit):
+        loans, params = LoanAnalytics._loans(start, end)
+        return ("SELECT b.id, b.judul, b.penulis, top.loans FROM ("
+                f"  SELECT buku_id, COUNT(*) AS loans FROM {loans}"
+                "  GROUP BY buku_id ORDER BY loans DESC LIMIT %s"
+                ") top JOIN books b ON b.id = top.buku_id ORDER BY top.loans DESC, b.id", (*params, limit))
+
+    # --- Reports ---
+    def totals(self, start, end):
+        """Returns loans, returned loans and distinct borrowers in the window."""
+        def load():
+            total, returned, borrowers = self._frame(*self._totals_sql(start, end)).iloc[0].tolist()
+            return {"loans": total, "returned": returned, "borrowers": borrowers}
+
+        return self._cached("totals", start, end, load)
+
+    def most_borrowed(self, start, end, limit=10):
+        """Returns the `limit` most borrowed books (id, judul, penulis, loans)."""
+        def load():
+            return self._frame(*self._most_borrowed_sql(start, end, limit))
+
+        return self._cached(("most_borrowed", limit), start, end, load)
+
+    def duration_distribution(self, start, end):
+        """Returns returned loans per duration bucket (duration, loans)."""
+        def load():
+            loans, params = self._loans(start, end)
+            per_day = self._frame(
+                f"SELECT {self._days_on_loan()} AS days, COUNT(*) AS loans FROM {loans} "
+                "WHERE tanggal_kembali IS NOT NULL GROUP BY days",
+                params,
+            )
+            buckets = pd.cut(per_day["days"].astype(float), DURATION_BINS, right=False, labels=DURATION_LABELS)
+            return (per_day.groupby(buckets, observed=False)["loans"].sum()
+                    .rename_axis("duration").reset_index())
+
+        return self._cached("duration_distribution", start, end, load)
+
+    def daily_volume(self, start, end):
+        """Returns loans per calendar day (day, loans), including days without loans."""
+        def load():
+            loans, params = self._loans(start, end)
+            df = self._frame(f"SELECT {self._date_part('day')} AS day, COUNT(*) AS loans FROM {loans} GROUP BY day", params)
+            df["day"] = pd.to_datetime(df["day"])
+            ## "All time" starts at the first day with a loan rather than in 1970
+            first = max(pd.Timestamp(start), df["day"].min()) if not df.empty else pd.Timestamp(start)
+            days = pd.date_range(first.normalize(), pd.Timestamp(end), freq="D", inclusive="left")
+            return (df.set_index("day")["loans"].reindex(days, fill_value=0)
+                    .rename_axis("day").reset_index())
+
+        return self._cached("daily_volume", start, end, load)
+
+    def hourly_volume(self, start, end):
+        """Returns loans per hour of the day (hour, loans) for all 24 hours."""
+        def load():
+            loans, params = self._loans(start, end)
+            df = self._frame(f"SELECT {self._date_part('hour')} AS hour, COUNT(*) AS loans FROM {loans} GROUP BY hour", params)
+            return (df.set_index(df["hour"].astype(int))["loans"].reindex(range(24), fill_value=0)
+                    .rename_axis("hour").reset_index())
+
+        return self._cached("hourly_volume", start, end, load)
+
+    def active_borrowers(self, limit=20):
+        """Returns the users with the most open loans, read from user_loan_summary."""
+        def load():
+            return self._frame(
+                "SELECT s.user_id, u.nama, s.active_loans, s.overdue_loans, s.last_activity "
+                "FROM user_loan_summary s JOIN users u ON u.id = s.user_id "
+                "WHERE s.active_loans > 0 ORDER BY s.active_loans DESC, s.user_id LIMIT %s",
+                (limit,),
+            )
+
+        return self._cached(("active_borrowers", limit), None, None, load)
+
+    def overdue_loans(self, loan_days, limit=100):
+        """Returns open loans older than `loan_days`, oldest first."""
+        cutoff = (datetime.now() - timedelta(days=loan_days)).strftime("%Y-%m-%d %H:00:00")
+
+        def load():
+            df = self._frame(
+                "SELECT t.buku_id, b.judul, t.user_id, u.nama, t.tanggal_pinjam "
+                "FROM transactions t JOIN books b ON b.id = t.buku_id JOIN users u ON u.id = t.user_id "
+                "WHERE t.tanggal_kembali IS NULL AND t.tanggal_pinjam < %s "
+                "ORDER BY t.tanggal_pinjam LIMIT %s",
+                (cutoff, limit),
+            )
+            df["tanggal_pinjam"] = pd.to_datetime(df["tanggal_pinjam"])
+            df["days_out"] = (pd.Timestamp.now() - df["tanggal_pinjam"]).dt.days
+            return df
+
+        return self._cached(("overdue_loans", limit), cutoff, None, load)
@@ -0,0 +1,39 @@
+"""
+Command-line archival of old closed loans.
+
+Moves loans returned more than N days ago from `transactions` to
+`transactions_archive` in bounded batches (see SQLRepository.archive_closed_loans),
+so the active-loan queries keep working on a small table. Analytics and the
+per-user loan summary read both tables, so nothing is lost from the reports.
+
+Usage (from the repository root, e.g. from a nightly cron job):
+    python -m storage.archive --older-than 365 --secrets .streamlit/secrets.toml
+    python -m storage.archive --older-than 365 --sqlite library.db --batch-size 500
+"""
+
+import argparse
+import sys
+
+
+def main(argv=None):
+    from storage import create_repository, load_secrets
+
+    parser = argparse.ArgumentParser(description="Archive closed loans older than a given age.")
+    parser.add_argument("--older-than", type=int, required=True, help="days since the book was returned")
+    parser.add_argument("--secrets", help="secrets.toml with a [database] section; defaults to SQLite")
+    parser.add_argument("--sqlite", default="library.db", help="SQLite file used without --secrets")
+    parser.add_argument("--batch-size", type=int, default=1000, help="loans moved per transaction")
+    parser.add_argument("--max-batches", type=int, help="stop after this many batches")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    args = parser.parse_args(argv)
+
+    config = load_secrets(args.secrets) if args.secrets else {"backend": "sqlite", "path": args.sqlite}
+    repo = create_repository(config)
+    archived = repo.archive_closed_loans(args.older_than, batch_size=args.batch_size,
+                                         max_batches=args.max_batches, pause=args.pause)
+    print(f"Archived {archived} closed loans returned more than {args.older_than} days ago")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1796 @@
+"""
+Repository interface for books, users and transactions, plus the SQL
+implementation shared by the MySQL and SQLite backends.
+"""
+
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from storage.cache import ReadCache
+from storage.change_feed import TableMirror
+from storage.instrumentation import Instrumentation
+from storage.journal import DatabaseUnavailable, is_conflict, is_unavailable, journaled
+from storage.migrations import apply_migrations, rebuild_loan_summary
+from storage.routing import Replica, ReplicaRouter
+from storage.search import BookSearchIndex
+from storage.shared_state import MemorySharedState
+from storage.snapshot import STRING_DTYPE, compact_frame
+
+
+logger = logging.getLogger("library.maintenance")
+
+BIGINT_MAX = 2 ** 63 - 1
+
+## Shorter ID prefixes are searched with one scan in ID order instead of one range per ID length
+MIN_ID_RANGE_PREFIX = 3
+
+
+def id_prefix_ranges(prefix, start=0):
+    """
+    Splits the IDs starting with the digits `prefix` into one (low, high) range
+    per ID length ("12" is 12, 120-129, 1200-1299, ...), in ascending order and
+    up to BIGINT, leaving out IDs below `start`.
+
+    Returns:
+        list: Disjoint (low, high) tuples, inclusive on both ends.
+    """
+    ## IDs have no leading zeros, so "0" only matches 0 itself
+    if prefix.startswith("0"):
+        scales = [1] if prefix == "0" else []
+    else:
+        scales = [10 ** extra for extra in range(20 - len(prefix))]
+    ranges = []
+    for scale in scales:
+        low, high = int(prefix) * scale, min((int(prefix) + 1) * scale - 1, BIGINT_MAX)
+        if low > BIGINT_MAX:
+            break
+        if high >= start:
+            ranges.append((max(low, start), high))
+    return ranges
+
+## Columns of the mirrored tables, for the empty copies served in degraded mode before a first load
+MIRROR_COLUMNS = {
+    "books": {"id": "int64", "judul": STRING_DTYPE, "penulis": STRING_DTYPE, "status": "int64", "is_delete": "int64",
+              "version": "int64"},
+    "users": {"id": "int64", "nama": STRING_DTYPE},
+}
+
+
+class ConcurrentModificationError(Exception):
+    """
+    Raised by a conditional write when a row is no longer at the version the
+    caller read, i.e. another session changed it in the meantime. Nothing of
+    the write was applied.
+
+    Attributes:
+        table (str): Table of the conflicting rows.
+        current (dict): Row ID -> the row as it is now (dict), or None when it no longer exists.
+    """
+
+    def __init__(self, table, current):
+        self.table = table
+        self.current = current
+        super().__init__(f"{table} row(s) changed since they were read: {', '.join(str(row_id) for row_id in current)}")
+
+class LibraryRepository(ABC):
+    """
+    High-level data operations used by the Streamlit UI.
+
+    The UI script only talks to this interface, so the same page runs against a
+    remote MySQL host or a local SQLite file, and benchmarks can drive the exact
+    operations the UI performs.
+    """
+
+    # --- Books ---
+    @abstractmethod
+    def list_books(self):
+        """Returns every book (deleted ones included) as a DataFrame."""
+
+    @abstractmethod
+    def list_books_page(self, page_size=20, cursor=None, status=None):
+        """Returns (DataFrame, has_prev, has_next) for one keyset page of active books."""
+
+    @abstractmethod
+    def get_book(self, book_id):
+        """Returns the book row as a dict, or None when the ID is unknown."""
+
+    @abstractmethod
+    def add_book(self, book_id, title, author, status):
+        """Inserts a new book."""
+
+    @abstractmethod
+    def update_book(self, book_id, title, author, version=None):
+        """Changes the title and author of a book, only while it is at `version` if given."""
+
+    @abstractmethod
+    def update_books(self, rows):
+        """Changes title and author of several books given as (id, judul, penulis, version) rows."""
+
+    @abstractmethod
+    def soft_delete_book(self, book_id):
+        """Marks a book deleted unless it is borrowed; returns True when deleted."""
+
+    @abstractmethod
+    def soft_delete_books(self, book_ids):
+        """Marks the books that are not borrowed deleted; returns the deleted IDs."""
+
+    @abstractmethod
+    def restore_book(self, book_id, title=None, author=None, status=None, version=None):
+        """Un-deletes a book, optionally overwriting its data, only while it is at `version` if given."""
+
+    @abstractmethod
+    def available_books(self):
+        """Returns (id, judul) tuples of books that can be borrowed."""
+
+    @abstractmethod
+    def search_books(self, query, status=None, limit=50):
+        """Returns active books matching query in title or author, best match first."""
+
+    # --- Users ---
+    @abstractmethod
+    def list_users(self):
+        """Returns every user as a DataFrame."""
+
+    @abstractmethod
+    def search_users(self, query="", page_size=20, cursor=None):
+        """Returns one page of users whose name or ID starts with query, and the next page's cursor."""
+
+    @abstractmethod
+    def get_user(self, user_id):
+        """Returns one user with their loan summary as a dict, or None."""
+
+    @abstractmethod
+    def add_user(self, user_id, name):
+        """Inserts a new user."""
+
+    # --- Transactions ---
+    @abstractmethod
+    def active_loans(self, book_ids):
+        """Returns the subset of book_ids that are currently borrowed."""
+
+    @abstractmethod
+    def validate_cart(self, cart):
+        """Splits a cart of (id, title) tuples into (valid_cart, removed_titles)."""
+
+    @abstractmethod
+    def borrowed_books(self, user_id):
+        """Returns (id, judul) tuples of books the user has not returned yet."""
+
+    @abstractmethod
+    def borrow_books(self, user_id, book_ids):
+        """Borrows all books atomically; returns the IDs that were unavailable."""
+
+    @abstractmethod
+    def return_books(self, user_id, book_ids):
+        """Returns the user's open loans for book_ids; returns how many were closed."""
+
+    @abstractmethod
+    def loan_summary(self):
+        """Returns {user_id: summary dict} with active, total and overdue loans and last activity."""
+
+    # --- Bulk import/export ---
+    @abstractmethod
+    def import_books(self, rows, deleted="skip"):
+        """Upserts a batch of (id, judul, penulis, status) tuples in one transaction."""
+
+    @abstractmethod
+    def import_users(self, rows):
+        """Upserts a batch of (id, nama) tuples in one transaction."""
+
+    @abstractmethod
+    def iter_rows(self, table, columns, batch_size=1000):
+        """Yields lists of row tuples of a whole table in ID order, one page at a time."""
+
+    # --- Reports ---
+    @abstractmethod
+    def read_frame(self, sql, params=(), table=None):
+        """Runs a read-only report query and returns its rows as a DataFrame."""
+
+    # --- Change feed ---
+    @abstractmethod
+    def sync(self):
+        """Pulls changes made by other sessions or processes; returns {table: changed ids}."""
+
+    # --- Maintenance ---
+    @abstractmethod
+    def migrate(self):
+        """Applies pending schema migrations; returns the applied versions."""
+
+    @abstractmethod
+    def stats(self):
+        """Returns monitoring counters grouped by component."""
+
+
+class SQLRepository(LibraryRepository):
+    """
+    LibraryRepository implemented with plain DB-API calls.
+
+    SQL is written once in MySQL style; backends describe their dialect with a
+    few class attributes and provide connection() and begin():
+
+    - `placeholder`: parameter marker replacing `%s`
+    - `now`: expression replacing `{now}`
+    - `lock`: row-locking suffix replacing `{lock}` (empty where unsupported)
+    - `ignore`: keyword replacing `{ignore}` in `INSERT {ignore} INTO` (skip duplicate keys)
+    - `errors`: driver exception types
+
+    Reads go through a ReadCache keyed per table, and every write invalidates
+    the tables it touched after commit. Writes to books and users also append
+    to `change_log` in the same transaction, which keeps the in-memory
+    TableMirror copies of those tables current across sessions and processes. Connection checkouts, statements and
+    DataFrame conversions are reported to an Instrumentation instance.
+
+    With `replicas`, reads outside write transactions go to a ReplicaRouter,
+    which sends them to a replica that has caught up with this process's writes
+    and falls back to the primary otherwise.
+
+    With a `journal`, losing the primary switches to degraded mode instead of
+    failing (see storage.journal): reads come from the mirrors and the read
+    cache, borrow/return/add writes are journaled, and sync() replays the
+    journal once the primary answers again.
+
+    Borrow and return keep `user_loan_summary` current in the same transaction;
+    overdue counts also change with time, so sync() refreshes them periodically.
+
+    The filtered statements of the hot paths are built by `_*_sql()` methods
+    returning (sql, params), so storage.migrations.check_query_plans() EXPLAINs
+    exactly the SQL that runs.
+
+    Args:
+        cache (ReadCache | None): Read cache shared by this repository.
+        instrumentation (Instrumentation | None): Receives query and checkout timings.
+        loan_days (int): Days after which an open loan counts as overdue.
+        summary_interval (float): Seconds between two maintenance runs (overdue refresh, change log
+            pruning and archive batch), see maintain().
+        archive_after_days (int | None): Archive closed loans returned more than this many
+            days ago, one batch per refresh; None disables archival from the app.
+        archive_batch_size (int): Loans moved per archive transaction.
+        shared_state (MemorySharedState | None): Store for state shared between app processes
+            (borrow carts); defaults to the read cache's store, or an in-process one.
+        snapshot_dir (str | None): Directory for the Parquet snapshots of the mirrored tables
+            (see storage.snapshot); None keeps them in memory only.
+        replicas (list): Read replica endpoints in the backend's format, see replica_endpoint().
+        max_replica_lag (float): Seconds a replica may trail the primary and still serve reads.
+        replica_check_interval (float): Seconds between two replication checks.
+        journal (WriteJournal | None): Offline write journal; None fails writes while the database is down.
+        offline_retry_interval (float): Seconds between two reconnect attempts in degraded mode.
+        change_log_retention (float): Seconds a change log entry is kept at least, see prune_change_log().
+    """
+
+    dialect = None
+    placeholder = "%s"
+    now = "NOW()"
+    lock = " FOR UPDATE"
+    ignore = "IGNORE"
+    ## Makes name comparisons case-insensitive like LIKE; MySQL's default collation already is
+    nocase = ""
+    errors = ()
+    ## Identifies the database in snapshot files; None (e.g. an in-memory database) disables snapshots
+    source = None
+
+    def __init__(self, cache=None, instrumentation=None, loan_days=14, summary_interval=300,
+                 archive_after_days=None, archive_batch_size=1000, shared_state=None, snapshot_dir=None,
+                 replicas=(), max_replica_lag=5.0, replica_check_interval=2.0, journal=None,
+                 offline_retry_interval=15, change_log_retention=86400):
+        self.cache = cache or ReadCache()
+        self.shared_state = shared_state or self.cache.shared or MemorySharedState()
+        self.instrumentation = instrumentation or Instrumentation()
+        self.loan_days = loan_days
+        self.summary_interval = summary_interval
+        self.archive_after_days = archive_after_days
+        self.archive_batch_size = archive_batch_size
+        self.archived = 0
+        self.change_log_retention = change_log_retention
+        self.change_log_pruned = 0
+        self.warm_up_ms = {}
+        self._overdue_refreshed = None
+        self._maintained = None
+        self._maintenance = None
+        self._maintenance_lock = threading.Lock()
+        self.journal = journal
+        self.offline_retry_interval = offline_retry_interval
+        self.offline_since = None
+        self.offline_error = None
+        self._offline_probed = 0.0
+        self._replay_lock = threading.Lock()
+        self.router = None
+        if replicas:
+            self.router = ReplicaRouter(
+                [Replica(*self.replica_endpoint(endpoint)) for endpoint in replicas],
+                max_lag = max_replica_lag,
+                check_interval = replica_check_interval,
+            )
+        self.mirrors = {
+            table: TableMirror(self, table, snapshot_path=os.path.join(snapshot_dir, f"{table}.parquet") if snapshot_dir else None)
+            for table in ("books", "users")
+        }
+        self.search_index = BookSearchIndex()
+        self.mirrors["books"].listeners.append(self._update_search_index)
+
+    @abstractmethod
+    def connection(self):
+        """Context manager yielding a DB-API connection."""
+
+    @abstractmethod
+    def begin(self, conn):
+        """Starts an explicit write transaction on conn."""
+
+    def replica_endpoint(self, endpoint):
+        """
+        Returns (name, connection) for one entry of `replicas`, where connection()
+        yields a read-only connection like connection() does.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support read replicas")
+
+    def _sql(self, sql):
+        sql = sql.replace("{now}", self.now).replace("{lock}", self.lock).replace("{ignore}", self.ignore)
+        sql = sql.replace("{nocase}", self.nocase)
+        if self.placeholder != "%s":
+            sql = sql.replace("%s", self.placeholder)
+        return sql
+
+    @staticmethod
+    def _marks(values):
+        return ", ".join(["%s"] * len(values))
+
+    @contextmanager
+    def _connection(self, connection=None):
+        """
+        Checks out a connection to the primary, or from `connection` (a replica).
+
+        Raises:
+            DatabaseUnavailable: In degraded mode, or when the primary cannot be reached and a journal is set.
+        """
+        primary = connection is None
+        if primary and self.offline_since is not None:
+            raise DatabaseUnavailable(self.offline_error)
+        ## Checkout time is measured separately from the statements run on it
+        with ExitStack() as stack:
+            try:
+                with self.instrumentation.time_connect():
+                    conn = stack.enter_context((connection or self.connection)())
+            except self.errors as e:
+                if primary and self.journal is not None and is_unavailable(e):
+                    self.go_offline(e)
+                    raise DatabaseUnavailable(str(e)) from e
+                raise
+            yield conn
+
+    def _run(self, cursor, sql, params=(), many=False, fetch=False):
+        sql = self._sql(sql)
+        started = time.perf_counter()
+        if many:
+            cursor.executemany(sql, params)
+        else:
+            cursor.execute(sql, tuple(params))
+        rows = cursor.fetchall() if fetch else None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.instrumentation.record_query(sql, params, elapsed_ms, len(rows) if fetch else cursor.rowcount)
+        return rows
+
+    def _begin(self, conn):
+        self.begin(conn)
+        self.instrumentation.record_round_trip()
+
+    def _commit(self, conn):
+        conn.commit()
+        self.instrumentation.record_round_trip()
+
+    def _query(self, sql, params=(), floor=0, primary=False):
+        """
+        Runs a read and returns (rows, column names).
+
+        Args:
+            floor (int): Change log id the read has to reflect; replicas behind it are skipped.
+            primary (bool): Always read from the primary, e.g. for checks against concurrent writes.
+        """
+        replica = None if primary or self.router is None else self.router.pick(floor)
+        if replica is not None:
+            try:
+                return self._query_on(replica.connection, sql, params)
+            except self.errors:
+                ## Skip it for a while; the primary answers this read
+                self.router.fail(replica)
+        try:
+            return self._query_on(None, sql, params)
+        except self.errors as e:
+            ## A connection lost mid-query also means the primary is gone
+            if self.journal is not None and is_unavailable(e):
+                self.go_offline(e)
+                raise DatabaseUnavailable(str(e)) from e
+            raise
+
+    def _query_on(self, connection, sql, params):
+        with self._connection(connection) as conn:
+            cursor = conn.cursor()
+            rows = self._run(cursor, sql, params, fetch=True)
+            cols = [desc[0] for desc in cursor.description]
+            cursor.close()
+        return rows, cols
+
+    def _write(self, sql, params, table, row_ids):
+        """
+        Runs one modifying statement and logs the touched rows to `change_log`
+        in the same transaction; nothing is logged when no row was affected.
+
+        Returns:
+            int: The statement's rowcount.
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self._begin(conn)
+                self._run(cursor, sql, params)
+                rowcount = cursor.rowcount
+                if rowcount > 0:
+                    self._log_changes(cursor, table, row_ids)
+                self._commit(conn)
+            except self.errors:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        return rowcount
+
+    def _log_changes(self, cursor, table, row_ids):
+        self._run(cursor,
+            "INSERT INTO change_log (table_name, row_id, changed_at) VALUES (%s, %s, {now})",
+            [(table, int(row_id)) for row_id in row_ids], many=True)
+
+    def _invalidate(self, *tables):
+        if self.router is not None:
+            ## Read-your-writes: replicas serve reads again once they have this commit
+            self.router.raise_floor(self.change_version())
+        self.cache.invalidate(*tables)
+        for table in tables:
+            if table in self.mirrors:
+                self.mirrors[table].mark_dirty()
+
+    def _conflict(self, table, row_ids, versions=None):
+        """
+        Raises ConcurrentModificationError for the rows a conditional write missed.
+
+        Only called after the write matched fewer rows than expected, so the
+        happy path needs no version pre-check. With `versions` (row ID -> the
+        version the caller read) only rows that moved on are reported.
+        """
+        self._invalidate(table)
+        current = self.fetch_rows(table, row_ids, primary=True)
+        current = {int(row["id"]): row for row in current.to_dict("records")}
+        if versions is not None:
+            row_ids = [row_id for row_id in row_ids
+                       if row_id not in current or current[row_id]["version"] != versions[row_id]]
+        raise ConcurrentModificationError(table, {row_id: current.get(row_id) for row_id in row_ids})
+
+    def _frame(self, rows, cols):
+        with self.instrumentation.time_dataframe():
+            return pd.DataFrame(rows, columns=cols)
+
+    # --- Books ---
+    def list_books(self):
+        return self.mirrors["books"].snapshot()
+
+    def _mirror_rows(self, table, deleted=False):
+        """
+        Returns the mirrored table, without deleted rows unless `deleted`, for reads in degraded mode.
+
+        The app may start while the database is down and without a snapshot; the
+        table is empty then, and the degraded-mode banner explains why.
+        """
+        try:
+            rows = self.mirrors[table].snapshot()
+        except DatabaseUnavailable:
+            rows = compact_frame(pd.DataFrame(columns=list(MIRROR_COLUMNS[table])).astype(MIRROR_COLUMNS[table]), table)
+        return rows[rows["is_delete"] == 0] if "is_delete" in rows.columns and not deleted else rows
+
+    def list_books_page(self, page_size=20, cursor=None, status=None):
+        """
+        Retrieves one page of active books using keyset pagination, so only the
+        visible rows are scanned, transferred and rendered.
+
+        Workflow:
+        1. Builds a query that filters `is_delete = 0` (and optionally `status`) in SQL.
+        2. Applies the page cursor:
+           - None: first page, ordered by id.
+           - ("after", id): rows with a larger id (Next).
+           - ("before", id): rows with a smaller id, read backwards then reversed (Prev).
+           - ("from", id): rows starting at the given id (jump-by-id).
+        3. Fetches `page_size + 1` rows; the extra row only tells whether another page exists.
+           A "from" page also probes for one earlier row, since a jump may land on page one.
+        4. Caches the page under the 'books' table so writes invalidate it.
+
+        Args:
+            page_size (int): Number of books per page.
+            cursor (tuple | None): Page cursor as described above.
+            status (int | None): 1 for available, 0 for borrowed, None for both.
+
+        Returns:
+            tuple: (pd.DataFrame with columns id, judul, penulis, status, version,
+                    has_prev (bool), has_next (bool))
+
+        Note:
+            A "before" cursor that runs out of rows falls back to the first page.
+            In degraded mode the page is cut from the books mirror instead.
+        """
+        def load(cursor):
+            try:
+                return load_rows(cursor)
+            except DatabaseUnavailable:
+                return self._mirror_page(page_size, cursor, status)
+
+        def load_rows(cursor):
+            rows, cols = self._query(*self._book_page_sql(page_size, cursor, status))
+
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            if cursor is not None and cursor[0] == "before":
+                rows.reverse()
+                has_prev, has_next = has_more, True
+            elif cursor is not None and cursor[0] == "from":
+                ## A jump may land on the first book; probe for one row before the page
+                first_id = rows[0][0] if rows else cursor[1]
+                earlier, _ = self._query(*self._book_page_sql(1, ("before", first_id), status))
+                has_prev, has_next = bool(earlier), has_more
+            else:
+                has_prev, has_next = cursor is not None, has_more
+            return self._frame(rows, cols), has_prev, has_next
+
+        if cursor is not None and cursor[0] == "before":
+            page = self.cache.get_or_load("books", ("page", page_size, status, cursor), lambda: load(cursor))
+            if page[1]:
+                return page[0].copy(), page[1], page[2]
+            cursor = None
+
+        df, has_prev, has_next = self.cache.get_or_load(
+            "books", ("page", page_size, status, cursor), lambda: load(cursor)
+        )
+        return df.copy(), has_prev, has_next
+
+    def _book_page_sql(self, page_size, cursor=None, status=None):
+        ## "before" pages are read backwards; one extra row tells whether another page exists
+        where = ["is_delete = 0"]
+        params = []
+        if status is not None:
+            where.append("status = %s")
+            params.append(status)
+
+        order = "ASC"
+        if cursor is not None:
+            kind, book_id = cursor
+            where.append({"after": "id > %s", "before": "id < %s", "from": "id >= %s"}[kind])
+            params.append(book_id)
+            if kind == "before":
+                order = "DESC"
+
+        return (f"SELECT id, judul, penulis, status, version FROM books WHERE {' AND '.join(where)} "
+                f"ORDER BY id {order} LIMIT %s", (*params, page_size + 1))
+
+    def _mirror_page(self, page_size, cursor, status):
+        books = self._mirror_rows("books")
+        if status is not None:
+            books = books[books["status"] == status]
+        kind, book_id = cursor or (None, None)
+        if kind == "before":
+            page = books[books["id"] < book_id].tail(page_size)
+        elif kind == "after":
+            page = books[books["id"] > book_id].head(page_size)
+        elif kind == "from":
+            page = books[books["id"] >= book_id].head(page_size)
+        else:
+            page = books.head(page_size)
+        if page.empty and kind == "before":
+            page = books.head(page_size)
+        has_prev = not page.empty and bool((books["id"] < page["id"].iloc[0]).any())
+        has_next = not page.empty and bool((books["id"] > page["id"].iloc[-1]).any())
+        page = page[["id", "judul", "penulis", "status", "version"]].astype({"penulis": str})
+        return page.reset_index(drop=True), has_prev, has_next
+
+    def get_book(self, book_id):
+        try:
+            rows, cols = self._query("SELECT * FROM books WHERE id = %s", (book_id,))
+        except DatabaseUnavailable:
+            books = self._mirror_rows("books", deleted=True)
+            rows = books[books["id"] == book_id].astype({"penulis": str}).to_dict("records")
+            return rows[0] if rows else None
+        return dict(zip(cols, rows[0])) if rows else None
+
+    @journaled
+    def add_book(self, book_id, title, author, status):
+        self._write(
+            "INSERT INTO books (id, judul, penulis, status) VALUES (%s, %s, %s, %s)",
+            (book_id, title, author, status), "books", [book_id],
+        )
+        self._invalidate("books")
+
+    def update_book(self, book_id, title, author, version=None):
+        """
+        Changes title and author of a book and bumps its row version.
+
+        With `version` (read together with the title and author being edited),
+        the UPDATE only matches while the row is still at that version, so a
+        concurrent edit, borrow or delete is detected without locking the row.
+
+        Raises:
+            ConcurrentModificationError: If the book changed since `version`; nothing is written.
+        """
+        book_id = int(book_id)
+        sql = "UPDATE books SET judul = %s, penulis = %s, version = version + 1 WHERE id = %s"
+        params = (title, author, book_id)
+        if version is not None:
+            sql += " AND version = %s"
+            params += (int(version),)
+        if self._write(sql, params, "books", [book_id]) == 0 and version is not None:
+            self._conflict("books", [book_id])
+        self._invalidate("books")
+
+    def update_books(self, rows):
+        """
+        Changes title and author of several books with one `executemany` UPDATE
+        in a single transaction, e.g. for the edits made in the book grid.
+
+        Every row is conditional on the version it was read at; if any of them
+        missed, the whole batch is rolled back.
+
+        Args:
+            rows (list): (id, judul, penulis, version) tuples.
+
+        Raises:
+            ConcurrentModificationError: Naming the books that changed since they were read.
+        """
+        rows = [(int(book_id), title, author, int(version)) for book_id, title, author, version in rows]
+        if not rows:
+            return
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self._begin(conn)
+                self._run(cursor,
+                    "UPDATE books SET judul = %s, penulis = %s, version = version + 1 WHERE id = %s AND version = %s",
+                    [(title, author, book_id, version) for book_id, title, author, version in rows], many=True)
+                missed = cursor.rowcount < len(rows)
+                if missed:
+                    conn.rollback()
+                else:
+                    self._log_changes(cursor, "books", [row[0] for row in rows])
+                    self._commit(conn)
+            except self.errors:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        if missed:
+            self._conflict("books", [row[0] for row in rows], {row[0]: row[3] for row in rows})
+        self._invalidate("books")
+
+    def soft_delete_book(self, book_id):
+        ## Re-check inside the UPDATE so a borrow made after the page loaded still wins
+        book_id = int(book_id)
+        deleted = self._write("""
+            UPDATE books SET is_delete = 1, version = version + 1
+            WHERE id = %s AND NOT EXISTS (
+                SELECT 1 FROM transactions WHERE buku_id = %s AND tanggal_kembali IS NULL
+            )
+        """, (book_id, book_id), "books", [book_id]) > 0
+        self._invalidate("books" if deleted else "transactions")
+        return deleted
+
+    def soft_delete_books(self, book_ids):
+        """
+        Soft deletes several books in one transaction, skipping the ones that
+        are currently borrowed.
+
+        Workflow:
+        1. Locks the active rows among `book_ids`; a borrow locks the same rows
+           first, so none of them can be borrowed until this commits.
+        2. Looks up which of them have an open transaction in one query.
+        3. Marks the rest deleted with one `UPDATE ... WHERE id IN (...)`.
+
+        Returns:
+            list: IDs that were deleted; borrowed or already deleted books are left out.
+        """
+        book_ids = sorted({int(book_id) for book_id in book_ids})
+        if not book_ids:
+            return []
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self._begin(conn)
+                rows = self._run(cursor, *self._deletable_books_sql(book_ids), fetch=True)
+                active_ids = [row[0] for row in rows]
+                borrowed = set()
+                if active_ids:
+                    rows = self._run(cursor, *self._open_loans_sql(active_ids), fetch=True)
+                    borrowed = {row[0] for row in rows}
+                deleted = [book_id for book_id in active_ids if book_id not in borrowed]
+                if not deleted:
+                    conn.rollback()
+                    return []
+
+                self._run(cursor, f"UPDATE books SET is_delete = 1, version = version + 1 WHERE id IN ({self._marks(deleted)})", deleted)
+                self._log_changes(cursor, "books", deleted)
+                self._commit(conn)
+            except self.errors:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        self._invalidate("books")
+        return deleted
+
+    def _deletable_books_sql(self, book_ids):
+        return f"SELECT id FROM books WHERE id IN ({self._marks(book_ids)}) AND is_delete = 0{{lock}}", book_ids
+
+    def _open_loans_sql(self, book_ids):
+        return (f"SELECT DISTINCT buku_id FROM transactions WHERE buku_id IN ({self._marks(book_ids)}) "
+                "AND tanggal_kembali IS NULL", book_ids)
+
+    def restore_book(self, book_id, title=None, author=None, status=None, version=None):
+        """
+        Un-deletes a book, keeping its old data or overwriting it when `title` is given.
+
+        With `version` (read when the deleted book was looked up), the restore
+        only applies while nobody else restored, edited or re-imported it since.
+
+        Raises:
+            ConcurrentModificationError: If the book changed since `version`; nothing is written.
+        """
+        book_id = int(book_id)
+        if title is None:
+            sql = "UPDATE books SET is_delete = 0, version = version + 1 WHERE id = %s"
+            params = (book_id,)
+        else:
+            sql = """
+                UPDATE books
+                SET judul = %s, penulis = %s, status = %s, is_delete = 0, version = version + 1
+                WHERE id = %s
+            """
+            params = (title, author, status, book_id)
+        if version is not None:
+            sql += " AND version = %s"
+            params += (int(version),)
+        if self._write(sql, params, "books", [book_id]) == 0 and version is not None:
+            self._conflict("books", [book_id])
+        self._invalidate("books")
+
+    def available_books(self):
+        try:
+            rows, _ = self._query("SELECT id, judul FROM books WHERE status = 1 AND is_delete = 0")
+        except DatabaseUnavailable:
+            books = self._mirror_rows("books")
+            return list(books.loc[books["status"] == 1, ["id", "judul"]].itertuples(index=False, name=None))
+        return [tuple(row) for row in rows]
+
+    def search_books(self, query, status=None, limit=50):
+        """
+        Searches active books by title and author with the in-process trigram index.
+
+        Workflow:
+        1. Syncs the books mirror, which keeps the index current through the change feed.
+        2. Ranks matching IDs (prefix, substring and typo-tolerant matches).
+        3. Reads the rows from the mirror and applies the optional status filter.
+
+        Args:
+            query (str): Free-text search.
+            status (int | None): 1 for available, 0 for borrowed, None for both.
+            limit (int): Maximum number of results.
+
+        Returns:
+            pd.DataFrame: Columns id, judul, penulis, status, version in ranked order.
+
+        Note:
+            With a status filter, up to four times `limit` ranked IDs are checked.
+        """
+        mirror = self.mirrors["books"]
+        try:
+            mirror.sync()
+        except DatabaseUnavailable:
+            ## Degraded mode before the books were ever loaded: nothing to search yet
+            return self._mirror_rows("books")[["id", "judul", "penulis", "status", "version"]].astype({"penulis": str})
+        ids = self.search_index.search(query, limit=limit if status is None else limit * 4)
+        rows = mirror.rows(ids)
+        if status is not None:
+            rows = rows[rows["status"] == status]
+        rows = rows[["id", "judul", "penulis", "status", "version"]].head(limit).reset_index(drop=True)
+        ## The mirror keeps authors categorical; callers get plain strings like from the other reads
+        return rows.astype({"penulis": str})
+
+    def _update_search_index(self, rows, full, changed_ids):
+        active = rows[rows["is_delete"] == 0][["id", "judul", "penulis"]]
+        if full:
+            ## The mirror may come from a snapshot in milliseconds; do not hold it up with the index build
+            self.search_index.rebuild_in_background(active.itertuples(index=False, name=None))
+            return
+        for book_id in changed_ids:
+            self.search_index.remove(book_id)
+        for book_id, title, author in active.itertuples(index=False, name=None):
+            self.search_index.add(book_id, title, author)
+
+    # --- Users ---
+    def list_users(self):
+        return self.mirrors["users"].snapshot()
+
+    def search_users(self, query="", page_size=20, cursor=None):
+        """
+        Retrieves one page of the member directory with keyset pagination, so a
+        lookup costs one small indexed query however many members there are.
+
+        Workflow:
+        1. A query of digits matches user IDs starting with it. From
+           MIN_ID_RANGE_PREFIX digits on, the prefix is split into one ID range
+           per length ("123" is 123, 1230-1239, ...; see id_prefix_ranges()).
+           Each range is read from the primary key and the parts are merged,
+           ordered by ID. Shorter prefixes, which match many IDs, read the
+           primary key in order until the page is full.
+        2. Any other query matches names starting with it, case-insensitively,
+           through the users(nama, id) index, ordered by name. An empty query
+           lists every member by name.
+        3. Fetches `page_size + 1` rows; the extra row only tells whether another page exists.
+        4. Joins each row's active loan count from `user_loan_summary`.
+
+        Args:
+            query (str): Name or ID prefix.
+            page_size (int): Number of users per page.
+            cursor (tuple | None): Cursor returned with the previous page, None for the first page.
+
+        Returns:
+            tuple: (pd.DataFrame with columns id, nama, active_loans, next cursor or None)
+
+        Note:
+            Not cached, so new members and loans show up right away. In degraded
+            mode the page is cut from the users mirror instead.
+        """
+        query = query.strip()
+        by_id = query.isdigit()
+        try:
+            if by_id:
+                statement = self._user_id_search_sql(query, page_size + 1, cursor)
+            else:
+                statement = self._user_name_search_sql(query, page_size + 1, cursor)
+            ## No ID range left to search means an empty page
+            rows, cols = self._query(*statement) if statement else ([], ["id", "nama", "active_loans"])
+            df = self._frame(rows, cols)
+        except DatabaseUnavailable:
+            df = self._mirror_users(query, by_id, page_size + 1, cursor)
+
+        next_cursor = None
+        if len(df) > page_size:
+            df = df.head(page_size)
+            last = df.iloc[-1]
+            next_cursor = (int(last["id"]),) if by_id else (last["nama"], int(last["id"]))
+        return df, next_cursor
+
+    def _user_name_search_sql(self, prefix, limit, cursor=None):
+        where = []
+        params = []
+        if prefix:
+            where.append("u.nama LIKE %s ESCAPE '!'")
+            params.append(prefix.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%")
+        if cursor is not None:
+            ## The first condition is the index range, the second skips the rows already shown
+            where.append("u.nama{nocase} >= %s AND (u.nama{nocase} > %s OR u.id > %s)")
+            params.extend((cursor[0], cursor[0], cursor[1]))
+        return (
+            "SELECT u.id, u.nama, COALESCE(s.active_loans, 0) AS active_loans "
+            "FROM users u LEFT JOIN user_loan_summary s ON s.user_id = u.id "
+            f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+            "ORDER BY u.nama{nocase}, u.id LIMIT %s",
+            (*params, limit),
+        )
+
+    def _user_id_search_sql(self, prefix, limit, cursor=None):
+        columns = ("SELECT u.id, u.nama, COALESCE(s.active_loans, 0) AS active_loans "
+                   "FROM users u LEFT JOIN user_loan_summary s ON s.user_id = u.id ")
+        if len(prefix) < MIN_ID_RANGE_PREFIX:
+            ## One or two digits match a large share of all IDs, so reading the primary key in
+            ## order fills the page after a few rows; ranges would cost ~19 index probes
+            where = "CAST(u.id AS CHAR) LIKE %s" + (" AND u.id > %s" if cursor is not None else "")
+            params = (prefix + "%", cursor[0]) if cursor is not None else (prefix + "%",)
+            return f"{columns}WHERE {where} ORDER BY u.id LIMIT %s", (*params, limit)
+
+        ranges = id_prefix_ranges(prefix, cursor[0] + 1 if cursor is not None else 0)
+        if not ranges:
+            return None
+        part = f"SELECT * FROM ({columns}WHERE u.id BETWEEN %s AND %s ORDER BY u.id LIMIT %s)"
+        return (
+            " UNION ALL ".join(f"{part} r{index}" for index in range(len(ranges))) + " ORDER BY id LIMIT %s",
+            (*[value for low, high in ranges for value in (low, high, limit)], limit),
+        )
+
+    def _mirror_users(self, prefix, by_id, limit, cursor):
+        users = self._mirror_rows("users")[["id", "nama"]]
+        if by_id:
+            users = users[users["id"].astype(str).str.startswith(prefix)].sort_values("id")
+            if cursor is not None:
+                users = users[users["id"] > cursor[0]]
+        else:
+            key = users["nama"].str.lower()
+            users = users[key.str.startswith(prefix.lower())]
+            users = users.assign(key=key).sort_values(["key", "id"])
+            if cursor is not None:
+                after = (users["key"] > cursor[0].lower()) | ((users["key"] == cursor[0].lower()) & (users["id"] > cursor[1]))
+                users = users[after]
+            users = users.drop(columns="key")
+        summary = self.loan_summary()
+        users = users.head(limit).reset_index(drop=True)
+        return users.assign(active_loans=users["id"].map(lambda user_id: summary.get(user_id, {}).get("active_loans", 0)))
+
+    def get_user(self, user_id):
+        """
+        Reads one user and their loan summary by primary key, for the selected borrower.
+
+        Returns:
+            dict | None: id, nama, active_loans, total_loans, overdue_loans and
+            last_activity, or None when there is no such user.
+        """
+        try:
+            rows, cols = self._query(*self._user_sql(user_id))
+        except DatabaseUnavailable:
+            users = self._mirror_rows("users")
+            rows = users.loc[users["id"] == user_id, ["id", "nama"]].to_dict("records")
+            if not rows:
+                return None
+            summary = self.loan_summary().get(user_id, {})
+            return {"active_loans": 0, "total_loans": 0, "overdue_loans": 0, "last_activity": None, **rows[0], **summary}
+        return dict(zip(cols, rows[0])) if rows else None
+
+    def _user_sql(self, user_id):
+        return ("SELECT u.id, u.nama, COALESCE(s.active_loans, 0) AS active_loans, "
+                "COALESCE(s.total_loans, 0) AS total_loans, COALESCE(s.overdue_loans, 0) AS overdue_loans, "
+                "s.last_activity FROM users u LEFT JOIN user_loan_summary s ON s.user_id = u.id WHERE u.id = %s",
+                (user_id,))
+
+    @journaled
+    def add_user(self, user_id, name):
+        self._write("INSERT INTO users (id, nama) VALUES (%s, %s)", (user_id, name), "users", [user_id])
+        self._invalidate("users")
+
+    # --- Transactions ---
+    def active_loans(self, book_ids):
+        """
+        Returns which of the given books are currently borrowed, using a single
+        grouped query instead of one COUNT(*) per book.
+
+        The result is cached under the 'transactions' table, so Confirm
+        Borrow/Return invalidate it.
+        """
+        book_ids = sorted({int(book_id) for book_id in book_ids})
+        if not book_ids:
+            return set()
+
+        def load():
+            try:
+                rows, _ = self._query(*self._active_loans_sql(book_ids))
+            except DatabaseUnavailable:
+                ## Borrowed books are the ones flagged so in the mirror
+                books = self._mirror_rows("books")
+                return frozenset(books.loc[books["id"].isin(book_ids) & (books["status"] == 0), "id"].tolist())
+            return frozenset(row[0] for row in rows)
+
+        return set(self.cache.get_or_load("transactions", ("active", tuple(book_ids)), load))
+
+    def _active_loans_sql(self, book_ids):
+        return (f"SELECT buku_id FROM transactions WHERE buku_id IN ({self._marks(book_ids)}) "
+                "AND tanggal_kembali IS NULL GROUP BY buku_id", book_ids)
+
+    def validate_cart(self, cart):
+        """
+        Splits a borrow cart into books that can still be borrowed and books that
+        were borrowed or deleted in the meantime, using a single query.
+
+        Note:
+            This read is never cached, the cart has to reflect other librarians' borrows.
+        """
+        if not cart:
+            return [], []
+
+        try:
+            rows, _ = self._query(*self._available_books_sql([int(book[0]) for book in cart]), primary=True)
+            available_ids = {row[0] for row in rows}
+        except DatabaseUnavailable:
+            ## Best effort from the mirror; the journal replay re-checks availability
+            books = self._mirror_rows("books")
+            ## Nothing loaded yet keeps the cart as it is
+            available_ids = set(books.loc[books["status"] == 1, "id"].tolist()) if len(books) else {book[0] for book in cart}
+        valid_cart = [book for book in cart if book[0] in available_ids]
+        removed_titles = [book[1] for book in cart if book[0] not in available_ids]
+        return valid_cart, removed_titles
+
+    def _available_books_sql(self, book_ids, lock=False):
+        ## Borrow locks the rows it checks; the cart check only reads them
+        return (f"SELECT id FROM books WHERE id IN ({self._marks(book_ids)}) AND status = 1 AND is_delete = 0"
+                f"{'{lock}' if lock else ''}", book_ids)
+
+    def borrowed_books(self, user_id):
+        """
+        Returns the (id, title) of every book a user has not returned yet.
+
+        Cached under the 'transactions' table, so in degraded mode the last list
+        read for the user is shown (or none).
+        """
+        def load():
+            rows, _ = self._query(*self._borrowed_books_sql(user_id))
+            return [tuple(row) for row in rows]
+
+        try:
+            return list(self.cache.get_or_load("transactions", ("borrowed", user_id), load, stale_on=(DatabaseUnavailable,)))
+        except DatabaseUnavailable:
+            return []
+
+    def _borrowed_books_sql(self, user_id):
+        return ("SELECT b.id, b.judul FROM books b JOIN transactions t ON b.id = t.buku_id "
+                "WHERE t.user_id = %s AND t.tanggal_kembali IS NULL", (user_id,))
+
+    @journaled
+    def borrow_books(self, user_id, book_ids):
+        """
+        Borrows every book in the cart for one user in a single transaction with a
+        constant number of round trips, regardless of cart size.
+
+        Workflow:
+        1. Starts an explicit transaction.
+        2. Locks the requested rows (`SELECT ... FOR UPDATE` on MySQL, the database
+           write lock on SQLite), keeping only books still available and not deleted.
+        3. If any book is missing, rolls back and reports it, nothing is borrowed.
+        4. Otherwise inserts all transactions with one `executemany` INSERT and flips
+           every book to borrowed with one `UPDATE ... WHERE id IN (...)`.
+        5. Updates the user's row in `user_loan_summary`.
+        6. Commits and invalidates cached book/transaction reads.
+
+        Args:
+            user_id (int): ID of the borrowing user.
+            book_ids (list): IDs of the books in the cart.
+
+        Returns:
+            list: IDs that could not be borrowed (empty on success).
+
+        Raises:
+            The driver error if the transaction fails; it is rolled back first.
+        """
+        book_ids = [int(book_id) for book_id in book_ids]
+        if not book_ids:
+            return []
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self._begin(conn)
+                rows = self._run(cursor, *self._available_books_sql(book_ids, lock=True), fetch=True)
+                available_ids = {row[0] for row in rows}
+                unavailable = [book_id for book_id in book_ids if book_id not in available_ids]
+                if unavailable:
+                    conn.rollback()
+                    return unavailable
+
+                self._run(cursor,
+                    "INSERT INTO transactions (buku_id, user_id, tanggal_pinjam) VALUES (%s, %s, {now})",
+                    [(book_id, user_id) for book_id in book_ids], many=True)
+                self._run(cursor, f"UPDATE books SET status = 0, version = version + 1 WHERE id IN ({self._marks(book_ids)})", book_ids)
+                self._log_changes(cursor, "books", book_ids)
+                self._update_loan_summary(cursor, user_id, new_loans=len(book_ids))
+                self._commit(conn)
+            except self.errors:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        self._invalidate("books", "transactions")
+        return []
+
+    @journaled
+    def return_books(self, user_id, book_ids):
+        """
+        Returns several borrowed books for one user in a single transaction.
+
+        Workflow:
+        1. Starts an explicit transaction and locks the user's open transactions for
+           the selected books.
+        2. Closes all of them with one `UPDATE transactions ... WHERE buku_id IN (...)`.
+        3. Marks the same books available with one `UPDATE books ... WHERE id IN (...)`.
+        4. Updates the user's row in `user_loan_summary`.
+        5. Commits and invalidates cached book/transaction reads.
+
+        Returns:
+            int: Number of books actually returned (books already returned elsewhere are skipped).
+        """
+        book_ids = [int(book_id) for book_id in book_ids]
+        if not book_ids:
+            return 0
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self._begin(conn)
+                rows = self._run(cursor, *self._returnable_loans_sql(user_id, book_ids), fetch=True)
+                open_ids = [row[0] for row in rows]
+                if not open_ids:
+                    conn.rollback()
+                    return 0
+
+                self._run(cursor,
+                    f"UPDATE transactions SET tanggal_kembali = {{now}} WHERE user_id = %s AND buku_id IN ({self._marks(open_ids)}) "
+                    "AND tanggal_kembali IS NULL",
+                    (user_id, *open_ids))
+                self._run(cursor, f"UPDATE books SET status = 1, version = version + 1 WHERE id IN ({self._marks(open_ids)})", open_ids)
+                self._log_changes(cursor, "books", open_ids)
+                self._update_loan_summary(cursor, user_id)
+                self._commit(conn)
+            except self.errors:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        self._invalidate("books", "transactions")
+        return len(open_ids)
+
+    def _returnable_loans_sql(self, user_id, book_ids):
+        return (f"SELECT DISTINCT buku_id FROM transactions WHERE user_id = %s AND buku_id IN ({self._marks(book_ids)}) "
+                "AND tanggal_kembali IS NULL{lock}", (user_id, *book_ids))
+
+    # --- Loan summary ---
+    def _overdue_cutoff(self):
+        return (datetime.now() - timedelta(days=self.loan_days)).strftime("%Y-%m-%d %H:%M:%S")
+
+    def _update_loan_summary(self, cursor, user_id, new_loans=0):
+        """
+        Refreshes one user's `user_loan_summary` row inside a borrow/return transaction.
+
+        Active and overdue counts are recounted from the user's open loans (an
+        index range on transactions(user_id, tanggal_kembali)), so the row stays
+        exact even if it was missing or stale; the total only grows by `new_loans`.
+        """
+        self._run(cursor, "INSERT {ignore} INTO user_loan_summary (user_id) VALUES (%s)", (user_id,))
+        self._run(cursor, """
+            UPDATE user_loan_summary
+            SET active_loans = (SELECT COUNT(*) FROM transactions
+                                WHERE user_id = %s AND tanggal_kembali IS NULL),
+                overdue_loans = (SELECT COUNT(*) FROM transactions
+                                 WHERE user_id = %s AND tanggal_kembali IS NULL AND tanggal_pinjam < %s),
+                total_loans = total_loans + %s,
+                last_activity = {now}
+            WHERE user_id = %s
+        """, (user_id, user_id, self._overdue_cutoff(), new_loans, user_id))
+
+    def loan_summary(self):
+        """
+        Reads the precomputed per-user loan summary, one row per user, instead of
+        scanning the transaction log.
+
+        Returns:
+            dict: {user_id: {"active_loans", "total_loans", "overdue_loans", "last_activity"}}
+        """
+        def load():
+            rows, _ = self._query(
+                "SELECT user_id, active_loans, total_loans, overdue_loans, last_activity FROM user_loan_summary"
+            )
+            return {
+                row[0]: {"active_loans": row[1], "total_loans": row[2], "overdue_loans": row[3], "last_activity": row[4]}
+                for row in rows
+            }
+
+        try:
+            return self.cache.get_or_load("transactions", ("loan_summary",), load, stale_on=(DatabaseUnavailable,))
+        except DatabaseUnavailable:
+            return {}
+
+    def refresh_overdue(self):
+        """
+        Recomputes every user's overdue count, since loans become overdue with
+        time and not through a write. Only open loans older than `loan_days` are
+        read, through the transactions(tanggal_kembali, tanggal_pinjam) index.
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self._begin(conn)
+                rows = self._run(cursor, *self._overdue_counts_sql(), fetch=True)
+                self._run(cursor, "UPDATE user_loan_summary SET overdue_loans = 0 WHERE overdue_loans > 0")
+                if rows:
+                    self._run(cursor, "UPDATE user_loan_summary SET overdue_loans = %s WHERE user_id = %s",
+                              [(count, user_id) for user_id, count in rows], many=True)
+                self._commit(conn)
+            except self.errors:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self._overdue_refreshed = time.monotonic()
+        self.cache.invalidate("transactions")
+
+    def _overdue_counts_sql(self):
+        return ("SELECT user_id, COUNT(*) FROM transactions WHERE tanggal_kembali IS NULL "
+                "AND tanggal_pinjam < %s GROUP BY user_id", (self._overdue_cutoff(),))
+
+    def rebuild_loan_summary(self):
+        """Recomputes the whole summary after transactions were loaded outside the repository."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self._begin(conn)
+                rebuild_loan_summary(cursor)
+                self._commit(conn)
+            except self.errors:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self.refresh_overdue()
+
+    # --- Archival ---
+    def archive_closed_loans(self, older_than_days, batch_size=1000, max_batches=None, pause=0.05):
+        """
+        Moves closed loans returned more than `older_than_days` days ago from
+        `transactions` to `transactions_archive`, in bounded batches.
+
+        Workflow:
+        1. Picks the next `batch_size` old closed loans through the
+           transactions(tanggal_kembali, tanggal_pinjam) index, without locking.
+        2. Copies them to the archive and deletes them from `transactions` in one
+           short transaction. Closed loans are never updated again, and both
+           statements only touch those IDs, so borrow/return are not blocked.
+        3. Sleeps `pause` seconds between batches to leave room for the app.
+
+        Args:
+            older_than_days (int): Minimum age of the return date.
+            batch_size (int): Loans moved per transaction.
+            max_batches (int | None): Stop after this many batches; None runs until done.
+            pause (float): Seconds to sleep between batches.
+
+        Returns:
+            int: Number of loans archived.
+        """
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+        archived = batches = 0
+        while max_batches is None or batches < max_batches:
+            rows, _ = self._query(*self._archive_batch_sql(cutoff, batch_size))
+            loan_ids = [row[0] for row in rows]
+            if not loan_ids:
+                break
+
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    self._begin(conn)
+                    self._run(cursor,
+                        "INSERT INTO transactions_archive (id, buku_id, user_id, tanggal_pinjam, tanggal_kembali, archived_at) "
+                        "SELECT id, buku_id, user_id, tanggal_pinjam, tanggal_kembali, {now} FROM transactions "
+                        f"WHERE id IN ({self._marks(loan_ids)}) AND tanggal_kembali IS NOT NULL",
+                        loan_ids)
+                    self._run(cursor,
+                        f"DELETE FROM transactions WHERE id IN ({self._marks(loan_ids)}) AND tanggal_kembali IS NOT NULL",
+                        loan_ids)
+                    moved = cursor.rowcount
+                    self._commit(conn)
+                except self.errors:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+
+            archived += moved
+            batches += 1
+            ## Only sleep when another batch follows
+            if len(loan_ids) < batch_size or (max_batches is not None and batches >= max_batches):
+                break
+            time.sleep(pause)
+
+        self.archived += archived
+        return archived
+
+    def _archive_batch_sql(self, cutoff, batch_size):
+        return ("SELECT id FROM transactions WHERE tanggal_kembali IS NOT NULL AND tanggal_kembali < %s "
+                "ORDER BY tanggal_kembali LIMIT %s", (cutoff, batch_size))
+
+    # --- Bulk import/export ---
+    def import_books(self, rows, deleted="skip"):
+        """
+        Upserts one batch of books in a single transaction.
+
+        Workflow:
+        1. Locks the rows that already exist among the batch IDs with one SELECT.
+        2. Inserts the new IDs with one executemany INSERT.
+        3. Updates title and author of active IDs; their status is left alone
+           because it reflects open loans.
+        4. Treats soft-deleted IDs like the Add Book flow does: "skip" leaves them
+           deleted, "restore" un-deletes the old data ("Use old data") and
+           "overwrite" restores them with the imported data ("Use new data").
+        5. Logs every touched row to `change_log` and commits.
+
+        Args:
+            rows (list): (id, judul, penulis, status) tuples with unique IDs.
+            deleted (str): "skip", "restore" or "overwrite".
+
+        Returns:
+            dict: Counts of inserted, updated, restored and skipped_deleted rows.
+        """
+        if deleted not in ("skip", "restore", "overwrite"):
+            raise ValueError(f"Unknown soft-deleted policy: {deleted}")
+        counts = {"inserted": 0, "updated": 0, "restored": 0, "skipped_deleted": 0}
+        if not rows:
+            return counts
+        book_ids = [row[0] for row in rows]
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self._begin(conn)
+                existing = dict(self._run(cursor,
+                    f"SELECT id, is_delete FROM books WHERE id IN ({self._marks(book_ids)}){{lock}}",
+                    book_ids, fetch=True))
+                inserts = [row for row in rows if row[0] not in existing]
+                updates = [(title, author, book_id) for book_id, title, author, _ in rows if existing.get(book_id) == 0]
+                removed = [row for row in rows if existing.get(row[0]) == 1]
+
+                if inserts:
+                    self._run(cursor,
+                        "INSERT INTO books (id, judul, penulis, status, is_delete) VALUES (%s, %s, %s, %s, 0)",
+                        inserts, many=True)
+                if updates:
+                    self._run(cursor, "UPDATE books SET judul = %s, penulis = %s, version = version + 1 WHERE id = %s",
+                              updates, many=True)
+                if removed and deleted == "restore":
+                    self._run(cursor, "UPDATE books SET is_delete = 0, version = version + 1 WHERE id = %s",
+                              [(row[0],) for row in removed], many=True)
+                elif removed and deleted == "overwrite":
+                    self._run(cursor,
+                        "UPDATE books SET judul = %s, penulis = %s, status = %s, is_delete = 0, version = version + 1 WHERE id = %s",
+                        [(title, author, status, book_id) for book_id, title, author, status in removed], many=True)
+
+                touched = [row[0] for row in inserts] + [row[2] for row in updates]
+                if deleted != "skip":
+                    touched += [row[0] for row in removed]
+                if touched:
+                    self._log_changes(cursor, "books", touched)
+                self._commit(conn)
+            except self.errors:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        counts["inserted"] = len(inserts)
+        counts["updated"] = len(updates)
+        counts["restored" if deleted != "skip" else "skipped_deleted"] = len(removed)
+        self._invalidate("books")
+        return counts
+
+    def import_users(self, rows):
+        """
+        Upserts one batch of users in a single transaction: new IDs are inserted,
+        existing ones get the imported name.
+
+        Args:
+            rows (list): (id, nama) tuples with unique IDs.
+
+        Returns:
+            dict: Counts of inserted and updated rows.
+        """
+        if not rows:
+            return {"inserted": 0, "updated": 0}
+        user_ids = [row[0] for row in rows]
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                self._begin(conn)
+                existing = {row[0] for row in self._run(cursor,
+                    f"SELECT id FROM users WHERE id IN ({self._marks(user_ids)}){{lock}}", user_ids, fetch=True)}
+                inserts = [row for row in rows if row[0] not in existing]
+                updates = [(name, user_id) for user_id, name in rows if user_id in existing]
+                if inserts:
+                    self._run(cursor, "INSERT INTO users (id, nama) VALUES (%s, %s)", inserts, many=True)
+                if updates:
+                    self._run(cursor, "UPDATE users SET nama = %s WHERE id = %s", updates, many=True)
+                self._log_changes(cursor, "users", user_ids)
+                self._commit(conn)
+            except self.errors:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        self._invalidate("users")
+        return {"inserted": len(inserts), "updated": len(updates)}
+
+    def iter_rows(self, table, columns, batch_size=1000):
+        """
+        Reads a whole table in ID order with keyset pagination, so exports hold
+        one page in memory and no connection stays checked out between pages.
+
+        Yields:
+            list: Up to `batch_size` row tuples with the given columns.
+        """
+        if table not in self.mirrors:
+            raise ValueError(f"Unknown table: {table}")
+        last_id = None
+        while True:
+            if last_id is None:
+                rows, _ = self._query(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id LIMIT %s", (batch_size,))
+            else:
+                rows, _ = self._query(
+                    f"SELECT {', '.join(columns)} FROM {table} WHERE id > %s ORDER BY id LIMIT %s",
+                    (last_id, batch_size),
+                )
+            if not rows:
+                return
+            yield [tuple(row) for row in rows]
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][columns.index("id")]
+
+    # --- Reports ---
+    def read_frame(self, sql, params=(), table=None):
+        """
+        Runs a read-only query written in MySQL style (see the class docstring) and
+        returns its rows as a DataFrame, for reports built outside the repository.
+
+        Reads go to a caught-up replica when there are replicas. With `table`, the
+        frame is kept in the read cache under that table, so writes to it drop it.
+
+        Raises:
+            DatabaseUnavailable: In degraded mode.
+        """
+        def load():
+            rows, cols = self._query(sql, params)
+            return self._frame(rows, cols)
+
+        if table is None:
+            return load()
+        return self.cache.get_or_load(table, ("frame", sql, tuple(params)), load).copy()
+
+    # --- Change feed ---
+    def change_version(self):
+        """Returns the newest change log id on the primary."""
+        rows, _ = self._query("SELECT COALESCE(MAX(id), 0) FROM change_log", primary=True)
+        return rows[0][0]
+
+    def oldest_change(self):
+        """Returns the oldest change log id still kept, or None when the log is empty."""
+        rows, _ = self._query("SELECT MIN(id) FROM change_log", primary=True)
+        return rows[0][0]
+
+    def prune_change_log(self, batch_size=5000, max_batches=None):
+        """
+        Deletes change log entries no reader needs anymore, in bounded batches.
+
+        Workflow:
+        1. The cut is the oldest version of this process's loaded mirrors minus
+           their overlap, so the entries they re-read are kept.
+        2. Only entries older than `change_log_retention` seconds go, which leaves
+           mirrors of other processes and recent snapshots the time to catch up.
+           A mirror or snapshot that falls further behind than that notices the
+           gap (see TableMirror) and reloads the whole table.
+        3. Deletes by primary key, `batch_size` entries per transaction.
+
+        Args:
+            batch_size (int): Entries deleted per transaction.
+            max_batches (int | None): Stop after this many batches; None runs until done.
+
+        Returns:
+            int: Number of entries deleted.
+        """
+        loaded = [mirror for mirror in self.mirrors.values() if mirror.loaded]
+        if len(loaded) < len(self.mirrors):
+            return 0
+        below = min(mirror.version - mirror.overlap for mirror in loaded)
+        cutoff = (datetime.now() - timedelta(seconds=self.change_log_retention)).strftime("%Y-%m-%d %H:%M:%S")
+        pruned = batches = 0
+        while max_batches is None or batches < max_batches:
+            rows, _ = self._query(
+                "SELECT id FROM change_log WHERE id <= %s AND changed_at < %s ORDER BY id LIMIT %s",
+                (below, cutoff, batch_size),
+                primary = True,
+            )
+            change_ids = [row[0] for row in rows]
+            if not change_ids:
+                break
+
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    self._begin(conn)
+                    self._run(cursor, f"DELETE FROM change_log WHERE id IN ({self._marks(change_ids)})", change_ids)
+                    pruned += cursor.rowcount
+                    self._commit(conn)
+                except self.errors:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+
+            batches += 1
+            if len(change_ids) < batch_size:
+                break
+
+        self.change_log_pruned += pruned
+        return pruned
+
+    def changes_since(self, change_id):
+        rows, _ = self._query(
+            "SELECT id, table_name, row_id FROM change_log WHERE id > %s ORDER BY id", (change_id,), floor=change_id
+        )
+        return [tuple(row) for row in rows]
+
+    def fetch_rows(self, table, row_ids=None, floor=0, primary=False):
+        """
+        Reads a whole table, or only the given rows of it, as a DataFrame.
+
+        `floor` and `primary` route the read as in _query().
+        """
+        if row_ids is None:
+            rows, cols = self._query(f"SELECT * FROM {table} ORDER BY id", floor=floor, primary=primary)
+        else:
+            rows, cols = self._query(
+                f"SELECT * FROM {table} WHERE id IN ({self._marks(row_ids)}) ORDER BY id", row_ids,
+                floor=floor, primary=primary,
+            )
+        return self._frame(rows, cols)
+
+    def check_replicas(self):
+        """
+        Reads the newest change log id of the primary and of every replica not
+        skipped after an error, for the router's catch-up and lag checks.
+        """
+        self.router.observe_primary(self.change_version())
+        for replica in self.router.available():
+            try:
+                rows, _ = self._query_on(replica.connection, "SELECT COALESCE(MAX(id), 0) FROM change_log", ())
+            except self.errors:
+                self.router.fail(replica)
+                continue
+            self.router.record(replica, rows[0][0])
+
+    def sync(self):
+        """
+        Brings the books/users mirrors up to date and drops cached pages and
+        loan lookups when another session or process changed those tables;
+        writes of processes sharing our state store are picked up immediately.
+        Every `summary_interval` seconds it also starts maintain() on a daemon
+        thread, so no rerun waits for the maintenance transactions.
+
+        Returns:
+            dict: {table: set of changed row ids}; empty in degraded mode.
+        """
+        if self.journal is not None and not self.reconnect():
+            return {}
+        try:
+            return self._sync()
+        except DatabaseUnavailable:
+            return {}
+
+    def _sync(self):
+        ## Tables another app process wrote to: their change log is polled right away
+        stale = self.cache.refresh()
+        for table in stale:
+            if table in self.mirrors:
+                self.mirrors[table].mark_dirty()
+        if self.router is not None:
+            if stale:
+                ## Reloads of what the other process wrote must not come from a replica without it
+                self.router.raise_floor(self.change_version())
+            if self.router.due():
+                self.check_replicas()
+
+        changed = {}
+        for table, mirror in self.mirrors.items():
+            changed[table] = mirror.sync()
+            if changed[table]:
+                self.cache.invalidate(table, "transactions", propagate=False)
+        ## The warm-up's overdue refresh counts as the first maintenance
+        last = self._maintained or self._overdue_refreshed
+        if last is None or time.monotonic() - last >= self.summary_interval:
+            self.maintain_in_background()
+        return changed
+
+    def maintain(self):
+        """
+        Runs the periodic maintenance: refreshes the overdue loan counts, prunes one
+        batch of the change log and, when `archive_after_days` is set, archives one
+        batch of old closed loans.
+        """
+        self.refresh_overdue()
+        self.prune_change_log(max_batches=1)
+        if self.archive_after_days is not None:
+            self.archive_closed_loans(self.archive_after_days, self.archive_batch_size, max_batches=1)
+
+    def maintain_in_background(self):
+        """
+        Like maintain(), but runs on a daemon thread and returns it right away;
+        does nothing while the previous run is still going.
+
+        Returns:
+            threading.Thread | None: The maintenance thread, or None if one was already running.
+        """
+        with self._maintenance_lock:
+            if self._maintenance is not None and self._maintenance.is_alive():
+                return None
+            ## Counted from the start, so a failing run is retried one interval later, not on every rerun
+            self._maintained = time.monotonic()
+            self._maintenance = threading.Thread(target=self._run_maintenance, name="library-maintenance", daemon=True)
+            self._maintenance.start()
+            return self._maintenance
+
+    def _run_maintenance(self):
+        try:
+            self.maintain()
+        except DatabaseUnavailable:
+            pass
+        except self.errors:
+            ## Nobody waits for this thread; the next interval tries again
+            logger.exception("Periodic maintenance failed")
+
+    # --- Degraded mode ---
+    def go_offline(self, error):
+        """Switches to degraded mode after `error` showed the primary is unreachable."""
+        if self.offline_since is None:
+            self.offline_since = time.time()
+            self.offline_error = str(error)
+        self._offline_probed = time.monotonic()
+
+    def reconnect(self, force=False):
+        """
+        Leaves degraded mode once the primary answers again and replays the journal.
+
+        In degraded mode the primary is probed at most every `offline_retry_interval`
+        seconds (unless `force`). Pending journal entries are replayed whenever the
+        primary is reachable, e.g. also after a restart.
+
+        Returns:
+            bool: True when the primary is reachable.
+        """
+        if self.offline_since is not None:
+            if not force and time.monotonic() - self._offline_probed < self.offline_retry_interval:
+                return False
+            self._offline_probed = time.monotonic()
+            try:
+                with self.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT 1")
+                    cursor.fetchall()
+                    cursor.close()
+            except self.errors:
+                return False
+            self.offline_since = None
+            self.offline_error = None
+            ## Other processes may have written meanwhile; cached reads and mirrors catch up
+            self._invalidate(*self.mirrors, "transactions")
+        if self.journal.has_pending():
+            self.replay_journal()
+        return self.offline_since is None
+
+    def replay_journal(self):
+        """
+        Applies the pending journal entries in order.
+
+        Workflow:
+        1. Each entry calls the original repository method with the recorded arguments.
+        2. Results the database no longer allows become conflicts: books borrowed or
+           deleted elsewhere meanwhile (nothing of that cart is borrowed), books
+           already returned, IDs added twice.
+        3. Other errors mark the entry failed; losing the primary again stops the
+           replay and leaves the rest pending.
+
+        Returns:
+            dict: Entries applied, in conflict and failed by this call.
+        """
+        outcome = {"applied": 0, "conflict": 0, "failed": 0}
+        ## One replay at a time; sessions rerunning meanwhile just carry on
+        if not self._replay_lock.acquire(blocking=False):
+            return outcome
+        try:
+            for entry_id, operation, args in self.journal.pending():
+                try:
+                    result = getattr(type(self), operation).__wrapped__(self, *args)
+                except DatabaseUnavailable:
+                    break
+                except self.errors as e:
+                    if is_unavailable(e):
+                        self.go_offline(e)
+                        break
+                    status = "conflict" if is_conflict(e) else "failed"
+                    self.journal.finish(entry_id, status, str(e))
+                    outcome[status] += 1
+                    continue
+                detail = self._replay_conflict(operation, args, result)
+                status = "applied" if detail is None else "conflict"
+                self.journal.finish(entry_id, status, detail)
+                outcome[status] += 1
+        finally:
+            self._replay_lock.release()
+        return outcome
+
+    @staticmethod
+    def _replay_conflict(operation, args, result):
+        if operation == "borrow_books" and result:
+            return f"Not borrowed, no longer available: {', '.join(map(str, result))}"
+        if operation == "return_books" and result < len(args[1]):
+            return f"{len(args[1]) - result} of {len(args[1])} book(s) were already returned"
+        return None
+
+    # --- Maintenance ---
+    def prime_connections(self):
+        """Opens pooled connections up front; returns how many (0 without a pool)."""
+        return 0
+
+    def warm_up(self, page_size=20):
+        """
+        Loads what the first dashboard rerun reads, concurrently, so the first
+        visitor after a restart does not wait for it query after query.
+
+        Workflow:
+        1. Opens the pooled connections in parallel (MySQL only) and, with replicas,
+           runs the first replication check so the loads below can use them.
+        2. Loads the books and users mirrors (which also builds the search index),
+           the first Book List page and the first member directory page on four threads.
+        3. Runs the first overdue refresh, which sync() would otherwise do on the first rerun.
+
+        Args:
+            page_size (int): Page size of the Book List page to preload.
+
+        Returns:
+            dict: Milliseconds per step and in total, also reported by stats().
+        """
+        timings = {}
+
+        def timed(step, fn, *args):
+            started = time.perf_counter()
+            try:
+                fn(*args)
+            except DatabaseUnavailable:
+                ## Down at startup without snapshots; the first rerun shows the degraded-mode banner instead
+                timings[step] = None
+                return
+            timings[step] = round((time.perf_counter() - started) * 1000, 1)
+
+        started = time.perf_counter()
+        online = self.offline_since is None
+        if online:
+            timed("connections", self.prime_connections)
+        if self.router is not None and online:
+            timed("replicas", self.check_replicas)
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="library-warm-up") as executor:
+            steps = [
+                executor.submit(timed, "books", self.mirrors["books"].sync, True),
+                executor.submit(timed, "users", self.mirrors["users"].sync, True),
+                executor.submit(timed, "book_page", self.list_books_page, page_size),
+                executor.submit(timed, "user_page", self.search_users),
+            ]
+            for step in steps:
+                step.result()
+        if self._overdue_refreshed is None and self.offline_since is None:
+            timed("overdue", self.refresh_overdue)
+        timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+        self.warm_up_ms = timings
+        return timings
+
+    def migrate(self):
+        with self.connection() as conn:
+            return apply_migrations(conn, self.dialect)
+
+    def stats(self):
+        stats = {"cache": self.cache.stats()}
+        for table, mirror in self.mirrors.items():
+            stats[f"mirror_{table}"] = dict(mirror.stats, version=mirror.version)
+        stats["search"] = {"indexed_books": len(self.search_index)}
+        stats["archive"] = {"archived_loans": self.archived, "pruned_changes": self.change_log_pruned}
+        stats["shared_state"] = self.shared_state.stats()
+        if self.router is not None:
+            stats["replicas"] = self.router.stats()
+        if self.journal is not None:
+            stats["journal"] = dict(self.journal.stats(), offline_since=self.offline_since, offline_error=self.offline_error,
+                                    recent_problems=self.journal.problems(limit=5))
+        stats["warm_up"] = self.warm_up_ms
+        return stats
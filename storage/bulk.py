@@ -0,0 +1,394 @@
+"""
+Streaming bulk import and export of books and users.
+
+Reads CSV, JSON Lines or the `database/*.sql` INSERT dump format one record at
+a time, validates each record, and upserts them through the repository in
+batched transactions, so memory use does not grow with the file size.
+Exports page through the table with keyset pagination and write the same
+three formats.
+
+Usage from the command line (from the repository root):
+    python -m storage.bulk import books new_titles.csv --deleted restore
+    python -m storage.bulk export users users.jsonl
+    python -m storage.bulk ... --secrets .streamlit/secrets.toml   # MySQL
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+
+
+COLUMNS = {
+    "books": ("id", "judul", "penulis", "status", "is_delete"),
+    "users": ("id", "nama"),
+}
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".sql": "sql"}
+
+MAX_BOOK_ID = 2**31 - 1
+MAX_TEXT = 255
+
+
+# --- Readers ---
+def read_csv(fh):
+    """Yields (line, record) pairs from a CSV file with a header row."""
+    reader = csv.DictReader(fh)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_jsonl(fh):
+    """Yields (line, record) pairs from a JSON Lines file; unparsable lines yield a ValueError."""
+    for line_no, line in enumerate(fh, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f"invalid JSON: {e}")
+
+
+_INSERT = re.compile(r"\s*INSERT\s+INTO\s+`?(\w+)`?\s*\(([^)]*)\)\s*VALUES\s*(.*?);?\s*$", re.IGNORECASE | re.DOTALL)
+_VALUE = re.compile(r"'((?:[^'\\]|\\.|'')*)'|(NULL)\b|(-?\d+(?:\.\d+)?)|([(),])", re.IGNORECASE | re.DOTALL)
+
+
+def _statements(fh):
+    """Splits a SQL dump into statements on semicolons outside string literals."""
+    buffer, start_line, quoted, escaped = [], None, False, False
+    for line_no, line in enumerate(fh, start=1):
+        if start_line is None and line.lstrip().startswith("--"):
+            continue
+        for ch in line:
+            if start_line is None:
+                if ch.isspace():
+                    continue
+                start_line = line_no
+            buffer.append(ch)
+            if escaped:
+                escaped = False
+            elif quoted and ch == "\\":
+                escaped = True
+            elif ch == "'":
+                quoted = not quoted
+            elif ch == ";" and not quoted:
+                yield start_line, "".join(buffer)
+                buffer, start_line = [], None
+    if buffer:
+        yield start_line, "".join(buffer)
+
+
+def _unescape(text):
+    return re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t", "0": "\0"}.get(m.group(1), m.group(1)),
+                  text.replace("''", "'"))
+
+
+def read_sql_dump(fh, table):
+    """
+    Yields (line, record) pairs from the INSERT statements for `table` in a SQL
+    dump like `database/books.sql`; statements for other tables are ignored.
+    Multi-row VALUES lists are supported.
+    """
+    for line_no, statement in _statements(fh):
+        match = _INSERT.match(statement)
+        if not match:
+            continue
+        if match.group(1).lower() != table:
+            continue
+        columns = [col.strip(" `") for col in match.group(2).split(",")]
+        values, depth = [], 0
+        for token in _VALUE.finditer(match.group(3)):
+            text, null, number, punct = token.groups()
+            if punct == "(":
+                depth, values = depth + 1, []
+            elif punct == ")":
+                depth -= 1
+                if len(values) != len(columns):
+                    yield line_no, ValueError(f"expected {len(columns)} values, got {len(values)}")
+                else:
+                    yield line_no, dict(zip(columns, values))
+            elif punct is None and depth == 1:
+                values.append(_unescape(text) if text is not None else None if null else number)
+
+
+def read_records(fh, fmt, table):
+    """Dispatches to the reader for `fmt` ("csv", "jsonl" or "sql")."""
+    if fmt == "csv":
+        return read_csv(fh)
+    if fmt == "jsonl":
+        return read_jsonl(fh)
+    if fmt == "sql":
+        return read_sql_dump(fh, table)
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+def detect_format(filename):
+    fmt = FORMATS.get(os.path.splitext(filename)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Cannot tell the format of {filename}; use .csv, .jsonl or .sql")
+    return fmt
+
+
+# --- Validation ---
+def _int(record, key, default=None, low=None, high=None):
+    value = record.get(key)
+    if value is None or str(value).strip() == "":
+        if default is None:
+            raise ValueError(f"missing {key}")
+        return default
+    try:
+        number = int(str(value).strip())
+    except ValueError:
+        raise ValueError(f"{key} must be an integer, got {value!r}") from None
+    if (low is not None and number < low) or (high is not None and number > high):
+        raise ValueError(f"{key} out of range: {number}")
+    return number
+
+
+def _text(record, key):
+    value = record.get(key)
+    value = "" if value is None else str(value).strip()
+    if not value:
+        raise ValueError(f"missing {key}")
+    if len(value) > MAX_TEXT:
+        raise ValueError(f"{key} longer than {MAX_TEXT} characters")
+    return value
+
+
+def validate_book(record):
+    """
+    Returns (id, judul, penulis, status, is_delete) for a book record.
+
+    Raises:
+        ValueError: When a field is missing or invalid.
+    """
+    return (
+        _int(record, "id", low=1, high=MAX_BOOK_ID),
+        _text(record, "judul"),
+        _text(record, "penulis"),
+        _int(record, "status", default=1, low=0, high=1),
+        _int(record, "is_delete", default=0, low=0, high=1),
+    )
+
+
+def validate_user(record):
+    """
+    Returns (id, nama) for a user record.
+
+    Raises:
+        ValueError: When a field is missing or invalid.
+    """
+    return _int(record, "id", low=1), _text(record, "nama")
+
+
+# --- Import ---
+class _CountingReader(io.RawIOBase):
+    """Binary stream wrapper that counts bytes read, for progress reporting."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        buffer[:len(data)] = data
+        self.bytes_read += len(data)
+        return len(data)
+
+
+def import_records(repo, table, records, deleted="skip", batch_size=500, progress=None, max_errors=100):
+    """
+    Validates and upserts a stream of records in batched transactions.
+
+    Workflow:
+    1. Validates each record; invalid ones are counted and the first `max_errors`
+       are kept with their line numbers.
+    2. Book records marked `is_delete = 1` in the source are skipped.
+    3. Collects up to `batch_size` valid rows (the last record wins when an ID
+       repeats within a batch) and upserts them with repo.import_books() or
+       repo.import_users(), one transaction per batch.
+    4. Calls `progress(report)` after every batch.
+
+    Args:
+        repo (LibraryRepository): Target repository.
+        table (str): "books" or "users".
+        records (iterable): (line, record) pairs from one of the readers.
+        deleted (str): What to do with soft-deleted book IDs: "skip", "restore" or "overwrite".
+        batch_size (int): Rows per transaction.
+        progress (callable | None): Receives a copy of the report after each batch.
+        max_errors (int): How many invalid records to keep in the report.
+
+    Returns:
+        dict: Counters (read, inserted, updated, restored, skipped_deleted,
+              skipped, invalid) and `errors` as (line, message) pairs.
+    """
+    if table not in COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+    report = {"read": 0, "inserted": 0, "updated": 0, "restored": 0, "skipped_deleted": 0,
+              "skipped": 0, "invalid": 0, "errors": []}
+    batch = {}
+
+    def flush():
+        if table == "books":
+            counts = repo.import_books(list(batch.values()), deleted=deleted)
+        else:
+            counts = repo.import_users(list(batch.values()))
+        for key, value in counts.items():
+            report[key] += value
+        batch.clear()
+        if progress:
+            progress(dict(report, errors=list(report["errors"])))
+
+    for line_no, record in records:
+        report["read"] += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise ValueError("record is not an object")
+            row = validate_book(record) if table == "books" else validate_user(record)
+        except ValueError as e:
+            report["invalid"] += 1
+            if len(report["errors"]) < max_errors:
+                report["errors"].append((line_no, str(e)))
+            continue
+
+        if table == "books":
+            if row[4] == 1:
+                report["skipped"] += 1
+                continue
+            row = row[:4]
+        batch[row[0]] = row
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    return report
+
+
+def import_file(repo, table, fh, fmt, deleted="skip", batch_size=500, progress=None, total_bytes=None):
+    """
+    Imports a binary file object (an open file or a Streamlit upload).
+
+    Adds `bytes_read` and `total_bytes` to every progress report, so callers can
+    show how far through the file the import is.
+
+    Returns:
+        dict: The report from import_records().
+    """
+    counter = _CountingReader(fh)
+    text = io.TextIOWrapper(io.BufferedReader(counter), encoding="utf-8-sig", newline="")
+
+    def report_progress(report):
+        if progress:
+            progress(dict(report, bytes_read=counter.bytes_read, total_bytes=total_bytes))
+
+    try:
+        return import_records(repo, table, read_records(text, fmt, table), deleted=deleted,
+                              batch_size=batch_size, progress=report_progress)
+    finally:
+        text.detach()
+
+
+# --- Export ---
+def _sql_literal(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def export_table(repo, table, fh, fmt, include_deleted=True, batch_size=1000):
+    """
+    Streams a whole table to a text file object, one keyset page at a time.
+
+    The SQL format matches the `database/*.sql` dumps, so an export can be
+    imported again or used as seed data.
+
+    Args:
+        repo (LibraryRepository): Source repository.
+        table (str): "books" or "users".
+        fh (TextIO): Destination, opened with newline="" for CSV.
+        fmt (str): "csv", "jsonl" or "sql".
+        include_deleted (bool): Books only; False leaves out soft-deleted books.
+        batch_size (int): Rows per page.
+
+    Returns:
+        int: Number of rows written.
+    """
+    columns = COLUMNS[table]
+    writer = csv.writer(fh) if fmt == "csv" else None
+    if writer:
+        writer.writerow(columns)
+    elif fmt not in ("jsonl", "sql"):
+        raise ValueError(f"Unknown format: {fmt}")
+
+    written = 0
+    for rows in repo.iter_rows(table, columns, batch_size=batch_size):
+        if table == "books" and not include_deleted:
+            rows = [row for row in rows if row[4] == 0]
+        if writer:
+            writer.writerows(rows)
+        elif fmt == "jsonl":
+            fh.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+        else:
+            fh.writelines(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(map(_sql_literal, row))});\n"
+                for row in rows
+            )
+        written += len(rows)
+    return written
+
+
+# --- Command line ---
+def main(argv=None):
+    from storage import create_repository, load_secrets
+
+    parser = argparse.ArgumentParser(description="Bulk import or export books and users.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("table", choices=sorted(COLUMNS))
+    parser.add_argument("file", help=".csv, .jsonl or .sql")
+    parser.add_argument("--secrets", help="secrets.toml with a [database] section; defaults to SQLite")
+    parser.add_argument("--sqlite", default="library.db", help="SQLite file used without --secrets")
+    parser.add_argument("--deleted", choices=["skip", "restore", "overwrite"], default="skip",
+                        help="books whose ID exists but is soft-deleted")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--active-only", action="store_true", help="export: leave out soft-deleted books")
+    args = parser.parse_args(argv)
+
+    if args.secrets:
+        config = load_secrets(args.secrets)
+    else:
+        config = {"backend": "sqlite", "path": args.sqlite}
+    repo = create_repository(config)
+    fmt = detect_format(args.file)
+
+    if args.action == "export":
+        with open(args.file, "w", encoding="utf-8", newline="") as fh:
+            written = export_table(repo, args.table, fh, fmt, include_deleted=not args.active_only)
+        print(f"Exported {written} {args.table} to {args.file}")
+        return 0
+
+    def progress(report):
+        print(f"  {report['bytes_read'] / max(report['total_bytes'], 1):6.1%}  {report['read']} records read",
+              file=sys.stderr)
+
+    with open(args.file, "rb") as fh:
+        report = import_file(repo, args.table, fh, fmt, deleted=args.deleted, batch_size=args.batch_size,
+                             progress=progress, total_bytes=os.path.getsize(args.file))
+    for line_no, message in report.pop("errors"):
+        print(f"line {line_no}: {message}", file=sys.stderr)
+    print(json.dumps(report))
+    return 1 if report["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
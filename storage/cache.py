@@ -0,0 +1,128 @@
+"""
+Per-table read cache with TTL, size bounds and explicit invalidation.
+"""
+
+import threading
+import time
+from collections import defaultdict
+
+
+class ReadCache:
+    """
+    In-memory cache for read queries, grouped per table so write paths can
+    invalidate everything that depends on a table they just modified.
+
+    Workflow:
+    1. get_or_load(table, key, loader) returns the cached value for (table, key)
+       when it exists and is younger than `ttl` seconds (a hit).
+    2. Otherwise loader() is called, its result stored and returned (a miss).
+    3. invalidate("books", ...) drops every entry of the given tables; each write
+       path calls it right after commit so our own mutations are never hidden.
+    4. When more than `max_entries` entries are stored, the oldest one is evicted.
+    5. With a `shared` state store, invalidate() also bumps the tables' generation
+       counters there, and refresh() drops the tables other processes bumped.
+    6. When the loader raises one of `stale_on`, an expired entry is returned
+       instead (a stale hit), e.g. while the database is unreachable.
+    7. A value whose table was invalidated while loader() ran is returned but not
+       stored (discarded): the read may have started before the write it missed.
+
+    Args:
+        ttl (float): Seconds an entry stays fresh.
+        max_entries (int): Upper bound on the number of cached entries.
+        shared (MemorySharedState | None): Store the generation counters are shared through.
+
+    Note:
+        Values are returned as-is; callers that mutate DataFrames must copy them.
+    """
+
+    def __init__(self, ttl=60, max_entries=64, shared=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = {}
+        self._generations = shared.generations() if shared is not None else {}
+        ## Local count of drops per table, local or remote, to detect invalidations during a load
+        self._drops = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale_hits": 0, "invalidations": 0, "evictions": 0,
+                       "remote_invalidations": 0, "discarded": 0}
+
+    def get_or_load(self, table, key, loader, stale_on=()):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((table, key))
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+            drops = self._drops[table]
+
+        try:
+            value = loader()
+        except stale_on:
+            if entry is None:
+                raise
+            with self._lock:
+                self._stats["stale_hits"] += 1
+            return entry[1]
+
+        with self._lock:
+            if self._drops[table] != drops:
+                self._stats["discarded"] += 1
+                return value
+            self._entries[(table, key)] = (time.monotonic(), value)
+            while len(self._entries) > self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+                self._stats["evictions"] += 1
+        return value
+
+    def invalidate(self, *tables, propagate=True):
+        """
+        Drops every entry of the given tables, and with `propagate` (the default)
+        tells the other processes sharing the store to do the same.
+        """
+        ## Bump before dropping, so nothing loaded before another process's bump survives
+        if propagate and self.shared is not None:
+            bumped = {table: self.shared.bump(table) for table in tables}
+            with self._lock:
+                self._generations.update(bumped)
+        self._drop(tables)
+
+    def _drop(self, tables):
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] in tables]:
+                del self._entries[cache_key]
+            for table in tables:
+                self._drops[table] += 1
+            self._stats["invalidations"] += 1
+
+    def refresh(self):
+        """
+        Drops the tables whose generation another process bumped since we last looked.
+
+        Returns:
+            set: Names of the tables that were dropped.
+        """
+        if self.shared is None:
+            return set()
+        current = self.shared.generations()
+        with self._lock:
+            stale = {table for table, generation in current.items() if self._generations.get(table) != generation}
+            self._generations.update(current)
+            self._stats["remote_invalidations"] += len(stale)
+        if stale:
+            self._drop(stale)
+        return stale
+
+    def stats(self):
+        """
+        Returns a snapshot of the cache counters for monitoring.
+
+        Returns:
+            dict: hits, misses, invalidations, evictions, discarded loads and the current entry count.
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+        return snapshot
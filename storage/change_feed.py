@@ -0,0 +1,225 @@
+"""
+Incremental change feed: in-memory table copies patched from `change_log`.
+
+Every write path in the repository appends (table_name, row_id) rows to
+`change_log` inside its own transaction. A TableMirror loads its table once,
+remembers the last change id it has seen, and afterwards only fetches the rows
+named by newer change_log entries.
+"""
+
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+from storage.journal import DatabaseUnavailable
+from storage.snapshot import align_categories, compact_frame, read_snapshot, write_snapshot
+
+
+class TableMirror:
+    """
+    In-memory copy of one table, kept current through the change log.
+
+    Workflow:
+    1. The first sync() reads the current change version, then the full table.
+    2. Later syncs read the change_log entries after the known version and fetch
+       only the rows they name, replacing or appending them in the DataFrame.
+    3. Idle syncs cost one small range query on the change_log primary key; they
+       are skipped entirely within `min_interval` seconds unless mark_dirty() was
+       called by one of our own writes.
+    4. Every listener is called as listener(rows, full, changed_ids) after a full
+       load (all rows) or a patch (only the fresh rows), e.g. to keep a search
+       index in step with the table.
+    5. Rows are kept with the compact dtypes of storage.snapshot. With a
+       `snapshot_path`, the full load starts from that Parquet file when it was
+       taken from the same database and continues with the change log after it;
+       the file is rewritten after a full load and at most every
+       `snapshot_interval` seconds while patches arrive.
+    6. While the repository is in degraded mode (DatabaseUnavailable), syncs keep
+       the last copy, or load the snapshot unverified when there is none yet.
+    7. The change log is pruned after `change_log_retention` seconds (see
+       SQLRepository.prune_change_log()). A snapshot, or a copy idle for half that
+       long, is checked against the oldest kept entry and reloaded in full when
+       entries after its version may be gone.
+
+    Args:
+        repo (SQLRepository): Repository used for the change-log and row reads.
+        table (str): "books" or "users".
+        min_interval (float): Minimum seconds between two change-log polls.
+        overlap (int): How many change ids before the known version are re-read.
+        snapshot_path (str | None): Parquet file the table is persisted to, None disables it.
+        snapshot_interval (float): Minimum seconds between two snapshot writes.
+
+    Note:
+        On MySQL, auto-increment ids are assigned before commit, so a slow
+        transaction can commit an id lower than one already seen. Re-reading the
+        last `overlap` ids (and skipping the ones already applied) catches those
+        late commits without re-reading any table rows.
+    """
+
+    def __init__(self, repo, table, min_interval=1.0, overlap=100, snapshot_path=None, snapshot_interval=300):
+        self.repo = repo
+        self.table = table
+        self.min_interval = min_interval
+        self.overlap = overlap
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._snapshot_saved = 0.0
+        self.version = 0
+        self._df = None
+        self._seen = set()
+        self._seen_order = deque()
+        self._dirty = True
+        self._last_sync = 0.0
+        self._synced = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"full_loads": 0, "snapshot_loads": 0, "snapshot_writes": 0, "syncs": 0, "rows_patched": 0}
+        self.listeners = []
+
+    @property
+    def loaded(self):
+        return self._df is not None
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def reset(self):
+        """Forgets the in-memory copy; the next sync() reloads the whole table."""
+        with self._lock:
+            self._df = None
+            self._dirty = True
+
+    def _remember(self, change_id):
+        self._seen.add(change_id)
+        self._seen_order.append(change_id)
+        while len(self._seen_order) > self.overlap * 2:
+            self._seen.discard(self._seen_order.popleft())
+
+    def sync(self, force=False):
+        """
+        Brings the in-memory copy up to date.
+
+        Returns:
+            set: IDs of rows changed since the previous sync (empty when idle or on a full load).
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._df is not None and not (force or self._dirty) and now - self._last_sync < self.min_interval:
+                return set()
+            self._dirty = False
+            self._last_sync = now
+            try:
+                changed_ids = self._sync(now)
+                self._synced = now
+                return changed_ids
+            except DatabaseUnavailable:
+                if self._df is None:
+                    if not self._load_snapshot(verify=False):
+                        raise
+                    for listener in self.listeners:
+                        listener(self._df, True, set())
+                return set()
+
+    def _sync(self, now):
+        if self._df is None:
+            if self._load_snapshot():
+                ## Only the changes after the snapshot are read below; the overlap re-applies a few twice
+                for listener in self.listeners:
+                    listener(self._df, True, set())
+            else:
+                ## Read the version first: a change racing the full read is simply applied twice
+                self.version = self.repo.change_version()
+                rows = self.repo.fetch_rows(self.table, floor=self.version)
+                self._df = compact_frame(rows, self.table).set_index("id", drop=False)
+                for change_id, _, _ in self.repo.changes_since(max(self.version - self.overlap, 0)):
+                    if change_id <= self.version:
+                        self._remember(change_id)
+                self.stats["full_loads"] += 1
+                self._save_snapshot(now)
+                for listener in self.listeners:
+                    listener(self._df, True, set())
+                return set()
+
+        if now - self._synced > self.repo.change_log_retention / 2 and not self._covers(self.version):
+            ## Idle for longer than the change log is kept: changes after our version may be pruned
+            self._df = None
+            return self._sync(now)
+
+        changes = self.repo.changes_since(max(self.version - self.overlap, 0))
+        changed_ids = set()
+        for change_id, table, row_id in changes:
+            if change_id in self._seen:
+                continue
+            self._remember(change_id)
+            self.version = max(self.version, change_id)
+            if table == self.table:
+                changed_ids.add(row_id)
+
+        self.stats["syncs"] += 1
+        if changed_ids:
+            fresh = self.repo.fetch_rows(self.table, sorted(changed_ids), floor=self.version)
+            fresh = compact_frame(fresh, self.table)
+            fresh = fresh.set_index("id", drop=False)
+            kept = self._df.drop(index=list(changed_ids), errors="ignore")
+            if fresh.empty or kept.empty:
+                self._df = kept if fresh.empty else fresh
+            else:
+                kept, fresh = align_categories(kept, fresh)
+                self._df = pd.concat([kept, fresh]).sort_index()
+            self.stats["rows_patched"] += len(fresh)
+            if now - self._snapshot_saved >= self.snapshot_interval:
+                self._save_snapshot(now)
+            for listener in self.listeners:
+                listener(fresh, False, changed_ids)
+        return changed_ids
+
+    def _load_snapshot(self, verify=True):
+        """
+        Loads the table from `snapshot_path`; returns False when there is no
+        usable snapshot (missing, from another database, or with `verify`, newer
+        than the change log, e.g. after the database was recreated, or older than
+        its oldest kept entry).
+        """
+        if self.snapshot_path is None or self.repo.source is None:
+            return False
+        loaded = read_snapshot(self.snapshot_path, self.repo.source)
+        if loaded is None or (verify and (loaded[1] > self.repo.change_version() or not self._covers(loaded[1]))):
+            return False
+        df, self.version = loaded
+        self._df = compact_frame(df, self.table).set_index("id", drop=False)
+        self.stats["snapshot_loads"] += 1
+        return True
+
+    def _covers(self, version):
+        """True when no change log entry after `version` can have been pruned."""
+        oldest = self.repo.oldest_change()
+        return oldest is None or oldest <= version + 1
+
+    def _save_snapshot(self, now):
+        if self.snapshot_path is None or self.repo.source is None:
+            return
+        write_snapshot(self.snapshot_path, self._df, self.version, self.repo.source)
+        self._snapshot_saved = now
+        self.stats["snapshot_writes"] += 1
+
+    def rows(self, row_ids):
+        """
+        Returns the given rows in the given order, skipping unknown IDs, without syncing.
+        """
+        with self._lock:
+            if self._df is None:
+                return None
+            known = [row_id for row_id in row_ids if row_id in self._df.index]
+            return self._df.loc[known].reset_index(drop=True).copy()
+
+    def snapshot(self):
+        """
+        Returns a copy of the current table contents, syncing first.
+
+        Returns:
+            pd.DataFrame: One row per table row, ordered by id.
+        """
+        self.sync()
+        with self._lock:
+            return self._df.reset_index(drop=True).copy()
@@ -0,0 +1,283 @@
+"""
+Query timing and hot-path instrumentation.
+
+Records, per Streamlit rerun, how long connection checkouts, every SQL
+statement, DataFrame conversions and each UI section took, and keeps process
+totals that can be exported in Prometheus text format.
+"""
+
+import logging
+import os
+import re
+import reprlib
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+logger = logging.getLogger("library.sql")
+
+_current_run = ContextVar("library_current_run", default=None)
+
+
+def metric_name(name):
+    """Replaces characters Prometheus does not allow in metric and label names with underscores."""
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def normalize_sql(sql):
+    """
+    Collapses whitespace and IN-lists so statements that only differ in the
+    number of parameters share one metrics label.
+    """
+    sql = re.sub(r"\s+", " ", sql).strip()
+    return re.sub(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)", "(...)", sql)
+
+
+class RunMetrics:
+    """
+    Measurements collected during one rerun of the Streamlit script.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sections = {}
+        self.queries = []
+        self.connect_ms = 0.0
+        self.connects = 0
+        self.dataframe_ms = 0.0
+        self.round_trips = 0
+        self.total_ms = None
+        self._section = None
+
+    def summary(self):
+        return {
+            "total_ms": self.total_ms,
+            "round_trips": self.round_trips,
+            "queries": len(self.queries),
+            "query_ms": sum(q["ms"] for q in self.queries),
+            "connects": self.connects,
+            "connect_ms": self.connect_ms,
+            "dataframe_ms": self.dataframe_ms,
+        }
+
+
+class Instrumentation:
+    """
+    Collects timings for database calls and UI sections.
+
+    Workflow:
+    1. The UI calls start_run() at the top of every rerun and enter_section(name)
+       at the start of each major section (the previous section ends there).
+    2. The repository reports connection checkouts, statements (with duration,
+       row count and parameters) and DataFrame conversions.
+    3. finish_run() closes the last section, adds the rerun to the process totals
+       and rewrites the Prometheus metrics file if one is configured.
+    4. Statements slower than `slow_query_ms` are logged with their SQL and parameters.
+
+    Args:
+        slow_query_ms (float): Threshold for the slow-query log.
+        metrics_file (str | None): Path rewritten with Prometheus text after each rerun.
+    """
+
+    def __init__(self, slow_query_ms=200, metrics_file=None):
+        self.slow_query_ms = slow_query_ms
+        self.metrics_file = metrics_file
+        self._lock = threading.Lock()
+        self._query_totals = defaultdict(lambda: [0, 0.0, 0])
+        self._section_totals = defaultdict(lambda: [0, 0.0])
+        self._counters = defaultdict(float)
+        self._server = None
+
+    # --- Per rerun ---
+    def start_run(self):
+        run = RunMetrics()
+        _current_run.set(run)
+        return run
+
+    def current_run(self):
+        return _current_run.get()
+
+    def enter_section(self, name):
+        run = _current_run.get()
+        if run is None:
+            return
+        now = time.perf_counter()
+        self._close_section(run, now)
+        run._section = (name, now)
+
+    def _close_section(self, run, now):
+        if run._section is None:
+            return
+        name, started = run._section
+        elapsed = (now - started) * 1000
+        run.sections[name] = run.sections.get(name, 0.0) + elapsed
+        run._section = None
+        with self._lock:
+            totals = self._section_totals[name]
+            totals[0] += 1
+            totals[1] += elapsed
+
+    def finish_run(self, extra_gauges=None):
+        run = _current_run.get()
+        if run is None:
+            return None
+        now = time.perf_counter()
+        self._close_section(run, now)
+        run.total_ms = (now - run.started) * 1000
+        with self._lock:
+            self._counters["reruns"] += 1
+            self._counters["rerun_seconds"] += run.total_ms / 1000
+        if self.metrics_file:
+            self.write_metrics_file(extra_gauges)
+        return run
+
+    # --- Reported by the repository ---
+    @contextmanager
+    def time_connect(self):
+        started = time.perf_counter()
+        yield
+        elapsed = (time.perf_counter() - started) * 1000
+        run = _current_run.get()
+        if run is not None:
+            run.connects += 1
+            run.connect_ms += elapsed
+        with self._lock:
+            self._counters["connects"] += 1
+            self._counters["connect_seconds"] += elapsed / 1000
+
+    @contextmanager
+    def time_dataframe(self):
+        started = time.perf_counter()
+        yield
+        run = _current_run.get()
+        if run is not None:
+            run.dataframe_ms += (time.perf_counter() - started) * 1000
+
+    def record_query(self, sql, params, elapsed_ms, rows):
+        label = normalize_sql(sql)
+        run = _current_run.get()
+        if run is not None:
+            run.round_trips += 1
+            run.queries.append({"sql": label, "ms": elapsed_ms, "rows": rows})
+        with self._lock:
+            totals = self._query_totals[label]
+            totals[0] += 1
+            totals[1] += elapsed_ms / 1000
+            totals[2] += max(rows, 0)
+            self._counters["round_trips"] += 1
+            if elapsed_ms >= self.slow_query_ms:
+                self._counters["slow_queries"] += 1
+        if elapsed_ms >= self.slow_query_ms:
+            logger.warning("Slow query (%.1f ms): %s params=%s", elapsed_ms, label, reprlib.repr(params))
+
+    def record_round_trip(self):
+        """Counts a round trip that is not a statement, e.g. COMMIT or BEGIN."""
+        run = _current_run.get()
+        if run is not None:
+            run.round_trips += 1
+        with self._lock:
+            self._counters["round_trips"] += 1
+
+    # --- Export ---
+    def prometheus_text(self, extra_gauges=None):
+        """
+        Renders the process totals in Prometheus text exposition format.
+
+        Args:
+            extra_gauges (dict | None): {component: {name: value}} added as
+                `library_<component>_<name>` gauges, e.g. the repository stats().
+                A component holding one dict per instance, e.g.
+                {"replica_pool": {"replica-1:3306": {"checkouts": 3}}}, is added as
+                `library_replica_pool_checkouts{replica_pool="replica-1:3306"}`.
+        """
+        lines = []
+
+        def escape(value):
+            return value.replace("\\", "\\\\").replace('"', '\\"')
+
+        with self._lock:
+            lines += ["# TYPE library_query_duration_seconds summary"]
+            for label, (count, seconds, _) in sorted(self._query_totals.items()):
+                lines.append(f'library_query_duration_seconds_count{{sql="{escape(label)}"}} {count}')
+                lines.append(f'library_query_duration_seconds_sum{{sql="{escape(label)}"}} {seconds:.6f}')
+            lines += ["# TYPE library_query_rows_total counter"]
+            for label, (_, _, rows) in sorted(self._query_totals.items()):
+                lines.append(f'library_query_rows_total{{sql="{escape(label)}"}} {rows}')
+            lines += ["# TYPE library_section_duration_seconds summary"]
+            for name, (count, ms) in sorted(self._section_totals.items()):
+                lines.append(f'library_section_duration_seconds_count{{section="{escape(name)}"}} {count}')
+                lines.append(f'library_section_duration_seconds_sum{{section="{escape(name)}"}} {ms / 1000:.6f}')
+            for name in ("reruns", "rerun_seconds", "round_trips", "slow_queries", "connects", "connect_seconds"):
+                lines.append(f"# TYPE library_{name}_total counter")
+                lines.append(f"library_{name}_total {self._counters[name]:g}")
+
+        for component, values in (extra_gauges or {}).items():
+            if values and all(isinstance(value, dict) for value in values.values()):
+                ## Per-instance stats: the instance (e.g. host:port) is a label, never part of the name
+                fields = sorted({name for value in values.values() for name in value})
+                for name in fields:
+                    metric = metric_name(f"library_{component}_{name}")
+                    lines.append(f"# TYPE {metric} gauge")
+                    for instance, value in sorted(values.items()):
+                        if isinstance(value.get(name), (int, float)):
+                            lines.append(f'{metric}{{{metric_name(component)}="{escape(str(instance))}"}} {value[name]:g}')
+                continue
+            for name, value in values.items():
+                if isinstance(value, (int, float)):
+                    metric = metric_name(f"library_{component}_{name}")
+                    lines.append(f"# TYPE {metric} gauge")
+                    lines.append(f"{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_metrics_file(self, extra_gauges=None):
+        ## One temp file per write, sessions finishing at once must not move each other's file away
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=os.path.dirname(os.path.abspath(self.metrics_file)),
+            prefix=f".{os.path.basename(self.metrics_file)}.", suffix=".tmp", delete=False,
+        ) as fh:
+            fh.write(self.prometheus_text(extra_gauges))
+        ## Replace atomically so a scraper never reads a half-written file
+        try:
+            ## Temp files are private; the scraper may run as another user
+            os.chmod(fh.name, 0o644)
+            os.replace(fh.name, self.metrics_file)
+        except OSError:
+            os.unlink(fh.name)
+            raise
+
+    def serve(self, port, extra_gauges=None, host="127.0.0.1"):
+        """
+        Serves /metrics on a local port from a daemon thread (idempotent).
+
+        Args:
+            port (int): Port to listen on.
+            extra_gauges (callable | None): Returns extra gauges at scrape time.
+            host (str): Interface to bind; defaults to localhost only.
+        """
+        if self._server is not None:
+            return
+        ## Imported here, most deployments never serve /metrics
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        instrumentation = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = instrumentation.prometheus_text(extra_gauges() if extra_gauges else None).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
@@ -0,0 +1,179 @@
+"""
+Offline write journal: keeps borrow, return and add operations when the
+database cannot be reached, and replays them once it is back.
+
+With `journal_path` set under [database], a repository whose primary stops
+answering switches to degraded mode: reads are served from the mirrors and the
+read cache as last loaded, journaled writes go to a local SQLite file, and
+sync() probes the primary every `offline_retry_interval` seconds. Once it
+answers, the journal is replayed in order; operations the database no longer
+accepts (a book borrowed elsewhere in the meantime, an ID added twice) are kept
+as conflicts instead of being applied.
+
+    journal_path = "library_journal.db"   # one file per app process
+    offline_retry_interval = 15
+"""
+
+import functools
+import json
+import sqlite3
+import sys
+import threading
+import time
+
+
+## Cannot connect, server gone away, lost connection, not available
+UNAVAILABLE_MYSQL_ERRNOS = {2003, 2005, 2006, 2013, 2055}
+
+
+class DatabaseUnavailable(Exception):
+    """Raised by reads and writes that need the primary database while it is unreachable."""
+
+
+class WriteJournaled(Exception):
+    """
+    Raised instead of a write's result when the write was recorded in the
+    offline journal; it is applied when the database is reachable again.
+    """
+
+    def __init__(self, entry_id, operation):
+        self.entry_id = entry_id
+        self.operation = operation
+        super().__init__(f"Database unavailable, {operation} saved to the offline journal as entry {entry_id}")
+
+
+def is_unavailable(error):
+    """
+    True for errors meaning the database cannot be reached, as opposed to a failing statement.
+
+    A pool checkout timeout (PoolError) is not one: the server answers, this
+    process is just busy, and it must not switch into degraded mode.
+    """
+    mysql = _mysql_driver()
+    if mysql and isinstance(error, mysql.errors.PoolError):
+        return False
+    if mysql and isinstance(error, mysql.Error):
+        return error.errno in UNAVAILABLE_MYSQL_ERRNOS
+    if isinstance(error, sqlite3.OperationalError):
+        return "unable to open" in str(error) or "disk I/O" in str(error)
+    return False
+
+
+def is_conflict(error):
+    """True for writes the database rejects because of its current data, e.g. a duplicate ID."""
+    mysql = _mysql_driver()
+    return isinstance(error, sqlite3.IntegrityError) or bool(mysql and isinstance(error, mysql.IntegrityError))
+
+
+def _mysql_driver():
+    ## Only the MySQL backend imports the driver, and only its errors can be MySQL errors;
+    ## looking it up keeps SQLite deployments from loading it at startup
+    return sys.modules.get("mysql.connector")
+
+
+def _plain(value):
+    ## numpy scalars (IDs taken from DataFrames) are stored as plain numbers
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def journaled(method):
+    """
+    Marks a repository write that goes to the offline journal when the primary
+    is unreachable, and while earlier journaled writes still wait for replay, so
+    the database applies them in the order they were made.
+
+    Only active when the repository has a `journal`; the original method stays
+    available as `method.__wrapped__` for the replay.
+    """
+    @functools.wraps(method)
+    def wrapper(repo, *args):
+        if repo.journal is None:
+            return method(repo, *args)
+        if repo.offline_since is None and not repo.journal.has_pending():
+            try:
+                return method(repo, *args)
+            except DatabaseUnavailable:
+                pass
+            except repo.errors as e:
+                if not is_unavailable(e):
+                    raise
+                repo.go_offline(e)
+        raise WriteJournaled(repo.journal.append(method.__name__, args), method.__name__)
+    return wrapper
+
+
+class WriteJournal:
+    """
+    Durable, ordered log of writes made while the database was unreachable.
+
+    Entries move from "pending" to "applied", "conflict" (the database no longer
+    accepts them) or "failed" (any other error). The file runs in WAL mode and
+    every append is committed before the UI is told the write was saved.
+
+    Args:
+        path (str): Journal database file, created on first use.
+    """
+
+    def __init__(self, path="library_journal.db"):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                operation TEXT NOT NULL,
+                args TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                detail TEXT,
+                finished_at REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_status ON journal (status, id)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, operation, args):
+        """Records one write; returns its entry ID."""
+        cursor = self._conn().execute(
+            "INSERT INTO journal (operation, args, created_at) VALUES (?, ?, ?)",
+            (operation, json.dumps(list(args), default=_plain), time.time()),
+        )
+        return cursor.lastrowid
+
+    def has_pending(self):
+        return self._conn().execute("SELECT 1 FROM journal WHERE status = 'pending' LIMIT 1").fetchone() is not None
+
+    def pending(self):
+        """Returns the pending entries as (id, operation, args) in the order they were made."""
+        rows = self._conn().execute(
+            "SELECT id, operation, args FROM journal WHERE status = 'pending' ORDER BY id"
+        ).fetchall()
+        return [(entry_id, operation, json.loads(args)) for entry_id, operation, args in rows]
+
+    def finish(self, entry_id, status, detail=None):
+        self._conn().execute(
+            "UPDATE journal SET status = ?, detail = ?, finished_at = ? WHERE id = ?",
+            (status, detail, time.time(), entry_id),
+        )
+
+    def problems(self, limit=20):
+        """Returns the newest conflicting or failed entries, newest first."""
+        rows = self._conn().execute(
+            "SELECT id, operation, args, status, detail, created_at FROM journal "
+            "WHERE status IN ('conflict', 'failed') ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        columns = ("id", "operation", "args", "status", "detail", "created_at")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def stats(self):
+        counts = dict(self._conn().execute("SELECT status, COUNT(*) FROM journal GROUP BY status").fetchall())
+        return {"path": self.path, **{status: counts.get(status, 0) for status in ("pending", "applied", "conflict", "failed")}}
@@ -0,0 +1,427 @@
+"""
+Versioned schema migrations for the Library Borrow System.
+
+The `database/` folder only ships INSERT dumps, so this module owns the table
+definitions and the indexes behind the hot queries in the repository layer:
+
+- transactions(buku_id, tanggal_kembali): active-loan lookups for delete/edit/borrow
+- transactions(user_id, tanggal_kembali): the Return tab and Confirm Return
+- books(status, is_delete): the Available Books list and the filtered Book List
+- transactions(tanggal_kembali, tanggal_pinjam): the overdue refresh of `user_loan_summary`
+- transactions(tanggal_pinjam, buku_id, user_id, tanggal_kembali): covering index for
+  the analytics aggregates over a time window
+- users(nama, id): name prefix search and paging in the member directory
+
+It also adds `books.version`, the row version behind the optimistic locking of
+book edits and restores.
+
+Migrations run against MySQL and SQLite; the `dialect` argument picks the
+syntax where the two differ.
+
+Usage from the app:
+    repository.migrate()  # idempotent, safe to call on every startup
+
+Usage from the command line, MySQL only (point it at a scratch database when seeding):
+    python -m storage.migrations --host HOST --port 3306 --user USER --password PASS --database NAME
+    python -m storage.migrations ... --seed-books 100000 --check
+"""
+
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+
+# --- Helpers ---
+def _sql(sql, dialect):
+    if dialect == "sqlite":
+        return sql.replace("%s", "?").replace("NOW()", "datetime('now', 'localtime')")
+    return sql
+
+def _index_exists(cursor, table, index_name):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+        (table, index_name),
+    )
+    return cursor.fetchone()[0] > 0
+
+def _column_exists(cursor, table, column):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        (table, column),
+    )
+    return cursor.fetchone()[0] > 0
+
+def _create_index(cursor, dialect, table, index_name, columns):
+    if dialect == "sqlite":
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(columns)})")
+    ## MySQL has no CREATE INDEX IF NOT EXISTS, so check information_schema first
+    elif not _index_exists(cursor, table, index_name):
+        cursor.execute(f"CREATE INDEX {index_name} ON {table} ({', '.join(columns)})")
+
+
+# --- Migrations ---
+def _m001_core_tables(cursor, dialect):
+    auto_id = "INT NOT NULL AUTO_INCREMENT PRIMARY KEY" if dialect == "mysql" else "INTEGER PRIMARY KEY AUTOINCREMENT"
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS books (
+            id INT NOT NULL PRIMARY KEY,
+            judul VARCHAR(255) NOT NULL,
+            penulis VARCHAR(255) NOT NULL,
+            status TINYINT NOT NULL DEFAULT 1,
+            is_delete TINYINT NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id BIGINT NOT NULL PRIMARY KEY,
+            nama VARCHAR(255) NOT NULL
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id {auto_id},
+            buku_id INT NOT NULL,
+            user_id BIGINT NOT NULL,
+            tanggal_pinjam DATETIME NOT NULL,
+            tanggal_kembali DATETIME NULL
+        )
+    """)
+
+def _m002_hot_path_indexes(cursor, dialect):
+    _create_index(cursor, dialect, "transactions", "idx_transactions_buku_open", ["buku_id", "tanggal_kembali"])
+    _create_index(cursor, dialect, "transactions", "idx_transactions_user_open", ["user_id", "tanggal_kembali"])
+    _create_index(cursor, dialect, "books", "idx_books_status_delete", ["status", "is_delete"])
+
+def _m003_change_log(cursor, dialect):
+    auto_id = "BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY" if dialect == "mysql" else "INTEGER PRIMARY KEY AUTOINCREMENT"
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS change_log (
+            id {auto_id},
+            table_name VARCHAR(32) NOT NULL,
+            row_id BIGINT NOT NULL,
+            changed_at DATETIME NOT NULL
+        )
+    """)
+
+def _m004_user_loan_summary(cursor, dialect):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_loan_summary (
+            user_id BIGINT NOT NULL PRIMARY KEY,
+            active_loans INT NOT NULL DEFAULT 0,
+            total_loans INT NOT NULL DEFAULT 0,
+            overdue_loans INT NOT NULL DEFAULT 0,
+            last_activity DATETIME NULL
+        )
+    """)
+    _create_index(cursor, dialect, "transactions", "idx_transactions_open_since", ["tanggal_kembali", "tanggal_pinjam"])
+    rebuild_loan_summary(cursor, include_archive=False)
+
+def _m005_analytics_index(cursor, dialect):
+    _create_index(cursor, dialect, "transactions", "idx_transactions_borrowed_at",
+                  ["tanggal_pinjam", "buku_id", "user_id", "tanggal_kembali"])
+
+def _m006_transactions_archive(cursor, dialect):
+    ## Same columns as transactions, but ids are copied, not generated
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions_archive (
+            id BIGINT NOT NULL PRIMARY KEY,
+            buku_id INT NOT NULL,
+            user_id BIGINT NOT NULL,
+            tanggal_pinjam DATETIME NOT NULL,
+            tanggal_kembali DATETIME NOT NULL,
+            archived_at DATETIME NOT NULL
+        )
+    """)
+    _create_index(cursor, dialect, "transactions_archive", "idx_archive_borrowed_at",
+                  ["tanggal_pinjam", "buku_id", "user_id", "tanggal_kembali"])
+    _create_index(cursor, dialect, "transactions_archive", "idx_archive_user", ["user_id"])
+
+def _m007_book_version(cursor, dialect):
+    ## MySQL DDL commits on its own, so a half-applied run may already have added the column
+    if dialect == "sqlite" or not _column_exists(cursor, "books", "version"):
+        cursor.execute("ALTER TABLE books ADD COLUMN version INT NOT NULL DEFAULT 0")
+
+def _m008_user_name_index(cursor, dialect):
+    ## SQLite only uses an index for its case-insensitive LIKE when the index is NOCASE
+    name = "nama COLLATE NOCASE" if dialect == "sqlite" else "nama"
+    _create_index(cursor, dialect, "users", "idx_users_nama", [name, "id"])
+
+
+def rebuild_loan_summary(cursor, include_archive=True):
+    """
+    Recomputes `user_loan_summary` from the whole transaction log, including
+    archived loans unless `include_archive` is False (before the archive exists).
+
+    Only needed after transactions were written outside the repository (the
+    migration itself, dump seeding, synthetic datasets); overdue counts start at
+    zero and are filled in by the repository's periodic refresh.
+    """
+    loans = "transactions"
+    if include_archive:
+        loans = ("(SELECT user_id, tanggal_pinjam, tanggal_kembali FROM transactions UNION ALL "
+                 "SELECT user_id, tanggal_pinjam, tanggal_kembali FROM transactions_archive) loans")
+    cursor.execute("DELETE FROM user_loan_summary")
+    cursor.execute(f"""
+        INSERT INTO user_loan_summary (user_id, active_loans, total_loans, overdue_loans, last_activity)
+        SELECT user_id,
+               SUM(CASE WHEN tanggal_kembali IS NULL THEN 1 ELSE 0 END),
+               COUNT(*),
+               0,
+               MAX(COALESCE(tanggal_kembali, tanggal_pinjam))
+        FROM {loans}
+        GROUP BY user_id
+    """)
+
+
+MIGRATIONS = [
+    (1, "create books, users and transactions tables", _m001_core_tables),
+    (2, "composite indexes for active-loan and availability lookups", _m002_hot_path_indexes),
+    (3, "change log for incremental sync of books and users", _m003_change_log),
+    (4, "per-user loan summary maintained by borrow/return", _m004_user_loan_summary),
+    (5, "covering index for loan analytics by borrow date", _m005_analytics_index),
+    (6, "archive table for old closed loans", _m006_transactions_archive),
+    (7, "row version on books for optimistic locking", _m007_book_version),
+    (8, "name index for the member directory search", _m008_user_name_index),
+]
+
+
+def apply_migrations(conn, dialect="mysql", lock_timeout=30):
+    """
+    Applies every migration that has not been recorded in `schema_migrations` yet.
+
+    Workflow:
+    1. Takes a lock so several app processes starting at once do not run the same
+       migration twice (a named lock on MySQL, `BEGIN IMMEDIATE` on SQLite).
+    2. Creates the `schema_migrations` bookkeeping table if needed.
+    3. Runs each pending migration in version order and records it.
+    4. Releases the lock.
+
+    Args:
+        conn: An open MySQL or SQLite connection (a pooled one is fine).
+        dialect (str): "mysql" or "sqlite".
+        lock_timeout (int): Seconds to wait for another process to finish migrating.
+
+    Returns:
+        list: Versions applied by this call (empty when the schema is up to date).
+
+    Raises:
+        mysql.connector.Error | sqlite3.Error: If a migration statement fails.
+        RuntimeError: If the migration lock cannot be acquired.
+    """
+    cursor = conn.cursor()
+    if dialect == "sqlite":
+        ## SQLite DDL is transactional, so the whole run is one write transaction
+        cursor.execute("BEGIN IMMEDIATE")
+    else:
+        cursor.execute("SELECT GET_LOCK('library_schema_migrations', %s)", (lock_timeout,))
+        if cursor.fetchone()[0] != 1:
+            cursor.close()
+            raise RuntimeError("Could not acquire the schema migration lock")
+
+    applied = []
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT NOT NULL PRIMARY KEY,
+                description VARCHAR(255) NOT NULL,
+                applied_at DATETIME NOT NULL
+            )
+        """)
+        cursor.execute("SELECT version FROM schema_migrations")
+        done = {row[0] for row in cursor.fetchall()}
+
+        for version, description, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            migrate(cursor, dialect)
+            cursor.execute(
+                _sql("INSERT INTO schema_migrations (version, description, applied_at) VALUES (%s, %s, NOW())", dialect),
+                (version, description),
+            )
+            if dialect == "mysql":
+                conn.commit()
+            applied.append(version)
+
+        if dialect == "sqlite":
+            conn.commit()
+    except Exception:
+        if dialect == "sqlite":
+            conn.rollback()
+        raise
+    finally:
+        if dialect == "mysql":
+            cursor.execute("SELECT RELEASE_LOCK('library_schema_migrations')")
+            cursor.fetchall()
+        cursor.close()
+
+    return applied
+
+
+# --- Query plan check ---
+def hot_queries(repo, book_ids, user_id):
+    """
+    Returns the filtered queries the repository runs on every rerun or write, with
+    representative parameters, as (name, sql, params) tuples in `repo`'s dialect.
+
+    The statements come from the same `_*_sql()` builders the repository and the
+    analytics reports execute, so the check cannot drift from the running code.
+    Whole-table listings (`SELECT * FROM books` / `users` and the Available Books
+    list, which returns most of the catalogue) are full scans by design and are
+    not part of the check, and neither is the member search by an ID prefix
+    shorter than MIN_ID_RANGE_PREFIX, which walks the primary key until the
+    page is full.
+
+    Args:
+        repo (SQLRepository): Builds the statements; no connection is opened.
+        book_ids (list): A few existing book IDs used as query parameters.
+        user_id (int): An existing user ID used as query parameter.
+    """
+    ## Imported here: only the plan check needs the reports, not the app's startup
+    from storage.analytics import LoanAnalytics, window_bounds
+    from storage.base import MIN_ID_RANGE_PREFIX
+
+    ids = list(book_ids)
+    start, end = window_bounds(30)
+    archive_cutoff = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d %H:%M:%S")
+    statements = [
+        ("book page", repo._book_page_sql(20, ("after", ids[0]), status=1)),
+        ("active loans", repo._active_loans_sql(ids)),
+        ("cart validation", repo._available_books_sql(ids)),
+        ("borrow", repo._available_books_sql(ids, lock=True)),
+        ("member search", repo._user_name_search_sql("a", 21)),
+        ("member search page", repo._user_name_search_sql("a", 21, ("a", user_id))),
+        ("member search by id", repo._user_id_search_sql(str(user_id).ljust(MIN_ID_RANGE_PREFIX, "0")[:MIN_ID_RANGE_PREFIX], 21)),
+        ("member lookup", repo._user_sql(user_id)),
+        ("return tab", repo._borrowed_books_sql(user_id)),
+        ("confirm return", repo._returnable_loans_sql(user_id, ids)),
+        ("soft delete", repo._deletable_books_sql(ids)),
+        ("soft delete loans", repo._open_loans_sql(ids)),
+        ("overdue refresh", repo._overdue_counts_sql()),
+        ("analytics window", LoanAnalytics._totals_sql(start, end)),
+        ("analytics top books", LoanAnalytics._most_borrowed_sql(start, end, 10)),
+        ("archive batch", repo._archive_batch_sql(archive_cutoff, 1000)),
+    ]
+    return [(name, repo._sql(sql), params) for name, (sql, params) in statements]
+
+def check_query_plans(conn, repo, book_ids, user_id):
+    """
+    Runs EXPLAIN on every hot query and reports the ones that scan a whole table
+    (`type = ALL`) or a whole index (`type = index`).
+
+    Scans of derived tables (`<derived2>`, `<union1,2>`) are left out: they read
+    the already filtered rows of a subquery, like the UNION ALL of live and
+    archived loans in the analytics reports.
+
+    Args:
+        conn: An open MySQL connection to a database with representative data.
+        repo (MySQLRepository): Builds the statements, see hot_queries().
+        book_ids (list): A few existing book IDs used as query parameters.
+        user_id (int): An existing user ID used as query parameter.
+
+    Returns:
+        list: (query name, table, scan type) for every full scan; empty means all good.
+    """
+    cursor = conn.cursor(dictionary=True)
+    full_scans = []
+    for name, sql, params in hot_queries(repo, book_ids, user_id):
+        cursor.execute(f"EXPLAIN {sql}", tuple(params))
+        for plan in cursor.fetchall():
+            if plan["type"] in ("ALL", "index") and not str(plan["table"]).startswith("<"):
+                full_scans.append((name, plan["table"], plan["type"]))
+    cursor.close()
+    return full_scans
+
+def seed_large_dataset(conn, books=100000, users=10000, loans=200000, batch_size=5000):
+    """
+    Fills the MySQL tables with synthetic rows so EXPLAIN reflects a real catalogue.
+
+    Rows are appended after the current maximum IDs; roughly one loan in ten is
+    left open. Run this against a scratch database only.
+
+    Returns:
+        tuple: (first seeded book id, first seeded user id)
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM books")
+    first_book = cursor.fetchone()[0] + 1
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM users")
+    first_user = cursor.fetchone()[0] + 1
+
+    def insert(sql, rows):
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+            conn.commit()
+
+    insert("INSERT INTO books (id, judul, penulis, status, is_delete) VALUES (%s, %s, %s, %s, %s)",
+           [(first_book + i, f"Book {i}", f"Author {i % 997}", 1, int(i % 50 == 0)) for i in range(books)])
+    insert("INSERT INTO users (id, nama) VALUES (%s, %s)",
+           [(first_user + i, f"User {i}") for i in range(users)])
+    insert("INSERT INTO transactions (buku_id, user_id, tanggal_pinjam, tanggal_kembali) "
+           "VALUES (%s, %s, NOW() - INTERVAL %s DAY, IF(%s, NULL, NOW()))",
+           [(first_book + random.randrange(books), first_user + random.randrange(users),
+             random.randrange(365), i % 10 == 0) for i in range(loans)])
+
+    rebuild_loan_summary(cursor)
+    conn.commit()
+
+    for table in ("books", "users", "transactions"):
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+    cursor.close()
+    return first_book, first_user
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply schema migrations and check hot-query plans.")
+    parser.add_argument("--host", required=True)
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", required=True)
+    parser.add_argument("--seed-books", type=int, default=0, help="seed this many synthetic books first (scratch DB only)")
+    parser.add_argument("--check", action="store_true", help="fail if any hot query does a full table scan")
+    args = parser.parse_args(argv)
+
+    ## Imported here: the repositories import this module, and SQLite deployments never need the driver
+    import mysql.connector
+    conn = mysql.connector.connect(host=args.host, port=args.port, user=args.user,
+                                   password=args.password, database=args.database)
+    applied = apply_migrations(conn)
+    print(f"Applied migrations: {applied or 'none, schema is up to date'}")
+
+    if args.seed_books:
+        first_book, first_user = seed_large_dataset(conn, books=args.seed_books,
+                                                    users=max(args.seed_books // 10, 1),
+                                                    loans=args.seed_books * 2)
+        print(f"Seeded {args.seed_books} books starting at id {first_book}")
+
+    if args.check:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM books ORDER BY id DESC LIMIT 5")
+        book_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT user_id FROM transactions ORDER BY id DESC LIMIT 1")
+        row = cursor.fetchone()
+        user_id = row[0] if row else 0
+        cursor.close()
+
+        from storage.mysql_repository import MySQLRepository
+        repo = MySQLRepository({"host": args.host, "port": args.port, "name": args.database,
+                                "user": args.user, "password": args.password})
+        full_scans = check_query_plans(conn, repo, book_ids, user_id)
+        for name, table, scan in full_scans:
+            kind = "table" if scan == "ALL" else "index"
+            print(f"❌ Full {kind} scan in '{name}' on table {table}")
+        if full_scans:
+            conn.close()
+            return 1
+        print("✅ All hot queries use an index lookup or range")
+
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
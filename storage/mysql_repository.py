@@ -0,0 +1,111 @@
+"""
+MySQL backend for the library repository, backed by the shared connection pool.
+"""
+
+from contextlib import contextmanager
+
+import mysql.connector
+
+from storage.base import SQLRepository
+from storage.journal import is_unavailable
+from storage.pool import ConnectionPool
+
+
+class MySQLRepository(SQLRepository):
+    """
+    Repository talking to the remote MySQL database.
+
+    Args:
+        config (dict): The [database] section of secrets.toml:
+            host, name, port, user, password, and optionally
+            connect_timeout, pool_size, pool_timeout, pool_recycle and replicas.
+        cache (ReadCache | None): Read cache shared by this repository.
+        instrumentation (Instrumentation | None): Receives query and checkout timings.
+        **options: loan_days and summary_interval, see SQLRepository. `replicas`
+            are mappings of host and optionally port, name, user, password and
+            pool_size; missing keys are taken from `config`.
+    """
+
+    dialect = "mysql"
+    errors = (mysql.connector.Error,)
+
+    def __init__(self, config, cache=None, instrumentation=None, **options):
+        ## Set first: the base class builds the replica pools from it
+        self.config = config
+        self.replica_pools = {}
+        super().__init__(cache, instrumentation, **options)
+        self.pool = self._create_pool(config)
+
+    def _create_pool(self, config):
+        return ConnectionPool(
+            lambda: self.open_connection(config),
+            size = int(config.get("pool_size", 5)),
+            timeout = float(config.get("pool_timeout", 10)),
+            recycle = float(config.get("pool_recycle", 1800)),
+        )
+
+    @property
+    def source(self):
+        return f"mysql://{self.config['host']}:{self.config['port']}/{self.config['name']}"
+
+    def open_connection(self, config=None):
+        """
+        Opens a brand-new connection to the primary, or to the server in `config`;
+        application code borrows from the pools instead.
+
+        Raises:
+            mysql.connector.Error: If the connection fails due to invalid credentials or unreachable host.
+        """
+        config = config or self.config
+        return mysql.connector.connect(
+            host = config["host"],
+            database = config["name"],
+            port = config["port"],
+            user = config["user"],
+            password = config["password"],
+            ## An unreachable server fails fast instead of hanging the rerun
+            connection_timeout = int(config.get("connect_timeout", 10)),
+        )
+
+    @contextmanager
+    def connection(self):
+        conn = self.pool.checkout()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def begin(self, conn):
+        conn.start_transaction()
+
+    def replica_endpoint(self, endpoint):
+        keys = ("name", "port", "user", "password", "connect_timeout", "pool_size", "pool_timeout", "pool_recycle")
+        config = {**{key: self.config[key] for key in keys if key in self.config}, **dict(endpoint)}
+        name = f"{config['host']}:{config['port']}"
+        pool = self.replica_pools[name] = self._create_pool(config)
+
+        @contextmanager
+        def connection():
+            conn = pool.checkout()
+            try:
+                yield conn
+            finally:
+                conn.close()
+        return name, connection
+
+    def prime_connections(self):
+        try:
+            return self.pool.prime()
+        except self.errors as e:
+            ## Down at startup: with a journal the app starts in degraded mode instead
+            if self.journal is None or not is_unavailable(e):
+                raise
+            self.go_offline(e)
+            return 0
+
+    def stats(self):
+        stats = super().stats()
+        stats["pool"] = self.pool.stats()
+        if self.replica_pools:
+            stats["replica_pool"] = {name: pool.stats() for name, pool in self.replica_pools.items()}
+        return stats
@@ -0,0 +1,198 @@
+"""
+Process-wide MySQL connection pool with ping-on-checkout and recycling.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a MySQL connection borrowed from a ConnectionPool.
+
+    Every attribute (cursor(), commit(), rollback(), ...) is forwarded to the
+    underlying connection, so existing call sites keep working unchanged. The only
+    difference is close(): instead of tearing down the TCP/TLS session, it hands the
+    connection back to the pool for the next caller.
+
+    Note:
+        close() is idempotent, so the double `conn.close()` found in some handlers
+        is harmless.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw, self._created_at)
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of reusable MySQL connections.
+
+    Workflow:
+    1. checkout() hands out an idle connection if one is available.
+       - Connections older than `recycle` seconds are closed and replaced.
+       - Idle connections are pinged first; dead ones are replaced transparently.
+    2. If no idle connection exists and fewer than `size` are open, a new one is opened.
+    3. Otherwise the caller waits up to `timeout` seconds for a connection to be released.
+    4. close() on the borrowed connection returns it to the pool (rolling back any
+       uncommitted work first).
+
+    Args:
+        connect (callable): Zero-argument factory returning a new raw connection.
+        size (int): Maximum number of open connections.
+        timeout (float): Seconds to wait for a free connection before giving up.
+        recycle (float): Maximum age in seconds before a connection is reopened.
+
+    Raises:
+        mysql.connector.errors.PoolError: If no connection becomes free within `timeout`.
+    """
+
+    def __init__(self, connect, size=5, timeout=10, recycle=1800):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self._idle = deque()
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "opens": 0,
+            "recycles": 0,
+            "ping_failures": 0,
+            "timeouts": 0,
+        }
+
+    def checkout(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._stats["checkouts"] += 1
+            waited = False
+            while not self._idle and self._opened >= self.size:
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise mysql.connector.errors.PoolError(
+                        f"No free connection after waiting {self.timeout}s (pool size {self.size})"
+                    )
+                self._cond.wait(remaining)
+
+            if self._idle:
+                raw, created_at = self._idle.pop()
+            else:
+                ## Reserve the slot now, open the connection outside the lock
+                raw, created_at = None, None
+                self._opened += 1
+
+        if raw is not None and not self._is_usable(raw, created_at):
+            raw = None
+
+        if raw is None:
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._opened -= 1
+                    self._cond.notify()
+                raise
+            created_at = time.monotonic()
+            with self._cond:
+                self._stats["opens"] += 1
+
+        return PooledConnection(self, raw, created_at)
+
+    def prime(self, count=None):
+        """
+        Opens up to `count` connections (default: the pool size) in parallel and
+        parks them idle, so the first requests after startup do not each wait for
+        a TCP/TLS handshake.
+
+        Returns:
+            int: Number of connections checked out and returned.
+        """
+        count = min(count or self.size, self.size)
+        with ThreadPoolExecutor(max_workers=count, thread_name_prefix="library-pool-prime") as executor:
+            conns = list(executor.map(lambda _: self.checkout(), range(count)))
+        for conn in conns:
+            conn.close()
+        return len(conns)
+
+    def _is_usable(self, raw, created_at):
+        ## Recycle old connections before the server's wait_timeout kills them
+        if time.monotonic() - created_at > self.recycle:
+            self._close_quietly(raw)
+            with self._cond:
+                self._stats["recycles"] += 1
+            return False
+
+        ## Ping-on-checkout, the slot stays reserved so a new connection is opened instead
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            self._close_quietly(raw)
+            with self._cond:
+                self._stats["ping_failures"] += 1
+            return False
+
+    def _release(self, raw, created_at):
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+        except mysql.connector.Error:
+            self._close_quietly(raw)
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            return
+
+        with self._cond:
+            self._idle.append((raw, created_at))
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except mysql.connector.Error:
+            pass
+
+    def stats(self):
+        """
+        Returns a snapshot of the pool counters for monitoring.
+
+        Returns:
+            dict: checkouts, waits, opens, recycles, ping_failures, timeouts,
+                  plus the current number of open, idle and in-use connections.
+        """
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot["open"] = self._opened
+            snapshot["idle"] = len(self._idle)
+            snapshot["in_use"] = self._opened - len(self._idle)
+            snapshot["size"] = self.size
+        return snapshot
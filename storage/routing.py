@@ -0,0 +1,149 @@
+"""
+Read routing between the primary database and read replicas.
+
+Writes, and every read that has to see them, go to the primary. Other reads
+rotate over the replicas that are caught up far enough. Replication progress is
+measured with the `change_log` id every write already appends: a replica whose
+newest change id is at least a read's "floor" has every write the read needs.
+
+    [database]
+    replicas = ["replica.db"]            # SQLite: read-only copies of `path`
+
+    [[database.replicas]]                # MySQL: one table per replica; missing keys
+    host = "replica-1.example.com"       # (name, port, user, password) come from the primary
+"""
+
+import bisect
+import itertools
+import threading
+import time
+
+
+class Replica:
+    """
+    One read replica.
+
+    Args:
+        name (str): Shown in stats(), e.g. "host:port" or a file path.
+        connection (callable): Returns a context manager yielding a DB-API connection.
+    """
+
+    def __init__(self, name, connection):
+        self.name = name
+        self.connection = connection
+        self.version = None
+        self.lag = None
+        self.down_until = 0.0
+        self.reads = 0
+        self.errors = 0
+
+
+class ReplicaRouter:
+    """
+    Picks the replica for a read, or None for the primary.
+
+    Workflow:
+    1. SQLRepository.check_replicas() reports the primary's and each replica's
+       newest change id through observe_primary() and record(). A replica's lag is how long
+       ago this process first saw the primary at a change id the replica has not
+       reached yet, so no clocks are compared across servers.
+    2. pick(floor) rotates round-robin over replicas with a known change id of at
+       least `floor` and a lag of at most `max_lag` seconds.
+    3. The floor never drops below the newest change id written by this process
+       (raise_floor() after every commit), which pins reads of the app's own
+       writes, and of the shared read cache, to the primary until a replica has them.
+    4. A replica that raised an error is skipped for `retry_after` seconds.
+
+    Args:
+        replicas (list): Replica instances.
+        max_lag (float): Seconds a replica may trail the primary and still serve reads.
+        check_interval (float): Seconds between two replication checks.
+        retry_after (float): Seconds a failed replica is skipped.
+    """
+
+    def __init__(self, replicas, max_lag=5.0, check_interval=2.0, retry_after=30.0):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.retry_after = retry_after
+        self.floor = 0
+        self._checked = None
+        self._primary = []
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {"primary_reads": 0, "fallback_behind": 0, "fallback_unavailable": 0}
+
+    def due(self):
+        """True when the next replication check is due."""
+        with self._lock:
+            return self._checked is None or time.monotonic() - self._checked >= self.check_interval
+
+    def available(self):
+        """Replicas that are not skipped after an error."""
+        now = time.monotonic()
+        return [replica for replica in self.replicas if replica.down_until <= now]
+
+    def observe_primary(self, version):
+        now = time.monotonic()
+        with self._lock:
+            self._checked = now
+            if not self._primary or version > self._primary[-1][0]:
+                self._primary.append((version, now))
+                ## Only versions some replica may still trail matter for the lag
+                versions = [replica.version for replica in self.replicas if replica.version is not None]
+                if versions:
+                    reached = bisect.bisect_right(self._primary, (min(versions), float("inf")))
+                    del self._primary[:min(reached, len(self._primary) - 1)]
+
+    def record(self, replica, version):
+        now = time.monotonic()
+        with self._lock:
+            replica.version = version
+            index = bisect.bisect_right(self._primary, (version, float("inf")))
+            replica.lag = 0.0 if index == len(self._primary) else now - self._primary[index][1]
+
+    def fail(self, replica):
+        with self._lock:
+            replica.errors += 1
+            replica.down_until = time.monotonic() + self.retry_after
+
+    def raise_floor(self, version):
+        """Makes every later read see at least change id `version`."""
+        with self._lock:
+            self.floor = max(self.floor, version)
+
+    def pick(self, floor=0):
+        """
+        Returns the replica for a read that needs change id `floor`, or None for the primary.
+        """
+        now = time.monotonic()
+        with self._lock:
+            floor = max(floor, self.floor)
+            start = next(self._turn)
+            reachable = False
+            for offset in range(len(self.replicas)):
+                replica = self.replicas[(start + offset) % len(self.replicas)]
+                if replica.down_until > now or replica.version is None:
+                    continue
+                reachable = True
+                if replica.version >= floor and replica.lag <= self.max_lag:
+                    replica.reads += 1
+                    return replica
+            self._stats["primary_reads"] += 1
+            self._stats["fallback_behind" if reachable else "fallback_unavailable"] += 1
+            return None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, floor=self.floor)
+            stats["replicas"] = {
+                replica.name: {
+                    "reads": replica.reads,
+                    "errors": replica.errors,
+                    "version": replica.version,
+                    "lag_s": None if replica.lag is None else round(replica.lag, 1),
+                    "down": replica.down_until > time.monotonic(),
+                }
+                for replica in self.replicas
+            }
+        return stats
@@ -0,0 +1,231 @@
+"""
+In-process trigram index for searching books by title and author.
+
+Supports prefix, substring and typo-tolerant matching and is updated
+incrementally from the books change feed, so a catalogue of 100k+ titles is
+searched in milliseconds without touching the database.
+"""
+
+import bisect
+import itertools
+import threading
+import unicodedata
+from collections import defaultdict
+
+
+def normalize(text):
+    """Lower-cases, strips accents and collapses whitespace."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def trigrams(text):
+    """Trigrams of the text padded with spaces, so word starts and ends count too."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class BookSearchIndex:
+    """
+    Trigram and word-prefix index over `judul` and `penulis`.
+
+    Workflow:
+    1. add()/remove() keep, per book, the normalized "title author" text, its
+       trigrams in an inverted index and its words in a sorted list for prefix lookups.
+    2. search() first intersects the postings of the query's trigrams to find exact
+       substring matches, ranking word-prefix matches highest. Queries of one or
+       two characters use the word-prefix list instead.
+    3. When that does not fill `limit`, candidates from the rarest padded query
+       trigrams are scored by the share of query trigrams they contain (typo
+       tolerance); those below `min_similarity` are dropped.
+    4. rebuild_in_background() builds a full index on a thread; add()/remove()
+       calls made meanwhile are replayed onto it before it is swapped in, and
+       search() waits until it is.
+
+    Args:
+        min_similarity (float): Share of query trigrams a typo match needs.
+        max_grams (int): How many of the rarest query trigrams generate candidates.
+        max_candidates (int): Upper bound on typo candidates scored per query.
+    """
+
+    def __init__(self, min_similarity=0.45, max_grams=8, max_candidates=5000):
+        self.min_similarity = min_similarity
+        self.max_grams = max_grams
+        self.max_candidates = max_candidates
+        self._docs = {}
+        self._grams = defaultdict(set)
+        self._words = []
+        self._lock = threading.RLock()
+        self._ready = threading.Event()
+        self._ready.set()
+        self._builds = itertools.count(1)
+        self._build_id = 0
+        self._pending = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, book_id, title, author):
+        text = normalize(f"{title} {author}")
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((book_id, text))
+            self._add(book_id, text)
+
+    def _add(self, book_id, text):
+        if book_id in self._docs:
+            self._remove(book_id)
+        self._docs[book_id] = text
+        for gram in trigrams(text):
+            self._grams[gram].add(book_id)
+        for word in set(text.split()):
+            bisect.insort(self._words, (word, book_id))
+
+    def remove(self, book_id):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((book_id, None))
+            if book_id in self._docs:
+                self._remove(book_id)
+
+    def _remove(self, book_id):
+        text = self._docs.pop(book_id)
+        for gram in trigrams(text):
+            postings = self._grams.get(gram)
+            if postings is not None:
+                postings.discard(book_id)
+                if not postings:
+                    del self._grams[gram]
+        for word in set(text.split()):
+            index = bisect.bisect_left(self._words, (word, book_id))
+            if index < len(self._words) and self._words[index] == (word, book_id):
+                del self._words[index]
+
+    def rebuild(self, rows):
+        """
+        Replaces the whole index from (id, judul, penulis) tuples in one pass.
+        """
+        built = self._build(rows)
+        with self._lock:
+            ## Also supersedes a background rebuild still running
+            self._build_id = next(self._builds)
+            self._docs, self._grams, self._words = built
+            self._pending = None
+            self._ready.set()
+
+    def rebuild_in_background(self, rows):
+        """
+        Like rebuild(), but builds on a daemon thread and returns it right away.
+
+        Until the new index is swapped in, search() blocks, so results never come
+        from the index being replaced.
+
+        Returns:
+            threading.Thread: The build thread.
+        """
+        rows = list(rows)
+        with self._lock:
+            self._build_id = build_id = next(self._builds)
+            self._pending = []
+            self._ready.clear()
+        thread = threading.Thread(
+            target=self._finish_rebuild, args=(build_id, rows), name="library-search-index", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _finish_rebuild(self, build_id, rows):
+        try:
+            built = self._build(rows)
+            with self._lock:
+                ## A later rebuild supersedes this one
+                if build_id != self._build_id:
+                    return
+                self._docs, self._grams, self._words = built
+                for book_id, text in self._pending:
+                    if text is not None:
+                        self._add(book_id, text)
+                    elif book_id in self._docs:
+                        self._remove(book_id)
+        finally:
+            with self._lock:
+                if build_id == self._build_id:
+                    self._pending = None
+                    self._ready.set()
+
+    def wait_ready(self, timeout=None):
+        """Blocks until no background rebuild is running; returns False on timeout."""
+        return self._ready.wait(timeout)
+
+    @staticmethod
+    def _build(rows):
+        docs = {}
+        grams = defaultdict(set)
+        words = []
+        for book_id, title, author in rows:
+            text = normalize(f"{title} {author}")
+            docs[book_id] = text
+            for gram in trigrams(text):
+                grams[gram].add(book_id)
+            words.extend((word, book_id) for word in set(text.split()))
+        words.sort()
+        return docs, grams, words
+
+    def _prefix_ids(self, prefix):
+        ids = set()
+        index = bisect.bisect_left(self._words, (prefix,))
+        while index < len(self._words) and self._words[index][0].startswith(prefix):
+            ids.add(self._words[index][1])
+            index += 1
+        return ids
+
+    def search(self, query, limit=50):
+        """
+        Returns matching book IDs, best match first.
+
+        Args:
+            query (str): Free text; matched against title and author together.
+            limit (int): Maximum number of IDs to return.
+
+        Returns:
+            list: Book IDs ordered by descending score, then by ID.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        self._ready.wait()
+        with self._lock:
+            if len(query) < 3:
+                return sorted(self._prefix_ids(query))[:limit]
+
+            ## Exact substring matches: every trigram of the query must be present
+            inner = [query[i:i + 3] for i in range(len(query) - 2)]
+            postings = sorted((self._grams.get(g, set()) for g in inner), key=len)
+            exact = set.intersection(*postings) if postings and postings[0] else set()
+            scored = []
+            for book_id in exact:
+                text = self._docs[book_id]
+                if query in text:
+                    prefix = text.startswith(query) or f" {query}" in text
+                    scored.append((-2.5 if prefix else -2.0, book_id))
+
+            ## Typo-tolerant matches, only needed when exact hits do not fill the page
+            if len(scored) < limit:
+                query_grams = trigrams(query)
+                ## Rare trigrams are cheap and selective; common ones only add noise
+                ranked_grams = sorted(query_grams, key=lambda g: len(self._grams.get(g, ())))
+                candidates = set()
+                for gram in ranked_grams[:self.max_grams]:
+                    candidates |= self._grams.get(gram, set())
+                    if len(candidates) > self.max_candidates:
+                        break
+                matched = {book_id for _, book_id in scored}
+                for book_id in candidates - matched:
+                    similarity = len(query_grams & trigrams(self._docs[book_id])) / len(query_grams)
+                    if similarity >= self.min_similarity:
+                        scored.append((-similarity, book_id))
+
+        scored.sort()
+        return [book_id for _, book_id in scored[:limit]]
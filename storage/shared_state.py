@@ -0,0 +1,155 @@
+"""
+State shared by every app process: borrow carts and cache invalidation.
+
+A single Streamlit process keeps everything in memory. When several workers
+run behind a load balancer, a librarian's next request may land on another
+process, so carts live in a shared store and every write bumps a per-table
+generation counter there; each process drops its cached reads of a table once
+it sees that table's generation move.
+
+Backends, picked by `shared_state` under [database]:
+
+    shared_state = "memory"              # default, one process only
+    shared_state = "sqlite"              # several processes on one host
+    shared_state_path = "library_state.db"
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+
+class MemorySharedState:
+    """
+    In-process shared state, for a single app process.
+
+    Values are stored per (namespace, key) as JSON-compatible data, e.g.
+    ("cart", "7") -> [[12345, "Dodol Garut"]]; generations are counters that
+    bump(name) increments.
+    """
+
+    backend = "memory"
+
+    def __init__(self):
+        self._values = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            value = self._values.get((namespace, str(key)))
+        return default if value is None else json.loads(value)
+
+    def set(self, namespace, key, value):
+        ## Stored as JSON so both backends hand out copies of the same shape
+        with self._lock:
+            self._values[(namespace, str(key))] = json.dumps(value)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._values.pop((namespace, str(key)), None)
+
+    def bump(self, name):
+        """Increments the generation counter `name` and returns its new value."""
+        with self._lock:
+            self._generations[name] = self._generations.get(name, 0) + 1
+            return self._generations[name]
+
+    def generations(self):
+        """Returns every generation counter as {name: generation}."""
+        with self._lock:
+            return dict(self._generations)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": self.backend, "values": len(self._values), "generations": dict(self._generations)}
+
+
+class SQLiteSharedState(MemorySharedState):
+    """
+    Shared state in a local SQLite file, for several app processes on one host.
+
+    Each thread keeps its own connection to the file; WAL mode lets readers in
+    other processes continue while one of them writes. Every call is a single
+    autocommitted statement.
+
+    Args:
+        path (str): State database file, created on first use.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path="library_state.db"):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS shared_state (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS generations (name TEXT NOT NULL PRIMARY KEY, generation INTEGER NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key, default=None):
+        row = self._conn().execute(
+            "SELECT value FROM shared_state WHERE namespace = ? AND key = ?", (namespace, str(key))
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, namespace, key, value):
+        self._conn().execute(
+            "INSERT INTO shared_state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+            (namespace, str(key), json.dumps(value), time.time()),
+        )
+
+    def delete(self, namespace, key):
+        self._conn().execute("DELETE FROM shared_state WHERE namespace = ? AND key = ?", (namespace, str(key)))
+
+    def bump(self, name):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO generations (name, generation) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET generation = generation + 1",
+                (name,),
+            )
+            generation = conn.execute("SELECT generation FROM generations WHERE name = ?", (name,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return generation
+
+    def generations(self):
+        return dict(self._conn().execute("SELECT name, generation FROM generations").fetchall())
+
+    def stats(self):
+        values = self._conn().execute("SELECT COUNT(*) FROM shared_state").fetchone()[0]
+        return {"backend": self.backend, "path": self.path, "values": values, "generations": self.generations()}
+
+
+def create_shared_state(config):
+    """
+    Builds the shared-state backend named by `shared_state` in a [database] config mapping.
+    """
+    backend = config.get("shared_state", "memory")
+    if backend == "memory":
+        return MemorySharedState()
+    if backend == "sqlite":
+        return SQLiteSharedState(config.get("shared_state_path", "library_state.db"))
+    raise ValueError(f"Unknown shared_state backend: {backend}")
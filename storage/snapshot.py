@@ -0,0 +1,113 @@
+"""
+Compact in-memory layout and on-disk Parquet snapshots of the mirrored tables.
+
+A TableMirror keeps every row of `books` and `users` in memory. compact_frame()
+gives those DataFrames narrow dtypes (8/32-bit flags and versions, repeated
+author names as a categorical), and the snapshot files let a fresh process
+start from the last known state plus the change log instead of a full table
+read.
+"""
+
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+
+## Arrow-backed text: pandas 3's default "str", which pandas 2 only uses when asked for it
+STRING_DTYPE = "str" if int(pd.__version__.split(".")[0]) >= 3 else "string[pyarrow]"
+
+## Narrow dtypes per mirrored table; columns not listed keep what the driver returned
+COMPACT_DTYPES = {
+    "books": {"id": "int64", "judul": STRING_DTYPE, "penulis": "category", "status": "int8", "is_delete": "int8",
+              "version": "int32"},
+    "users": {"id": "int64", "nama": STRING_DTYPE},
+}
+
+SNAPSHOT_FORMAT = 1
+
+
+def compact_frame(df, table):
+    """
+    Returns `df` with the narrow dtypes of COMPACT_DTYPES[table]; text columns
+    that are not categorical become Arrow strings, also on pandas 2.
+    """
+    dtypes = {col: dtype for col, dtype in COMPACT_DTYPES.get(table, {}).items() if col in df.columns}
+    return df.astype(dtypes) if dtypes else df
+
+
+def align_categories(kept, fresh):
+    """
+    Gives categorical columns of `kept` and `fresh` the same categories, so
+    concatenating a patch keeps them categorical instead of falling back to strings.
+
+    Returns:
+        tuple: (kept, fresh) with aligned categorical columns.
+    """
+    for col in kept.columns:
+        dtype = kept[col].dtype
+        if not isinstance(dtype, pd.CategoricalDtype) or col not in fresh.columns:
+            continue
+        new = pd.Index(fresh[col].dropna().unique()).difference(dtype.categories)
+        if len(new):
+            kept = kept.assign(**{col: kept[col].cat.add_categories(new)})
+        fresh = fresh.assign(**{col: pd.Categorical(fresh[col], categories=kept[col].cat.categories)})
+    return kept, fresh
+
+
+def write_snapshot(path, df, version, source):
+    """
+    Writes the mirror contents to a Parquet file, atomically.
+
+    Args:
+        path (str): Target file.
+        df (pd.DataFrame): Compacted table contents.
+        version (int): Change log id the contents are current up to.
+        source (str): Identifies the database, so a snapshot is never loaded into another one.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = {"format": SNAPSHOT_FORMAT, "version": int(version), "source": source}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"library": json.dumps(meta).encode()})
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    ## One temp file per write, processes sharing snapshot_dir must not move each other's file away
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp",
+                                     delete=False) as fh:
+        try:
+            pq.write_table(table, fh)
+        except Exception:
+            fh.close()
+            os.unlink(fh.name)
+            raise
+    ## Replace atomically so another process never reads a half-written file
+    try:
+        os.replace(fh.name, path)
+    except OSError:
+        os.unlink(fh.name)
+        raise
+
+
+def read_snapshot(path, source):
+    """
+    Reads a snapshot written by write_snapshot().
+
+    Returns:
+        tuple | None: (DataFrame, version), or None when the file is missing,
+        unreadable, of another format or taken from another database.
+    """
+    if not os.path.exists(path):
+        return None
+    import pyarrow.parquet as pq
+
+    try:
+        table = pq.read_table(path)
+        meta = json.loads((table.schema.metadata or {}).get(b"library", b"{}"))
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != SNAPSHOT_FORMAT or meta.get("source") != source:
+        return None
+    return table.to_pandas(), meta["version"]
@@ -0,0 +1,116 @@
+"""
+SQLite backend for the library repository, for offline runs, tests and benchmarks.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from storage.base import SQLRepository
+
+
+DUMP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database")
+
+
+class SQLiteRepository(SQLRepository):
+    """
+    Repository backed by a local SQLite file or an in-memory database.
+
+    File databases open a short-lived connection per operation and run in WAL
+    mode, so concurrent readers do not block each other. An in-memory database
+    only exists inside one connection, which is therefore shared and guarded by
+    a lock.
+
+    Explicit transactions use `BEGIN IMMEDIATE`, which takes the database write
+    lock up front; it plays the role of MySQL's `SELECT ... FOR UPDATE`.
+
+    Args:
+        path (str): Database file, or ":memory:".
+        cache (ReadCache | None): Read cache shared by this repository.
+        instrumentation (Instrumentation | None): Receives query and checkout timings.
+        **options: loan_days and summary_interval, see SQLRepository. `replicas`
+            are paths of database files kept in step with `path` (e.g. with the
+            backup API or a file-level replication tool); they are opened read-only.
+    """
+
+    dialect = "sqlite"
+    placeholder = "?"
+    now = "datetime('now', 'localtime')"
+    lock = ""
+    ignore = "OR IGNORE"
+    nocase = " COLLATE NOCASE"
+    errors = (sqlite3.Error,)
+
+    def __init__(self, path=":memory:", cache=None, instrumentation=None, **options):
+        super().__init__(cache, instrumentation, **options)
+        self.path = path
+        self._lock = threading.RLock()
+        self._shared = None
+        if path == ":memory:":
+            self._shared = self._open()
+        else:
+            conn = self._open()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.close()
+
+    @property
+    def source(self):
+        return None if self.path == ":memory:" else f"sqlite:{os.path.abspath(self.path)}"
+
+    def _open(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+
+    @contextmanager
+    def connection(self):
+        if self._shared is None:
+            conn = self._open()
+            try:
+                yield conn
+            finally:
+                conn.close()
+        else:
+            with self._lock:
+                try:
+                    yield self._shared
+                finally:
+                    if self._shared.in_transaction:
+                        self._shared.rollback()
+
+    def begin(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+
+    def replica_endpoint(self, path):
+        @contextmanager
+        def connection():
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30, check_same_thread=False)
+            try:
+                yield conn
+            finally:
+                conn.close()
+        return path, connection
+
+    def seed_from_dumps(self, dump_dir=DUMP_DIR):
+        """
+        Loads the `database/*.sql` INSERT dumps into an empty database.
+
+        Args:
+            dump_dir (str): Folder containing users.sql, books.sql and transactions.sql.
+
+        Returns:
+            bool: True if the dumps were loaded, False if the database already had books.
+        """
+        with self.connection() as conn:
+            if conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]:
+                return False
+            script = []
+            for table in ("users", "books", "transactions"):
+                with open(os.path.join(dump_dir, f"{table}.sql"), encoding="utf-8") as fh:
+                    script.append(fh.read())
+            conn.executescript("BEGIN;\n" + "\n".join(script) + "\nCOMMIT;")
+
+        self.rebuild_loan_summary()
+        self.cache.invalidate("books", "users", "transactions")
+        for mirror in self.mirrors.values():
+            mirror.reset()
+        return True
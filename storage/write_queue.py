@@ -0,0 +1,173 @@
+"""
+Background execution of repository writes.
+
+The UI submits a write and returns immediately; a small thread pool runs it,
+retries transient database errors with exponential backoff, and records the
+outcome on a WriteJob the session polls. Writes that touch the same book or
+user run one at a time in submission order.
+"""
+
+import itertools
+import random
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+## Lock wait timeout, deadlock, cannot connect, too many connections: the write was rolled back or never started
+TRANSIENT_MYSQL_ERRNOS = {1205, 1213, 2003, 1040}
+
+
+def is_transient(error):
+    """
+    True for errors worth retrying: lock conflicts, refused connections and
+    pool checkout timeouts, all of which guarantee nothing was committed.
+
+    A connection lost mid-write (2006, 2013, 2055) is not retried: the COMMIT
+    may already have reached the server, and running the write again would
+    report a duplicate or unavailable book for a write that succeeded.
+    Constraint violations and SQL errors are not retried either.
+    """
+    ## Only the MySQL backend imports the driver; SQLite deployments never load it
+    mysql = sys.modules.get("mysql.connector")
+    if mysql and isinstance(error, mysql.errors.PoolError):
+        return True
+    if mysql and isinstance(error, mysql.Error):
+        return error.errno in TRANSIENT_MYSQL_ERRNOS
+    if isinstance(error, sqlite3.OperationalError):
+        return "locked" in str(error) or "busy" in str(error)
+    return False
+
+
+class WriteJob:
+    """
+    One submitted write and its outcome.
+
+    `status` moves from "queued" to "running" to "done" or "failed"; `result`
+    holds the repository call's return value and `error` the final exception.
+    """
+
+    def __init__(self, job_id, label, keys, fn, args, kwargs):
+        self.id = job_id
+        self.label = label
+        self.keys = keys
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.attempts = 0
+        self.submitted = time.monotonic()
+        self.finished = None
+        self._event = threading.Event()
+
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until the job finished; returns True if it did within `timeout`."""
+        return self._event.wait(timeout)
+
+
+class WriteQueue:
+    """
+    Runs repository writes on background threads with per-key ordering and retries.
+
+    Workflow:
+    1. submit(label, keys, fn, ...) queues the call; `keys` name the rows it
+       touches as "<table>:<id>" strings, e.g. ["book:12345", "user:7"]. Keys
+       are compared as given, so every caller must use this one format.
+    2. A job starts only once it is first in line for every one of its keys, so
+       writes to the same book or user never overlap and keep submission order,
+       while unrelated writes run in parallel on up to `workers` threads.
+    3. Transient errors (see is_transient) are retried up to `retries` times,
+       waiting `backoff * 2**attempt` seconds plus jitter in between.
+    4. The job records its result or final error; the caller polls done().
+
+    Args:
+        workers (int): Size of the thread pool.
+        retries (int): Retries after the first attempt for transient errors.
+        backoff (float): Base delay in seconds for the exponential backoff.
+
+    Note:
+        Ordering only covers jobs of this process; the repository's transactions
+        still guard against concurrent writes from other processes (e.g. a book
+        borrowed twice is reported back as unavailable).
+    """
+
+    def __init__(self, workers=4, retries=3, backoff=0.2):
+        self.retries = retries
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="library-write")
+        self._lanes = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "retries": 0}
+
+    def submit(self, label, keys, fn, *args, **kwargs):
+        """
+        Queues fn(*args, **kwargs) and returns its WriteJob immediately.
+
+        Args:
+            label (str): Shown to the user when the write finished.
+            keys (list): Rows the write touches, e.g. ["book:12345", "user:7"].
+            fn (callable): The repository write to run.
+        """
+        job = WriteJob(next(self._ids), label, list(dict.fromkeys(keys)), fn, args, kwargs)
+        with self._lock:
+            self._stats["submitted"] += 1
+            for key in job.keys:
+                self._lanes[key].append(job)
+            ready = self._is_ready(job)
+        if ready:
+            self._executor.submit(self._run, job)
+        return job
+
+    def _is_ready(self, job):
+        return all(self._lanes[key][0] is job for key in job.keys)
+
+    def _run(self, job):
+        job.status = "running"
+        while True:
+            job.attempts += 1
+            try:
+                job.result = job.fn(*job.args, **job.kwargs)
+                job.status = "done"
+                break
+            except Exception as e:
+                if job.attempts <= self.retries and is_transient(e):
+                    with self._lock:
+                        self._stats["retries"] += 1
+                    time.sleep(self.backoff * 2 ** (job.attempts - 1) * (1 + random.random()))
+                    continue
+                job.error = e
+                job.status = "failed"
+                break
+
+        job.finished = time.monotonic()
+        next_jobs = []
+        with self._lock:
+            self._stats["completed" if job.status == "done" else "failed"] += 1
+            for key in job.keys:
+                lane = self._lanes[key]
+                lane.popleft()
+                if not lane:
+                    del self._lanes[key]
+                elif self._is_ready(lane[0]) and lane[0] not in next_jobs:
+                    next_jobs.append(lane[0])
+        job._event.set()
+        for next_job in next_jobs:
+            self._executor.submit(self._run, next_job)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["pending"] = len({id(job) for lane in self._lanes.values() for job in lane})
+        return snapshot
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,101 @@
+"""
+Pruning of the change log behind the books/users mirrors.
+"""
+
+import os
+
+from storage import SQLiteRepository
+
+
+def make_repository(path, **options):
+    repo = SQLiteRepository(path, **options)
+    repo.migrate()
+    for mirror in repo.mirrors.values():
+        mirror.overlap = 2
+    return repo
+
+
+def add_books(repo, first, count):
+    for book_id in range(first, first + count):
+        repo.add_book(book_id, f"Book {book_id}", "Author", 1)
+
+
+def sync_mirrors(repo):
+    for mirror in repo.mirrors.values():
+        mirror.sync(True)
+
+
+def age_change_log(repo):
+    with repo.connection() as conn:
+        conn.execute("UPDATE change_log SET changed_at = '2000-01-01 00:00:00'")
+        conn.commit()
+
+
+def change_ids(repo):
+    with repo.connection() as conn:
+        return [row[0] for row in conn.execute("SELECT id FROM change_log ORDER BY id")]
+
+
+def test_prune_keeps_entries_after_the_mirror_overlap(tmp_path):
+    repo = make_repository(str(tmp_path / "library.db"))
+    add_books(repo, 1, 10)
+    sync_mirrors(repo)
+    version = repo.mirrors["books"].version
+
+    age_change_log(repo)
+    pruned = repo.prune_change_log(batch_size=3)
+
+    assert pruned == version - 2
+    assert change_ids(repo) == [version - 1, version]
+    assert repo.stats()["archive"]["pruned_changes"] == pruned
+
+
+def test_prune_keeps_entries_younger_than_the_retention(tmp_path):
+    repo = make_repository(str(tmp_path / "library.db"))
+    add_books(repo, 1, 10)
+    sync_mirrors(repo)
+
+    assert repo.prune_change_log() == 0
+    assert len(change_ids(repo)) == 10
+
+
+def test_mirror_behind_the_pruned_range_reloads(tmp_path):
+    path = str(tmp_path / "library.db")
+    repo = make_repository(path)
+    other = make_repository(path)
+    add_books(repo, 1, 5)
+    sync_mirrors(other)
+
+    add_books(repo, 6, 10)
+    sync_mirrors(repo)
+    age_change_log(repo)
+    assert repo.prune_change_log() > 0
+
+    ## Idle for longer than half the retention, so the next sync checks for a gap
+    other.change_log_retention = 0
+    books = other.mirrors["books"]
+    books.sync(True)
+    assert books.stats["full_loads"] == 2
+    assert sorted(books.snapshot()["id"]) == list(range(1, 16))
+
+
+def test_snapshot_behind_the_pruned_range_is_not_loaded(tmp_path):
+    path = str(tmp_path / "library.db")
+    snapshot_dir = str(tmp_path / "snapshots")
+    repo = make_repository(path, snapshot_dir=snapshot_dir)
+    add_books(repo, 1, 5)
+    sync_mirrors(repo)
+    assert os.path.exists(os.path.join(snapshot_dir, "books.parquet"))
+
+    ## Another process, without snapshots, writes and prunes meanwhile
+    writer = make_repository(path)
+    add_books(writer, 6, 10)
+    sync_mirrors(writer)
+    age_change_log(writer)
+    assert writer.prune_change_log() > 0
+
+    restarted = make_repository(path, snapshot_dir=snapshot_dir)
+    books = restarted.mirrors["books"]
+    books.sync(True)
+    assert books.stats["snapshot_loads"] == 0
+    assert sorted(books.snapshot()["id"]) == list(range(1, 16))
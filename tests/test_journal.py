@@ -0,0 +1,73 @@
+"""
+Replay of the offline write journal once the database is reachable again.
+"""
+
+import pytest
+
+from storage import SQLiteRepository, WriteJournal, WriteJournaled
+
+
+def make_repository(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / "library.db"), journal=WriteJournal(str(tmp_path / "journal.db")))
+    repo.migrate()
+    for book_id in (1, 2):
+        repo.add_book(book_id, f"Book {book_id}", "Author", 1)
+    for user_id in (7, 8):
+        repo.add_user(user_id, f"Member {user_id}")
+    return repo
+
+
+def journal_offline(repo, *writes):
+    repo.go_offline(OSError("primary unreachable"))
+    for method, *args in writes:
+        with pytest.raises(WriteJournaled):
+            getattr(repo, method)(*args)
+
+
+def test_replay_applies_entries_in_the_order_they_were_made(tmp_path):
+    repo = make_repository(tmp_path)
+    ## Out of order, member 8's borrow would find the book still lent to member 7
+    journal_offline(
+        repo,
+        ("borrow_books", 7, [1]),
+        ("return_books", 7, [1]),
+        ("borrow_books", 8, [1]),
+    )
+    assert repo.stats()["journal"]["pending"] == 3
+
+    assert repo.reconnect(force=True)
+
+    assert repo.stats()["journal"]["applied"] == 3
+    assert repo.offline_since is None
+    assert repo.borrowed_books(7) == []
+    assert [book_id for book_id, _ in repo.borrowed_books(8)] == [1]
+
+
+def test_replay_runs_every_entry_once(tmp_path):
+    repo = make_repository(tmp_path)
+    journal_offline(repo, ("borrow_books", 7, [1]), ("add_user", 9, "Offline Member"))
+
+    assert repo.reconnect(force=True)
+    assert repo.replay_journal() == {"applied": 0, "conflict": 0, "failed": 0}
+    assert repo.reconnect(force=True)
+
+    ## A restarted process opening the same journal finds nothing left to replay
+    restarted = WriteJournal(repo.journal.path)
+    assert not restarted.has_pending()
+    assert restarted.stats()["applied"] == 2
+    assert [book_id for book_id, _ in repo.borrowed_books(7)] == [1]
+    assert repo.get_user(9)["nama"] == "Offline Member"
+
+
+def test_replay_keeps_rejected_writes_as_conflicts(tmp_path):
+    repo = make_repository(tmp_path)
+    journal_offline(repo, ("borrow_books", 7, [2]), ("add_user", 8, "Duplicate"), ("borrow_books", 7, [1]))
+    ## Another process lends book 2 while this one is offline
+    SQLiteRepository(repo.path).borrow_books(8, [2])
+
+    assert repo.reconnect(force=True)
+
+    stats = repo.stats()["journal"]
+    assert (stats["applied"], stats["conflict"], stats["pending"]) == (1, 2, 0)
+    assert [problem["operation"] for problem in repo.journal.problems()] == ["add_user", "borrow_books"]
+    assert [book_id for book_id, _ in repo.borrowed_books(7)] == [1]
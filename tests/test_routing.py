@@ -0,0 +1,69 @@
+"""
+Read routing between the primary and a SQLite read replica.
+"""
+
+import sqlite3
+
+from storage import SQLiteRepository
+
+
+def make_repository(tmp_path, **options):
+    primary, replica = str(tmp_path / "library.db"), str(tmp_path / "replica.db")
+    repo = SQLiteRepository(primary, replicas=[replica], **options)
+    repo.migrate()
+    repo.add_book(1, "Book 1", "Author", 1)
+    copy_database(primary, replica)
+    return repo
+
+
+def copy_database(source, target):
+    ## Stands in for the replication tool: the replica catches up with the primary
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+def test_due_waits_for_the_check_interval(tmp_path):
+    repo = make_repository(tmp_path, replica_check_interval=3600)
+    assert repo.router.due()
+
+    repo.check_replicas()
+    assert not repo.router.due()
+
+    repo.router.check_interval = 0
+    assert repo.router.due()
+
+
+def test_caught_up_replica_serves_reads(tmp_path):
+    repo = make_repository(tmp_path)
+    repo.check_replicas()
+
+    replica = repo.router.pick()
+
+    assert replica is not None
+    assert replica.version == repo.change_version()
+
+
+def test_own_write_raises_the_floor_until_the_replica_has_it(tmp_path):
+    repo = make_repository(tmp_path)
+    repo.check_replicas()
+
+    repo.add_book(2, "Book 2", "Author", 1)
+    assert repo.router.floor == repo.change_version()
+    repo.check_replicas()
+    assert repo.router.pick() is None
+    assert repo.router.stats()["fallback_behind"] == 1
+
+    copy_database(repo.path, str(tmp_path / "replica.db"))
+    repo.check_replicas()
+    assert repo.router.pick() is not None
+
+
+def test_floor_never_drops(tmp_path):
+    repo = make_repository(tmp_path)
+    repo.add_book(2, "Book 2", "Author", 1)
+    floor = repo.router.floor
+
+    repo.router.raise_floor(floor - 1)
+
+    assert repo.router.floor == floor
+    assert floor > 0
@@ -0,0 +1,78 @@
+"""
+Member search by ID prefix: the ID ranges behind it and the pages it returns.
+"""
+
+from storage import SQLiteRepository
+from storage.base import BIGINT_MAX, MIN_ID_RANGE_PREFIX, id_prefix_ranges
+
+
+def make_repository(path, user_ids):
+    repo = SQLiteRepository(path)
+    repo.migrate()
+    for user_id in user_ids:
+        repo.add_user(user_id, f"Member {user_id}")
+    return repo
+
+
+def in_ranges(ranges, number):
+    return any(low <= number <= high for low, high in ranges)
+
+
+def search_all(repo, query, page_size):
+    found, cursor = [], None
+    while True:
+        page, cursor = repo.search_users(query, page_size, cursor)
+        found.extend(page["id"].tolist())
+        if cursor is None:
+            return found
+
+
+def test_ranges_are_ascending_and_disjoint():
+    ranges = id_prefix_ranges("123")
+
+    assert ranges[0] == (123, 123)
+    assert ranges[1] == (1230, 1239)
+    assert all(high < next_low for (_, high), (next_low, _) in zip(ranges, ranges[1:]))
+    assert ranges[-1][1] <= BIGINT_MAX
+
+
+def test_ranges_cover_exactly_the_ids_with_the_prefix():
+    for prefix in ("100", "123", "999", "4567"):
+        ranges = id_prefix_ranges(prefix)
+        for number in range(200000):
+            assert in_ranges(ranges, number) == str(number).startswith(prefix), (prefix, number)
+
+
+def test_ranges_stop_at_bigint():
+    for prefix in ("922", "923", "9223372036854775807"):
+        ranges = id_prefix_ranges(prefix)
+        for number in (BIGINT_MAX - 1, BIGINT_MAX, 9223372036854775800, 922337203685477580):
+            assert in_ranges(ranges, number) == str(number).startswith(prefix), (prefix, number)
+        assert all(high <= BIGINT_MAX for _, high in ranges)
+    assert id_prefix_ranges("923")[-1][1] < BIGINT_MAX
+
+
+def test_ranges_start_after_the_cursor():
+    ranges = id_prefix_ranges("123", start=1235)
+
+    assert ranges[0] == (1235, 1239)
+    assert not in_ranges(ranges, 123)
+    assert id_prefix_ranges("0") == [(0, 0)]
+    assert id_prefix_ranges("012") == []
+
+
+def test_short_prefix_reads_one_statement(tmp_path):
+    repo = make_repository(str(tmp_path / "library.db"), [1])
+    sql, _ = repo._user_id_search_sql("1" * (MIN_ID_RANGE_PREFIX - 1), 21)
+
+    assert "UNION ALL" not in sql
+    assert "UNION ALL" in repo._user_id_search_sql("1" * MIN_ID_RANGE_PREFIX, 21)[0]
+
+
+def test_search_pages_through_every_matching_id(tmp_path):
+    user_ids = [1, 5, 12, 120, 123, 129, 1200, 1234, 12345, 13, 2, 21, 123456789]
+    repo = make_repository(str(tmp_path / "library.db"), user_ids)
+
+    for query in ("1", "12", "123", "1234", "9"):
+        expected = sorted(user_id for user_id in user_ids if str(user_id).startswith(query))
+        assert search_all(repo, query, 2) == expected, query
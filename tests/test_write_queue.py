@@ -0,0 +1,77 @@
+"""
+Retries of the background write queue.
+"""
+
+import sqlite3
+
+from storage import SQLiteRepository
+from storage.write_queue import WriteQueue
+
+
+def make_repository(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / "library.db"))
+    repo.migrate()
+    repo.add_user(7, "Member 7")
+    return repo
+
+
+def test_locked_database_is_retried(tmp_path):
+    repo = make_repository(tmp_path)
+    holder = sqlite3.connect(repo.path, isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    attempts = []
+
+    def add_user_without_waiting(user_id, name):
+        attempts.append(user_id)
+        conn = sqlite3.connect(repo.path, timeout=0, isolation_level=None)
+        try:
+            ## The other writer lets go once the first attempt failed on its lock
+            if len(attempts) > 1:
+                holder.rollback()
+            conn.execute("INSERT INTO users (id, nama) VALUES (?, ?)", (user_id, name))
+        finally:
+            conn.close()
+        return user_id
+
+    queue = WriteQueue(workers=1, retries=3, backoff=0)
+    job = queue.submit("Add member", ["user:8"], add_user_without_waiting, 8, "Member 8")
+
+    assert job.wait(10)
+    assert (job.status, job.result, job.attempts) == ("done", 8, 2)
+    assert queue.stats()["retries"] == 1
+    assert repo.get_user(8)["nama"] == "Member 8"
+    queue.shutdown()
+
+
+def test_retries_stop_after_the_limit(tmp_path):
+    repo = make_repository(tmp_path)
+    holder = sqlite3.connect(repo.path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+
+    def add_user_without_waiting(user_id, name):
+        with sqlite3.connect(repo.path, timeout=0) as conn:
+            conn.execute("INSERT INTO users (id, nama) VALUES (?, ?)", (user_id, name))
+
+    queue = WriteQueue(workers=1, retries=2, backoff=0)
+    job = queue.submit("Add member", ["user:8"], add_user_without_waiting, 8, "Member 8")
+
+    assert job.wait(10)
+    assert (job.status, job.attempts) == ("failed", 3)
+    assert isinstance(job.error, sqlite3.OperationalError)
+    assert queue.stats()["failed"] == 1
+    holder.rollback()
+    queue.shutdown()
+
+
+def test_rejected_write_is_not_retried(tmp_path):
+    repo = make_repository(tmp_path)
+    queue = WriteQueue(workers=1, retries=3, backoff=0)
+
+    job = queue.submit("Add member", ["user:7"], repo.add_user, 7, "Duplicate")
+
+    assert job.wait(10)
+    assert (job.status, job.attempts) == ("failed", 1)
+    assert isinstance(job.error, sqlite3.IntegrityError)
+    assert queue.stats()["retries"] == 0
+    assert repo.get_user(7)["nama"] == "Member 7"
+    queue.shutdown()